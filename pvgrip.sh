@@ -262,9 +262,32 @@ function start_webserver {
 }
 
 
+function get_peer_address {
+    port="$1"
+    interface=$(echo "${network_interfaces}" | cut -d, -f1)
+    if [ "-" = "${interface}" ]
+    then
+        echo "$(hostname):${port}"
+        return
+    fi
+
+    echo "$(get_ip ${interface}):${port}"
+}
+
+
 function start_worker {
+    # only the main worker serves its cache to peers
+    bind=""
+    if [ "worker" = "${what}" ]
+    then
+        peer_port=$(python3 scripts/get_config.py cache peer_port)
+        bind="$(get_binding ${peer_port}:${peer_port})"
+        bind+=" -e PVGRIP_PEER_ADDRESS=$(get_peer_address ${peer_port})"
+    fi
+
     $(start_preamble) \
         $(mount_volumes) \
+        "${bind}" \
         "${registry}${name_prefix}:${image_tag}" \
         ./scripts/start.sh --what="${what}"
 }
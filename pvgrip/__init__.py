@@ -2,6 +2,8 @@ import celery
 
 from pvgrip.globals \
     import REDIS_URL, REDIS_EXPIRES, AUTODISCOVER_TASKS
+from pvgrip.utils.cache_affinity \
+    import route_task
 
 
 CELERY_APP = celery.Celery(broker=REDIS_URL,
@@ -10,5 +12,6 @@ CELERY_APP = celery.Celery(broker=REDIS_URL,
                            result_expires = REDIS_EXPIRES,
                            enable_utc = True)
 CELERY_APP.autodiscover_tasks(AUTODISCOVER_TASKS)
-CELERY_APP.conf.task_routes = {'pvgrip.weather.tasks.retrieve_source':
-                               {'queue': 'requests'}}
+CELERY_APP.conf.task_routes = \
+    ({'pvgrip.weather.tasks.retrieve_source': {'queue': 'requests'}},
+     route_task)
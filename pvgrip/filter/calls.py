@@ -12,6 +12,8 @@ from pvgrip.raster.tasks \
     sample_route_neighbour
 from pvgrip.raster.mesh \
     import determine_epsg
+from pvgrip.raster.utils \
+    import check_box_not_too_big
 
 from pvgrip.route.calls \
     import route_rasters, save_route
@@ -29,8 +31,11 @@ def lidar_stdev(filter_size, **kwargs):
     output_type = kwargs['output_type']
     step = kwargs['step']
     kwargs['step'] = kwargs['pdal_resolution']
-    kwargs['output_type'] = 'pickle'
+    kwargs['output_type'] = 'raster'
     kwargs['mesh_type'] = determine_epsg(kwargs['box'], kwargs['mesh_type'])
+    check_box_not_too_big(box = kwargs['box'],
+                          step = kwargs['step'],
+                          mesh_type = kwargs['mesh_type'])
 
     tasks = celery.group(
         sample_raster(stat='stdev', ensure_las=True, **kwargs),
@@ -50,8 +55,11 @@ def lidar_stdev(filter_size, **kwargs):
 @call_cache_fn_results(minage = 1650884152)
 def filter_raster(filter_type, filter_size, **kwargs):
     output_type = kwargs['output_type']
-    kwargs['output_type'] = 'pickle'
+    kwargs['output_type'] = 'raster'
     kwargs['mesh_type'] = determine_epsg(kwargs['box'], kwargs['mesh_type'])
+    check_box_not_too_big(box = kwargs['box'],
+                          step = kwargs['step'],
+                          mesh_type = kwargs['mesh_type'])
 
     tasks = sample_raster(**kwargs)
     tasks |= apply_filter.signature\
@@ -1,5 +1,4 @@
 import logging
-import pickle
 
 import numpy as np
 
@@ -18,23 +17,19 @@ from pvgrip.utils.format_dictionary \
 from pvgrip.utils.files \
     import get_tempfile, remove_file
 
+from pvgrip.raster.container \
+    import read_raster, write_raster
 from pvgrip.filter.variance \
     import variance
 from pvgrip.filter.filters \
     import const_weights, average_per_sqm, convolve, average_in_filter
 
 
-def _read_pickle(fn):
-    with open(fn, 'rb') as f:
-        return pickle.load(f)
-
-
-def _write_pickle(raster, mesh):
+def _write_raster(raster, mesh):
     ofn = get_tempfile()
     try:
-        with open(ofn, 'wb') as f:
-            pickle.dump({'raster': raster,
-                         'mesh': mesh}, f)
+        write_raster(ofn, {'raster': raster,
+                           'mesh': mesh})
     except Exception as e:
         remove_file(ofn)
         raise e
@@ -47,9 +42,9 @@ def _write_pickle(raster, mesh):
 def stdev(self, fns, filter_size):
     logging.debug("stdev\n{}"\
                   .format(format_dictionary(locals())))
-    stdev = _read_pickle(fns[0])
-    mean = _read_pickle(fns[1])
-    count = _read_pickle(fns[2])
+    stdev = read_raster(fns[0])
+    mean = read_raster(fns[1])
+    count = read_raster(fns[2])
 
     res = variance(stdev = stdev['raster'],
                    mean = mean['raster'],
@@ -59,7 +54,7 @@ def stdev(self, fns, filter_size):
     res = np.power(res,0.5)
     res[np.isnan(res)] = 0
 
-    return _write_pickle(raster = res, mesh = stdev['mesh'])
+    return _write_raster(raster = res, mesh = stdev['mesh'])
 
 
 @CELERY_APP.task(bind=True, base=WithRetry)
@@ -68,7 +63,7 @@ def stdev(self, fns, filter_size):
 def apply_filter(self, fn, filter_type, filter_size):
     logging.debug("apply_filter\n{}"\
                   .format(format_dictionary(locals())))
-    raster = _read_pickle(fn)
+    raster = read_raster(fn)
 
     if 'average_per_sqm' == filter_type:
         weights = average_per_sqm\
@@ -87,4 +82,4 @@ def apply_filter(self, fn, filter_type, filter_size):
                            .format(filter_type))
 
     res = convolve(raster = raster['raster'], weights = weights)
-    return _write_pickle(raster = res, mesh = raster['mesh'])
+    return _write_raster(raster = res, mesh = raster['mesh'])
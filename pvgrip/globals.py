@@ -4,6 +4,9 @@ import json
 import celery
 import logging
 
+from celery \
+    import signals
+
 from cassandra_io.files \
     import Cassandra_Files
 from ipfs_io.files \
@@ -17,6 +20,12 @@ from pvgrip.storage.spatial_data \
     import Spatial_Data
 from pvgrip.storage.files_lrucache \
     import Files_LRUCache
+from pvgrip.storage.write_behind \
+    import Write_Behind
+from pvgrip.storage.peers \
+    import Peer_Directory, serve
+from pvgrip.storage.metadata_cache \
+    import Metadata_Cache
 from pvgrip.utils.redis.dictionary \
     import Redis_Dictionary
 from pvgrip.utils.get_configs \
@@ -24,6 +33,12 @@ from pvgrip.utils.get_configs \
 
 from pvgrip.utils.credentials_circle \
     import Credentials_Circle
+from pvgrip.utils.cache_affinity \
+    import Cache_Affinity
+from pvgrip.utils.process_singletons \
+    import Process_Singletons, cassandra_healthy
+from pvgrip.raster.registry \
+    import Raster_Registry
 
 
 def _set_localmount(configs, allowed_remote):
@@ -79,6 +94,41 @@ ALLOWED_REMOTE = \
 ALLOWED_REMOTE, _LOCAL_STORAGE_ROOTS = \
     _set_localmount(PVGRIP_CONFIGS, ALLOWED_REMOTE)
 DEFAULT_REMOTE = PVGRIP_CONFIGS['storage']['default']
+_METADATA_TTL_POSITIVE = \
+    float(PVGRIP_CONFIGS['storage']['metadata_ttl_positive'])
+_METADATA_TTL_NEGATIVE = \
+    float(PVGRIP_CONFIGS['storage']['metadata_ttl_negative'])
+_METADATA_MAXSIZE = \
+    int(PVGRIP_CONFIGS['storage']['metadata_maxsize'])
+STORAGE_CODEC = PVGRIP_CONFIGS['storage']['codec']
+STORAGE_CODEC_SHUFFLE = \
+    int(PVGRIP_CONFIGS['storage']['codec_shuffle'])
+WRITE_BEHIND = PVGRIP_CONFIGS['storage'].getboolean('write_behind')
+_WRITE_BEHIND_THREADS = \
+    int(PVGRIP_CONFIGS['storage']['write_behind_threads'])
+_WRITE_BEHIND_TTL = \
+    int(PVGRIP_CONFIGS['storage']['write_behind_ttl'])
+
+
+LEGACY_CACHE_KEYS = \
+    PVGRIP_CONFIGS['cache'].getboolean('legacy_keys')
+CACHE_AFFINITY = PVGRIP_CONFIGS['cache'].getboolean('affinity')
+_CACHE_AFFINITY_BITS = \
+    int(PVGRIP_CONFIGS['cache']['affinity_bloom_bits'])
+_CACHE_AFFINITY_TIMEOUT = \
+    int(PVGRIP_CONFIGS['cache']['affinity_timeout'])
+_CACHE_AFFINITY_BACKLOG = \
+    int(PVGRIP_CONFIGS['cache']['affinity_backlog'])
+_CACHE_AFFINITY_REBUILD = \
+    int(PVGRIP_CONFIGS['cache']['affinity_rebuild'])
+PEER_FETCH = PVGRIP_CONFIGS['cache'].getboolean('peer_fetch')
+_PEER_PORT = int(PVGRIP_CONFIGS['cache']['peer_port'])
+_PEER_TTL = int(PVGRIP_CONFIGS['cache']['peer_ttl'])
+_PEER_TIMEOUT = int(PVGRIP_CONFIGS['cache']['peer_timeout'])
+_PEER_ADDRESS = os.environ.get('PVGRIP_PEER_ADDRESS')
+# files are announced only if the peer server runs
+_PEER_SERVING = False
+PREFETCH_THREADS = int(PVGRIP_CONFIGS['cache']['prefetch_threads'])
 
 
 GRASS=PVGRIP_CONFIGS['grass']['executable']
@@ -88,6 +138,15 @@ GRASS_NJOBS = int(PVGRIP_CONFIGS['grass']['njobs'])
 SSDP=PVGRIP_CONFIGS['ssdp']['executable']
 SSDP_NJOBS = int(PVGRIP_CONFIGS['ssdp']['njobs'])
 
+RASTER_SAMPLE_THREADS = \
+    int(PVGRIP_CONFIGS['raster']['sample_threads'])
+RASTER_TILE_SIZE = int(PVGRIP_CONFIGS['raster']['tile_size'])
+RASTER_SAMPLING_TILE_SIZE = \
+    int(PVGRIP_CONFIGS['raster']['sampling_tile_size'])
+RASTER_MAX_POINTS = float(PVGRIP_CONFIGS['raster']['max_points'])
+RASTER_REGISTRY = PVGRIP_CONFIGS['raster'].getboolean('registry')
+_RASTER_REGISTRY_TTL = int(PVGRIP_CONFIGS['raster']['registry_ttl'])
+
 COPERNICUS_ADS_CREDENTIALS = Credentials_Circle\
     (config_fn=PVGRIP_CONFIGS['copernicus']['credentials_ads'],
      redis_url = REDIS_URL)
@@ -128,13 +187,159 @@ AUTODISCOVER_TASKS = [
 ]
 
 
-def get_RESULTS_CACHE():
+PROCESS_SINGLETONS = Process_Singletons()
+
+
+@signals.worker_process_init.connect
+def _reset_process_singletons(**kwargs):
+    PROCESS_SINGLETONS.reset()
+
+
+_TASK_SINGLETONS_COUNTS = {}
+
+
+@signals.task_prerun.connect
+def _singletons_counts_prerun(task_id = None, **kwargs):
+    _TASK_SINGLETONS_COUNTS[task_id] = PROCESS_SINGLETONS.counts()
+
+
+@signals.task_postrun.connect
+def _singletons_counts_postrun(task_id = None, task = None, **kwargs):
+    before = _TASK_SINGLETONS_COUNTS.pop(task_id, {})
+    after = PROCESS_SINGLETONS.counts()
+    created = {str(k): v - before.get(k, 0) \
+               for k, v in after.items() \
+               if v != before.get(k, 0)}
+    logging.debug("""connections opened by the task
+    task = {}
+    task_id = {}
+    created = {}
+    total = {}
+    """.format(getattr(task, 'name', None), task_id,
+               created, sum(after.values())))
+
+
+def _new_RESULTS_CACHE():
     return Files_LRUCache\
         (path = RESULTS_PATH,
-         maxsize = int(PVGRIP_CONFIGS['cache']['limit_worker']))
+         maxsize = int(PVGRIP_CONFIGS['cache']['limit_worker']),
+         policy = PVGRIP_CONFIGS['cache']['eviction'])
 
 
-def get_IPFS_STORAGE():
+def get_RESULTS_CACHE():
+    return PROCESS_SINGLETONS.get\
+        (key = 'results_cache',
+         create = _new_RESULTS_CACHE)
+
+
+def get_METADATA_CACHE():
+    return PROCESS_SINGLETONS.get\
+        (key = 'metadata_cache',
+         create = lambda: Metadata_Cache\
+         (ttl_positive = _METADATA_TTL_POSITIVE,
+          ttl_negative = _METADATA_TTL_NEGATIVE,
+          maxsize = _METADATA_MAXSIZE))
+
+
+def get_WRITE_BEHIND():
+    return PROCESS_SINGLETONS.get\
+        (key = 'write_behind',
+         create = lambda: Write_Behind\
+         (redis_url = REDIS_URL,
+          nthreads = _WRITE_BEHIND_THREADS,
+          ttl = _WRITE_BEHIND_TTL))
+
+
+@signals.worker_process_shutdown.connect
+def _drain_write_behind(**kwargs):
+    if WRITE_BEHIND:
+        get_WRITE_BEHIND().drain()
+
+
+def get_CACHE_AFFINITY():
+    return PROCESS_SINGLETONS.get\
+        (key = 'cache_affinity',
+         create = lambda: Cache_Affinity\
+         (redis_url = REDIS_URL,
+          nbits = _CACHE_AFFINITY_BITS,
+          timeout = _CACHE_AFFINITY_TIMEOUT,
+          backlog = _CACHE_AFFINITY_BACKLOG,
+          rebuild = _CACHE_AFFINITY_REBUILD))
+
+
+def get_RASTER_REGISTRY():
+    return PROCESS_SINGLETONS.get\
+        (key = 'raster_registry',
+         create = lambda: Raster_Registry\
+         (redis_url = REDIS_URL,
+          ttl = _RASTER_REGISTRY_TTL))
+
+
+def _consumes_default_queue(instance):
+    # workers that consume from a dedicated queue (e.g. requests)
+    # do not share their cache
+    return instance.app.conf.task_default_queue \
+        in instance.app.amqp.queues.consume_from
+
+
+@signals.celeryd_after_setup.connect
+def _consume_affinity_queue(sender, instance, **kwargs):
+    queues = instance.app.amqp.queues
+    if not CACHE_AFFINITY or not _consumes_default_queue(instance):
+        return
+
+    affinity = get_CACHE_AFFINITY()
+    queues.select_add(affinity.queue)
+    affinity.start_heartbeat()
+
+
+def get_PEER_DIRECTORY():
+    return PROCESS_SINGLETONS.get\
+        (key = 'peer_directory',
+         create = lambda: Peer_Directory\
+         (redis_url = REDIS_URL,
+          root = RESULTS_PATH,
+          address = _PEER_ADDRESS,
+          port = _PEER_PORT,
+          ttl = _PEER_TTL,
+          timeout = _PEER_TIMEOUT,
+          announce = _PEER_SERVING))
+
+
+@signals.celeryd_after_setup.connect
+def _start_peer_server(sender, instance, **kwargs):
+    global _PEER_SERVING
+    if not PEER_FETCH or not _consumes_default_queue(instance):
+        return
+
+    results = get_RESULTS_CACHE()
+    try:
+        serve(root = RESULTS_PATH, port = _PEER_PORT,
+              allowed = lambda path: path in results)
+    except Exception as e:
+        logging.warning("""peer server failed to start, cached files
+        are not announced to peers
+        error = {}
+        """.format(str(e)))
+        return
+    # set before the pool processes are forked
+    _PEER_SERVING = True
+
+
+@signals.task_postrun.connect
+def _maintain_affinity(**kwargs):
+    if not CACHE_AFFINITY:
+        return
+
+    try:
+        get_CACHE_AFFINITY().maintain(get_RESULTS_CACHE())
+    except Exception as e:
+        logging.warning("""cache affinity maintenance failed
+        error = {}
+        """.format(str(e)))
+
+
+def _new_IPFS_STORAGE():
     return IPFS_Files\
         (ipfs_ip = _IPFS_STORAGE_IP,
          ipfs_timeout = _IPFS_TIMEOUT,
@@ -148,16 +353,34 @@ def get_IPFS_STORAGE():
          control_connection_timeout = 30)
 
 
+def get_IPFS_STORAGE():
+    return PROCESS_SINGLETONS.get\
+        (key = 'ipfs_storage',
+         create = _new_IPFS_STORAGE,
+         healthy = cassandra_healthy)
+
+
+def _new_LOCAL_STORAGE(remotetype):
+    return LOCALIO_Files(root = _LOCAL_STORAGE_ROOTS[remotetype],
+                         redis_url = REDIS_URL)
+
+
 def get_LOCAL_STORAGE(remotetype):
     if not re.match('localmount_.*', remotetype):
         raise RuntimeError\
             ("remotetype = {} does not match localmount_*")
 
-    return LOCALIO_Files(root = _LOCAL_STORAGE_ROOTS[remotetype],
-                         redis_url = REDIS_URL)
+    return PROCESS_SINGLETONS.get\
+        (key = ('local_storage', remotetype),
+         create = lambda: _new_LOCAL_STORAGE(remotetype))
 
 
-def get_SPATIAL_DATA():
+def _spatial_data_healthy(data):
+    return cassandra_healthy(data.datasets) \
+        and cassandra_healthy(data.index)
+
+
+def _new_SPATIAL_DATA():
     if 'ipfs_path' == DEFAULT_REMOTE:
         storage = get_IPFS_STORAGE()
     elif re.match('localmount_.*', DEFAULT_REMOTE):
@@ -176,6 +399,13 @@ def get_SPATIAL_DATA():
           'replication_args': _CASSANDRA_REPLICATION_ARGS})
 
 
+def get_SPATIAL_DATA():
+    return PROCESS_SINGLETONS.get\
+        (key = 'spatial_data',
+         create = _new_SPATIAL_DATA,
+         healthy = _spatial_data_healthy)
+
+
 def get_Tasks_Queues():
     return Redis_Dictionary(name = 'pvgrip_tasks_queue',
                             redis_url = REDIS_URL,
@@ -5,6 +5,8 @@ from pvgrip.raster.calls \
     import sample_raster, convert_from_to
 from pvgrip.raster.mesh \
     import determine_epsg
+from pvgrip.raster.utils \
+    import check_box_not_too_big
 
 from pvgrip.integrate.tasks \
     import integrate_irradiance
@@ -25,8 +27,11 @@ def ssdp_integrate(tsvfn_uploaded, albedo,
                    offset, azimuth, zenith,
                    nsky, **kwargs):
     output_type = kwargs['output_type']
-    kwargs['output_type'] = 'pickle'
+    kwargs['output_type'] = 'raster'
     kwargs['mesh_type'] = determine_epsg(kwargs['box'], kwargs['mesh_type'])
+    check_box_not_too_big(box = kwargs['box'],
+                          step = kwargs['step'],
+                          mesh_type = kwargs['mesh_type'])
 
     lat, lon = centre_of_box(kwargs['box'])
 
@@ -40,8 +40,8 @@ def split_irrtimes_calls\
     """A decorator that splits irradiance times onto chunks
 
     The passed tasks should contain 'output_type_arg' that accepts
-    'pickle' which mean that the result of a task should be a pickle
-    rsater file, as defined in the sample_from_box function
+    'raster' which mean that the result of a task should be a raster
+    container file, as defined in the sample_from_box function
 
     :output_type_arg: in kwargs defining the output_type argument
 
@@ -71,7 +71,7 @@ def split_irrtimes_calls\
             for x in chunks:
                 chunk_kwargs = kwargs
                 chunk_kwargs.update({fn_arg: x,
-                                     output_type_arg: 'pickle'})
+                                     output_type_arg: 'raster'})
                 tasks += [fun(*args, **chunk_kwargs)]
             tasks = celery.group(tasks)
             tasks |= sum_pickle.signature()
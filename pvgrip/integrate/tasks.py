@@ -1,6 +1,5 @@
 import os
 import shutil
-import pickle
 import logging
 
 
@@ -18,6 +17,8 @@ from pvgrip.utils.format_dictionary \
 from pvgrip.utils.files \
     import get_tempfile, remove_file, get_tempdir
 
+from pvgrip.raster.container \
+    import read_raster, write_raster
 from pvgrip.ssdp.generate_script \
     import poa_integrate
 from pvgrip.ssdp.utils \
@@ -87,17 +88,13 @@ def sum_pickle(self, pickle_files):
     if not len(pickle_files):
         raise RuntimeError("pickle_files is an empty list!")
 
-    with open(pickle_files[0],'rb') as f:
-        res = pickle.load(f)
+    res = read_raster(pickle_files[0])
     for fn in pickle_files[1:]:
-        with open(fn, 'rb') as f:
-            x = pickle.load(f)
-        res['raster'] += x['raster']
+        res['raster'] += read_raster(fn)['raster']
 
     ofn = get_tempfile()
     try:
-        with open(ofn, 'wb') as f:
-            pickle.dump(res, f)
+        write_raster(ofn, res)
     except Exception as e:
         remove_file(ofn)
         raise e
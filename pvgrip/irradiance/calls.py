@@ -5,6 +5,8 @@ from pvgrip.raster.calls \
     import sample_raster, convert_from_to
 from pvgrip.raster.mesh \
     import determine_epsg
+from pvgrip.raster.utils \
+    import check_box_not_too_big
 from pvgrip.irradiance.tasks \
     import compute_irradiance_ssdp, compute_irradiance_grass
 
@@ -34,8 +36,11 @@ def irradiance_ssdp(timestr, ghi, dhi, albedo,
 
     """
     output_type = kwargs['output_type']
-    kwargs['output_type'] = 'pickle'
+    kwargs['output_type'] = 'raster'
     kwargs['mesh_type'] = determine_epsg(kwargs['box'], kwargs['mesh_type'])
+    check_box_not_too_big(box = kwargs['box'],
+                          step = kwargs['step'],
+                          mesh_type = kwargs['mesh_type'])
 
     utc_time = timestr2utc_time(timestr)
     lat, lon = centre_of_box(kwargs['box'])
@@ -65,6 +70,9 @@ def irradiance_grass(timestr, rsun_args, **kwargs):
     """
     kwargs['output_type'] = 'geotiff'
     kwargs['mesh_type'] = determine_epsg(kwargs['box'], kwargs['mesh_type'])
+    check_box_not_too_big(box = kwargs['box'],
+                          step = kwargs['step'],
+                          mesh_type = kwargs['mesh_type'])
     tasks = sample_raster(**kwargs)
 
     args = {'timestr': timestr}
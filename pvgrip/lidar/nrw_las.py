@@ -6,7 +6,7 @@ import pyproj
 import requests
 
 from pvgrip.utils.float_hash \
-    import float_hash
+    import float_hash_v1
 
 
 class NRWData:
@@ -116,7 +116,7 @@ class NRWData:
             data = self._coord_to_index_data(lat=lat, lon=lon)
             data.update({
                 'file': os.path.join(self.path,'data',
-                                     float_hash(("nrw_las", url, lon, lat))),
+                                     float_hash_v1(("nrw_las", url, lon, lat))),
                 'url': url,
                 'remote_meta': self.path,
                 'if_compute_las': self._if_compute_las})
@@ -21,6 +21,8 @@ from pvgrip.osm.overpass_error import OverpassAPIError
 
 from pvgrip.raster.mesh \
     import mesh
+from pvgrip.raster.container \
+    import write_raster
 
 from pvgrip \
     import CELERY_APP
@@ -82,10 +84,8 @@ def readpng_asarray(self, png_fn, box, step, mesh_type):
 
     ofn = get_tempfile()
     try:
-        with open(ofn, "wb") as f:
-            pickle.dump({"raster": \
-                         cv2.imread(png_fn),
-                         "mesh": grid}, f)
+        write_raster(ofn, {"raster": cv2.imread(png_fn),
+                           "mesh": grid})
     except Exception as e:
         remove_file(ofn)
         raise e
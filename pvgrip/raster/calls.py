@@ -7,20 +7,25 @@ from pvgrip.utils.timeout \
     import Timeout
 
 from pvgrip.storage.remotestorage_path \
-    import searchif_instorage
+    import searchif_instorage_many
 
 from pvgrip.globals \
-    import get_SPATIAL_DATA
+    import get_SPATIAL_DATA, RASTER_TILE_SIZE, \
+    RASTER_MAX_POINTS, \
+    RASTER_SAMPLING_TILE_SIZE, RASTER_REGISTRY
 
 from pvgrip.lidar.calls \
     import process_laz
 
 from pvgrip.raster.tasks \
     import save_png, save_geotiff, \
-    save_pnghillshade, save_pickle, \
-    sample_from_box, dummy
+    save_pnghillshade, save_pickle, save_raster_pickle, \
+    sample_from_box, sample_from_tile, mosaic, fill_raster, dummy, \
+    register_raster, derive_or_sample
 from pvgrip.raster.utils \
-    import check_box_not_too_big, index2fn
+    import is_box_too_big, index2fn
+from pvgrip.raster.tiles \
+    import tile_layout, layout_npoints, layout_box
 
 
 def check_all_data_available(**kwargs):
@@ -33,14 +38,16 @@ def check_all_data_available(**kwargs):
     if 'ensure_las' not in kwargs:
         kwargs['ensure_las'] = False
 
-    tasks = []
-    for x in index.iterate():
-        fn = index2fn\
-            (x, stat = kwargs['stat'],
-             pdal_resolution = kwargs['pdal_resolution'],
-             ensure_las = kwargs['ensure_las'])
+    index = [(x, index2fn\
+              (x, stat = kwargs['stat'],
+               pdal_resolution = kwargs['pdal_resolution'],
+               ensure_las = kwargs['ensure_las']))
+             for x in index.iterate()]
+    instorage = searchif_instorage_many([fn for _, fn in index])
 
-        if searchif_instorage(fn):
+    tasks = []
+    for x, fn in index:
+        if instorage[fn]:
             continue
 
         if 'remote_meta' in x:
@@ -62,11 +69,18 @@ def check_all_data_available(**kwargs):
 
 def _convert_from_pickle(tasks, output_type,
                          scale_name = '', scale_constant = 1):
-    if output_type not in ('geotiff', 'pickle',
+    if output_type not in ('geotiff', 'pickle', 'raster',
                            'pnghillshade','png',
                            'pngnormalize', 'pngnormalize_scale'):
         raise RuntimeError("Invalid 'output_type' argument!")
 
+    if output_type == 'raster':
+        return tasks
+
+    if output_type == 'pickle':
+        tasks |= save_raster_pickle.signature()
+        return tasks
+
     if output_type == 'png':
         tasks |= save_png.signature()
         return tasks
@@ -93,10 +107,15 @@ def _convert_from_pickle(tasks, output_type,
 
 
 def convert_from_to(tasks, from_type, to_type, **kwargs):
-    if 'pickle' == from_type:
-        if 'pickle' == to_type:
-            return tasks
+    """Append conversion of the task output
+
+    :from_type: 'pickle' (a raster container, see raster.container)
+    or 'geotiff'
 
+    :to_type: output_type. 'raster' is a raster container, 'pickle'
+    a pickle of the raster data
+    """
+    if 'pickle' == from_type:
         return _convert_from_pickle(tasks, to_type, **kwargs)
 
     if 'geotiff' == from_type:
@@ -112,10 +131,78 @@ def convert_from_to(tasks, from_type, to_type, **kwargs):
     return _convert_from_pickle(tasks, to_type, **kwargs)
 
 
+def _tile_layout(box, mesh_type, step, size):
+    """Split a box in tiles of the canonical grid
+
+    :size: number of points per tile side
+    """
+    layout = tile_layout(box = box, step = step,
+                         mesh_type = mesh_type,
+                         size = size)
+    if layout_npoints(layout) > RASTER_MAX_POINTS:
+        raise RuntimeError\
+            ("either box or resolution is too high! "
+             "number of points = {} > {}"\
+             .format(layout_npoints(layout), RASTER_MAX_POINTS))
+    return layout
+
+
+def _sample_tiles(layout, data_re, stat, step,
+                  pdal_resolution, ensure_las):
+    """Sample a box by tiles of the canonical grid
+
+    Tiles are independent tasks, which are assembled by mosaic.
+    Missing values are not filled.
+
+    :layout: output of '_tile_layout'
+    """
+    tiles = celery.group\
+        ([sample_from_tile.signature\
+          (kwargs = {'row': row,
+                     'col': col,
+                     'size': layout['size'],
+                     'halo': layout['halo'],
+                     'step': step,
+                     'epsg': layout['epsg'],
+                     'data_re': data_re,
+                     'stat': stat,
+                     'pdal_resolution': pdal_resolution,
+                     'ensure_las': ensure_las},
+           immutable = True)
+          for row, col in layout['tiles']])
+    return celery.chord\
+        (tiles, mosaic.signature(kwargs = {'layout': layout}))
+
+
 @call_cache_fn_results(minage = 1650884152)
 def sample_raster(box, data_re, stat, mesh_type, step,
-                  output_type, pdal_resolution, ensure_las = False):
-    check_box_not_too_big(box = box, step = step, mesh_type = mesh_type)
+                  output_type, pdal_resolution, ensure_las = False,
+                  sampling = 'box'):
+    """Sample raster
+
+    Boxes that are too big to sample at once are split in tiles of
+    a canonical grid, see raster.tiles.
+
+    If the requested grid is a subgrid of a registered raster
+    (coarser step or a smaller box), the raster is derived from it
+    without sampling the data sources, see raster.registry.
+
+    Rasters are sampled, registered and derived with missing values,
+    which are filled at the end by fill_raster.
+
+    :sampling: 'box' samples exactly the box. 'tiles' assembles the
+    box from cached tiles of the canonical grid, which are shared by
+    overlapping boxes
+    """
+    if sampling not in ('box', 'tiles'):
+        raise RuntimeError("invalid sampling = {}"\
+                           .format(sampling))
+
+    size = None
+    if is_box_too_big(box = box, step = step, mesh_type = mesh_type):
+        size = RASTER_TILE_SIZE
+    elif 'tiles' == sampling:
+        size = RASTER_SAMPLING_TILE_SIZE
 
     if stat not in ("max","min","count","mean","idw","stdev"):
         raise RuntimeError("""invalid stat = {}
@@ -126,22 +213,51 @@ def sample_raster(box, data_re, stat, mesh_type, step,
         raise RuntimeError("invalid pdal_resolution = {}"\
                            .format(pdal_resolution))
 
+    params = {'data_re': data_re,
+              'stat': stat,
+              'pdal_resolution': pdal_resolution,
+              'ensure_las': ensure_las}
+    # tiles may reach beyond the box
+    check_box = box
+    if size is not None:
+        layout = _tile_layout(box = box, mesh_type = mesh_type,
+                              step = step, size = size)
+        check_box = layout_box(layout)
+        sample = _sample_tiles\
+            (layout = layout, data_re = data_re, stat = stat,
+             step = step, pdal_resolution = pdal_resolution,
+             ensure_las = ensure_las)
+    else:
+        sample = sample_from_box.signature\
+            (kwargs = {'box': box,
+                       'data_re': data_re,
+                       'stat': stat,
+                       'mesh_type': mesh_type,
+                       'step': step,
+                       'pdal_resolution': pdal_resolution,
+                       'ensure_las': ensure_las,
+                       'fill': False},
+             immutable = True)
+
     tasks = celery.chain\
         (check_all_data_available\
          (ensure_las = ensure_las,
-          box = box,
+          box = check_box,
           data_re = data_re,
           stat = stat,
           pdal_resolution = pdal_resolution),\
-         sample_from_box.signature\
-         (kwargs = {'box': box,
-                    'data_re': data_re,
-                    'stat': stat,
-                    'mesh_type': mesh_type,
-                    'step': step,
-                    'pdal_resolution': pdal_resolution,
-                    'ensure_las': ensure_las},
-          immutable = True))
+         sample)
+    if RASTER_REGISTRY:
+        tasks |= register_raster.signature(kwargs = params)
+        tasks = derive_or_sample.signature\
+            (kwargs = dict(params,
+                           box = box,
+                           step = step,
+                           mesh_type = mesh_type,
+                           canonical = size is not None,
+                           sample = tasks),
+             immutable = True)
+    tasks |= fill_raster.signature()
 
     return convert_from_to(tasks,
                            from_type = 'pickle',
@@ -0,0 +1,205 @@
+import json
+import pickle
+import struct
+
+import numpy as np
+
+
+MAGIC = b'PVGRIPR\x01'
+_HEADER = struct.Struct('<8sQ')
+_ALIGN = 64
+
+
+def _align(n):
+    return (n + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+def _json_default(x):
+    if isinstance(x, np.generic):
+        return x.item()
+    if isinstance(x, np.ndarray):
+        return x.tolist()
+    raise TypeError("{} is not JSON serializable".format(type(x)))
+
+
+def _split(data):
+    """Split raster data into arrays and the rest
+
+    :return: (arrays, meta): arrays is a dictionary name -> array,
+    meta is the JSON serializable part of data
+    """
+    arrays = {'raster': np.asarray(data['raster'])}
+    meta = {k: v for k, v in data.items() if k != 'raster'}
+
+    if 'mesh' in meta:
+        meta['mesh'] = dict(meta['mesh'])
+        if 'mesh' in meta['mesh']:
+            lat, lon = meta['mesh'].pop('mesh')
+            arrays['lat'] = np.ascontiguousarray(lat, dtype = float)
+            arrays['lon'] = np.ascontiguousarray(lon, dtype = float)
+
+    return arrays, meta
+
+
+def _write_header(f, arrays, meta):
+    """Write the container header
+
+    :return: (offsets, size): offsets is a dictionary name -> file
+    offset of the array, size is the total file size
+    """
+    offset = 0
+    info = {}
+    for name, arr in arrays.items():
+        info[name] = {'dtype': arr.dtype.str,
+                      'shape': arr.shape,
+                      'offset': offset}
+        offset = _align(offset + arr.nbytes)
+
+    header = json.dumps({'arrays': info, 'meta': meta},
+                        default = _json_default).encode()
+    start = _align(_HEADER.size + len(header))
+
+    f.write(_HEADER.pack(MAGIC, len(header)))
+    f.write(header)
+    return {name: start + x['offset'] for name, x in info.items()}, \
+        start + offset
+
+
+def write_raster(ofn, data):
+    """Write raster data to a container file
+
+    The file consists of a JSON header and raw arrays, aligned to
+    64 bytes, that can be memory-mapped.
+
+    :ofn: output filename
+
+    :data: dictionary with 'raster' array and optionally 'mesh'
+    (output of the 'mesh' function)
+
+    """
+    arrays, meta = _split(data)
+
+    with open(ofn, 'wb') as f:
+        offsets, _ = _write_header(f, arrays, meta)
+        for name, arr in arrays.items():
+            f.seek(offsets[name])
+            f.write(memoryview(np.ascontiguousarray(arr)).cast('B'))
+
+
+def create_raster(ofn, shape, dtype = float, fill = None, **meta):
+    """Create a container file with a raster to be written in parts
+
+    The raster is not held in memory, use windowed writes on the
+    returned memory-map and flush it.
+
+    :ofn: output filename
+
+    :shape: shape of the raster
+
+    :dtype: type of the raster
+
+    :fill: optional value to fill the raster with
+
+    :meta: other fields of the raster data, e.g. 'mesh'
+
+    :return: writable np.memmap of the raster
+    """
+    # a placeholder with the shape and type, but no memory
+    data = dict(meta, raster = np.broadcast_to\
+                (np.zeros((), dtype = dtype), shape))
+    arrays, meta = _split(data)
+
+    with open(ofn, 'wb') as f:
+        offsets, size = _write_header(f, arrays, meta)
+        for name, arr in arrays.items():
+            if 'raster' == name:
+                continue
+            f.seek(offsets[name])
+            f.write(memoryview(arr).cast('B'))
+        f.truncate(size)
+
+    res = np.memmap(ofn, dtype = dtype, mode = 'r+',
+                    offset = offsets['raster'], shape = tuple(shape))
+    if fill is not None:
+        # fill in chunks of about 1M values
+        rows = max(1, 2**20 // max(1, res[0].size))
+        for i in range(0, shape[0], rows):
+            res[i:i+rows] = fill
+    return res
+
+
+def write_pickle(ofn, data):
+    """Write raster data as a pickle
+
+    This is the format rasters had before the container: the raster
+    array and the mesh with lat/lon lists.
+
+    :ofn: output filename
+
+    :data: output of read_raster
+    """
+    data = dict(data, raster = np.asarray(data['raster']))
+    if 'mesh' in data:
+        data['mesh'] = dict(data['mesh'])
+        if 'mesh' in data['mesh']:
+            lat, lon = data['mesh']['mesh']
+            data['mesh']['mesh'] = (np.asarray(lat).tolist(),
+                                    np.asarray(lon).tolist())
+
+    with open(ofn, 'wb') as f:
+        pickle.dump(data, f)
+
+
+def is_container(fn):
+    with open(fn, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def _from_legacy(data):
+    if 'mesh' in data and 'mesh' in data['mesh']:
+        lat, lon = data['mesh']['mesh']
+        data['mesh']['mesh'] = (np.asarray(lat, dtype = float),
+                                np.asarray(lon, dtype = float))
+    return data
+
+
+def read_raster(fn, mmap = True):
+    """Read raster data
+
+    Legacy pickle files are accepted.
+
+    :fn: filename
+
+    :mmap: if True, arrays are memory-mapped copy-on-write, i.e. can
+    be modified without changing the file
+
+    :return: dictionary in the format written by write_raster
+    """
+    with open(fn, 'rb') as f:
+        head = f.read(_HEADER.size)
+        if len(head) < _HEADER.size or head[:len(MAGIC)] != MAGIC:
+            f.seek(0)
+            return _from_legacy(pickle.load(f))
+        _, size = _HEADER.unpack(head)
+        header = json.loads(f.read(size))
+        start = _align(_HEADER.size + size)
+
+        arrays = {}
+        for name, x in header['arrays'].items():
+            shape = tuple(x['shape'])
+            if mmap and np.prod(shape):
+                arrays[name] = np.memmap\
+                    (fn, dtype = x['dtype'], mode = 'c',
+                     offset = start + x['offset'], shape = shape)
+                continue
+
+            f.seek(start + x['offset'])
+            arrays[name] = np.fromfile\
+                (f, dtype = x['dtype'],
+                 count = int(np.prod(shape))).reshape(shape)
+
+    data = header['meta']
+    data['raster'] = arrays['raster']
+    if 'lat' in arrays:
+        data['mesh']['mesh'] = (arrays['lat'], arrays['lon'])
+    return data
@@ -0,0 +1,111 @@
+import os
+import pickle
+import shutil
+
+import numpy as np
+
+from pvgrip.raster.container \
+    import write_raster, read_raster, is_container, \
+    create_raster, write_pickle
+
+
+def _data(dtype = float):
+    return {'raster': np.arange(3*4*2, dtype = dtype)\
+            .reshape(3,4,2),
+            'mesh': {'mesh': ([50.0, 50.1, 50.2],
+                              [6.0, 6.1, 6.2, 6.3]),
+                     'raster_box': (1.0, 2.0, 3.0, 4.0),
+                     'step': np.float64(0.5),
+                     'epsg': 4326}}
+
+
+def test_container(path = 'test_container'):
+    os.makedirs(path, exist_ok = True)
+    try:
+        fn = os.path.join(path, 'raster')
+        for dtype in (float, np.uint8):
+            data = _data(dtype)
+            write_raster(fn, data)
+            assert is_container(fn)
+
+            for mmap in (True, False):
+                res = read_raster(fn, mmap = mmap)
+                assert res['raster'].dtype == dtype
+                assert np.array_equal(res['raster'], data['raster'])
+                assert np.array_equal(res['mesh']['mesh'][0],
+                                      data['mesh']['mesh'][0])
+                assert np.array_equal(res['mesh']['mesh'][1],
+                                      data['mesh']['mesh'][1])
+                assert res['mesh']['step'] == 0.5
+                assert res['mesh']['epsg'] == 4326
+                assert list(res['mesh']['raster_box']) == [1,2,3,4]
+
+            # arrays are modified in memory only
+            res = read_raster(fn)
+            res['raster'] += 1
+            assert np.array_equal(read_raster(fn)['raster'],
+                                  data['raster'])
+
+        write_raster(fn, {'raster': np.ones((2,2))})
+        assert 'mesh' not in read_raster(fn)
+    finally:
+        shutil.rmtree(path)
+
+
+def test_container_legacy(path = 'test_container_legacy'):
+    os.makedirs(path, exist_ok = True)
+    try:
+        fn = os.path.join(path, 'raster')
+        data = _data()
+        with open(fn, 'wb') as f:
+            pickle.dump(data, f)
+
+        assert not is_container(fn)
+        res = read_raster(fn)
+        assert np.array_equal(res['raster'], data['raster'])
+        assert isinstance(res['mesh']['mesh'][0], np.ndarray)
+    finally:
+        shutil.rmtree(path)
+
+
+def test_create_raster(path = 'test_create_raster'):
+    os.makedirs(path, exist_ok = True)
+    try:
+        fn = os.path.join(path, 'raster')
+        data = _data()
+        out = create_raster(fn, shape = data['raster'].shape,
+                            fill = -9999, mesh = data['mesh'])
+        assert (out == -9999).all()
+        out[1:,2:] = data['raster'][1:,2:]
+        out.flush()
+        del out
+
+        res = read_raster(fn)
+        assert np.array_equal(res['raster'][1:,2:],
+                              data['raster'][1:,2:])
+        assert (res['raster'][:1] == -9999).all()
+        assert (res['raster'][:,:2] == -9999).all()
+        assert np.array_equal(res['mesh']['mesh'][1],
+                              data['mesh']['mesh'][1])
+        assert res['mesh']['epsg'] == 4326
+    finally:
+        shutil.rmtree(path)
+
+
+def test_write_pickle(path = 'test_write_pickle'):
+    os.makedirs(path, exist_ok = True)
+    try:
+        fn = os.path.join(path, 'raster')
+        data = _data()
+        write_raster(fn, data)
+        write_pickle(fn + '.pickle', read_raster(fn))
+
+        with open(fn + '.pickle', 'rb') as f:
+            res = pickle.load(f)
+        assert type(res['raster']) is np.ndarray
+        assert np.array_equal(res['raster'], data['raster'])
+        assert res['mesh']['mesh'] == \
+            tuple(list(x) for x in data['mesh']['mesh'])
+        assert res['mesh']['epsg'] == 4326
+    finally:
+        shutil.rmtree(path)
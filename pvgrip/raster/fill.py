@@ -0,0 +1,199 @@
+import numpy as np
+
+from scipy import ndimage as nd
+from scipy import sparse
+from scipy.sparse import linalg as splinalg
+
+
+# 8-connectivity of missing islands
+_STRUCTURE = np.ones((3,3), dtype = bool)
+
+
+def _nearest_full(channel, missing, out):
+    """Fill the whole channel with the nearest value
+
+    Indices are computed as int32 to halve the memory.
+    """
+    ind = np.empty((2,) + channel.shape, dtype = np.int32)
+    nd.distance_transform_edt(missing, return_distances = False,
+                              return_indices = True, indices = ind)
+    out[missing] = channel[ind[0][missing], ind[1][missing]]
+
+
+def _expand(window, margin, shape):
+    return tuple(slice(max(0, w.start - margin),
+                       min(n, w.stop + margin))
+                 for w, n in zip(window, shape))
+
+
+def _edge_distance(window, shape):
+    """Distance of window cells to the window sides
+
+    Sides at the raster border are at infinite distance.
+    """
+    res = []
+    for w, n in zip(window, shape):
+        i = np.arange(w.start, w.stop, dtype = float)
+        lo = i - w.start + 1 if w.start > 0 else np.inf
+        hi = w.stop - i if w.stop < n else np.inf
+        res += [np.minimum(lo, hi) + np.zeros(len(i))]
+    return np.minimum(res[0][:,None], res[1][None,:])
+
+
+def _nearest_island(channel, missing, labels, label, window, out):
+    """Fill an island with the nearest values
+
+    The window around the island is grown until no valid cell
+    outside of it can be closer than the one found inside.
+    """
+    margin = 1
+    while True:
+        win = _expand(window, margin, channel.shape)
+        if not missing[win].all():
+            dist, ind = nd.distance_transform_edt\
+                (missing[win], return_distances = True,
+                 return_indices = True)
+            sel = labels[win] == label
+            edge = _edge_distance(win, channel.shape)
+            if (dist[sel] <= edge[sel]).all():
+                out[win][sel] = channel[win][tuple(ind)][sel]
+                return
+        margin *= 4
+
+
+def _neighbours(sel, shape):
+    """4-neighbours of cells
+
+    :sel: tuple of row and column indices
+
+    :return: list of (cell number, neighbour row, neighbour column)
+    """
+    res = []
+    for dr, dc in ((-1,0),(1,0),(0,-1),(0,1)):
+        r, c = sel[0] + dr, sel[1] + dc
+        ok = (r >= 0) & (r < shape[0]) & (c >= 0) & (c < shape[1])
+        res += [(np.nonzero(ok)[0], r[ok], c[ok])]
+    return res
+
+
+def _laplace_island(channel, missing, labels, label, window, out):
+    """Fill an island by solving the Laplace equation
+
+    Valid cells around the island are the boundary conditions.
+    """
+    win = _expand(window, 1, channel.shape)
+    sel = np.nonzero(labels[win] == label)
+    n = len(sel[0])
+    number = np.full(labels[win].shape, -1)
+    number[sel] = np.arange(n)
+
+    rows, cols, rhs = [], [], np.zeros(n)
+    degree = np.zeros(n)
+    for i, r, c in _neighbours(sel, number.shape):
+        degree[i] += 1
+        j = number[r, c]
+        inside = j >= 0
+        rows += [i[inside]]
+        cols += [j[inside]]
+        # missing cells of other islands are not neighbours
+        valid = ~inside & ~missing[win][r, c]
+        np.add.at(rhs, i[valid], channel[win][r[valid], c[valid]])
+        degree[i[~inside & ~valid]] -= 1
+
+    rows, cols = np.concatenate(rows), np.concatenate(cols)
+    A = sparse.csr_matrix\
+        ((np.concatenate([degree, -np.ones(len(rows))]),
+          (np.concatenate([np.arange(n), rows]),
+           np.concatenate([np.arange(n), cols]))),
+         shape = (n, n))
+    out[win][sel] = splinalg.spsolve(A, rhs)
+
+
+def _idw_island(channel, missing, labels, label, window, out,
+                power = 2, max_sources = 256, chunk = 2**12):
+    """Fill an island by inverse distance weighting
+
+    Valid cells at the island border are the sources.
+    """
+    win = _expand(window, 1, channel.shape)
+    island = labels[win] == label
+    border = nd.binary_dilation(island, structure = _STRUCTURE) \
+        & ~missing[win]
+    src = np.nonzero(border)
+    if len(src[0]) > max_sources:
+        keep = np.linspace(0, len(src[0]) - 1, max_sources)\
+                 .astype(int)
+        src = (src[0][keep], src[1][keep])
+    values = channel[win][src]
+
+    sel = np.nonzero(island)
+    res = np.empty(len(sel[0]))
+    for i in range(0, len(sel[0]), chunk):
+        r = sel[0][i:i+chunk, None] - src[0][None,:]
+        c = sel[1][i:i+chunk, None] - src[1][None,:]
+        w = (r**2 + c**2).astype(float) ** (-power/2)
+        res[i:i+chunk] = w @ values / w.sum(axis = 1)
+    out[win][sel] = res
+
+
+_METHODS = {'nearest': _nearest_island,
+            'laplace': _laplace_island,
+            'idw': _idw_island}
+
+
+def _fill_channel(channel, missing, out, method, max_islands):
+    labels, nislands = nd.label(missing, structure = _STRUCTURE)
+    if 'nearest' == method and nislands > max_islands:
+        _nearest_full(channel = channel, missing = missing, out = out)
+        return
+
+    for label, window in enumerate(nd.find_objects(labels), start = 1):
+        _METHODS[method](channel = channel, missing = missing,
+                         labels = labels, label = label,
+                         window = window, out = out)
+
+
+def fill_missing(data, missing_value = -9999, method = 'nearest',
+                 max_islands = 64, inplace = False):
+    """Replace the value of missing 'data' cells (indicated by
+    'missing_value')
+
+    Each channel is filled separately in 2-D. Only windows around
+    islands of missing cells are processed.
+
+    :data: array (rows, columns) or (rows, columns, channels)
+
+    :method: 'nearest' uses the value of the nearest valid cell,
+    'idw' the inverse distance weighted values of valid cells around
+    an island, 'laplace' solves the Laplace equation with valid cells
+    around an island as boundary conditions
+
+    :max_islands: with more islands in a channel the nearest values
+    are computed for the whole channel at once
+
+    :inplace: if True, data is filled in place, e.g. a copy-on-write
+    memory-map of a raster
+
+    :return: array of the same shape. data itself if no cells are
+    missing. Channels without valid cells are left as they are
+    """
+    if method not in _METHODS:
+        raise RuntimeError("invalid method = {}".format(method))
+
+    data = np.asarray(data)
+    channels = data[:,:,None] if 2 == data.ndim else data
+
+    res = None
+    for i in range(channels.shape[2]):
+        missing = channels[:,:,i] == missing_value
+        if not missing.any() or missing.all():
+            continue
+        if res is None:
+            res = channels if inplace else np.array(channels)
+        _fill_channel(channels[:,:,i], missing = missing,
+                      out = res[:,:,i], method = method,
+                      max_islands = max_islands)
+
+    if res is None:
+        return data
+    return res.reshape(data.shape)
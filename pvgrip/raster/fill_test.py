@@ -0,0 +1,80 @@
+import pytest
+
+import numpy as np
+
+from pvgrip.raster.fill \
+    import fill_missing
+
+
+def _data(shape, seed = 0):
+    rng = np.random.default_rng(seed)
+    data = rng.uniform(0, 100, shape)
+    # a large island, small islands and a missing border
+    data[10:30, 20:45, 0] = -9999
+    data[rng.random(shape) < 0.02] = -9999
+    data[:3, :, 1] = -9999
+    return data
+
+
+def _brute_force(channel, missing_value = -9999):
+    """Distance to the nearest valid cell"""
+    valid = np.argwhere(channel != missing_value)
+    res = np.zeros(channel.shape)
+    for r, c in np.argwhere(channel == missing_value):
+        res[r, c] = np.sqrt(((valid - [r, c])**2).sum(axis = 1)).min()
+    return res
+
+
+@pytest.mark.parametrize('max_islands', [1000, 0])
+def test_fill_nearest(max_islands):
+    data = _data((60, 70, 2))
+    res = fill_missing(data, max_islands = max_islands)
+
+    assert res.shape == data.shape
+    assert not (res == -9999).any()
+    for i in range(data.shape[2]):
+        channel = data[:,:,i]
+        dist = _brute_force(channel)
+        for r, c in np.argwhere(channel == -9999):
+            # filled by a value found at the nearest distance
+            rr, cc = np.nonzero(channel == res[r, c, i])
+            assert np.isclose\
+                (np.sqrt((rr - r)**2 + (cc - c)**2).min(),
+                 dist[r, c])
+
+
+@pytest.mark.parametrize('method', ['idw', 'laplace'])
+def test_fill_smooth(method):
+    data = np.tile(np.arange(50, dtype = float), (40, 1))
+    data[10:20, 10:30] = -9999
+    data[35:, 45:] = -9999
+    res = fill_missing(data, method = method)
+
+    assert not (res == -9999).any()
+    assert (res >= 0).all() and (res <= 49).all()
+    if 'laplace' == method:
+        # a linear field is harmonic
+        assert np.allclose(res[10:20, 10:30],
+                           np.arange(10, 30)[None,:])
+
+
+def test_fill_nothing_missing():
+    data = np.ones((5, 6, 2))
+    assert fill_missing(data) is data
+
+    data[:,:,1] = -9999
+    data[2,3,0] = -9999
+    res = fill_missing(data)
+    assert (res[:,:,0] == 1).all()
+    assert (res[:,:,1] == -9999).all()
+
+
+@pytest.mark.parametrize('max_islands', [1000, 0])
+def test_fill_inplace(max_islands):
+    data = _data((60, 70, 2))
+    expected = fill_missing(data, max_islands = max_islands)
+
+    res = fill_missing(data, max_islands = max_islands,
+                       inplace = True)
+    assert np.shares_memory(res, data)
+    assert np.array_equal(data, expected)
@@ -1,6 +1,11 @@
+import contextlib
+
 import numpy as np
 from lazy import lazy
 
+from pvgrip.utils.epsg \
+    import epsg2epsg
+
 
 # Originally based on https://stackoverflow.com/questions/13439357/extract-point-from-raster-in-gdal
 class GDALInterface(object):
@@ -112,18 +117,38 @@ class GDALInterface(object):
         return self._make3channels(res)
 
 
+    def _get_pixels_array(self, lon, lat, epsg = 4326):
+        """Get pixel indices of points
+
+        :lon, lat: arrays of coordinates
+
+        :epsg: coordinate system of points
+
+        :return: (rows, cols) integer arrays. Points that cannot be
+        transformed get index -1
+        """
+        v, u = epsg2epsg(lat = np.asarray(lat, dtype = float),
+                         lon = np.asarray(lon, dtype = float),
+                         fr = epsg, to = self.epsg)
+        u = np.asarray(u, dtype = float) - self.geo_transform_inv[0]
+        v = np.asarray(v, dtype = float) - self.geo_transform_inv[3]
+
+        rows = self.geo_transform_inv[4] * u \
+            + self.geo_transform_inv[5] * v
+        cols = self.geo_transform_inv[1] * u \
+            + self.geo_transform_inv[2] * v
+
+        # truncate towards zero as int() does
+        valid = np.isfinite(rows) & np.isfinite(cols)
+        rows = np.where(valid, np.trunc(rows), -1).astype(np.int64)
+        cols = np.where(valid, np.trunc(cols), -1).astype(np.int64)
+        return rows, cols
+
+
     def _get_pixels(self, points):
-        data = self._coordinate_transform\
-                   .TransformPoints(points)
-        data = [(u - self.geo_transform_inv[0],
-                 v - self.geo_transform_inv[3])
-                for u,v,_ in data]
-        data = [(int(self.geo_transform_inv[4] * u +\
-                     self.geo_transform_inv[5] * v),
-                 int(self.geo_transform_inv[1] * u + \
-                     self.geo_transform_inv[2] * v)) \
-                for u,v in data]
-        return data
+        points = np.asarray(points, dtype = float).reshape(-1, 2)
+        rows, cols = self._get_pixels_array(points[:,0], points[:,1])
+        return list(zip(rows.tolist(), cols.tolist()))
 
 
     def _get_box(self, box):
@@ -155,6 +180,130 @@ class GDALInterface(object):
         return args
 
 
+    def _box_array(self, box):
+        if box:
+            args = self._get_box(box)
+        else:
+            args = {'xoff': 0, 'yoff': 0,
+                    'xsize': self.src.RasterXSize,
+                    'ysize': self.src.RasterYSize}
+        return args, self._slice_array(**args)
+
+
+    def _inside(self, x, y, epsg, args, raster):
+        """Indices of points inside a raster window and their values
+        """
+        rows, cols = self._get_pixels_array(x, y, epsg = epsg)
+        rows -= args['yoff']
+        cols -= args['xoff']
+        inside = np.flatnonzero\
+            ((0 <= rows) & (rows < raster.shape[0]) \
+             & (0 <= cols) & (cols < raster.shape[1]))
+        return inside, raster[rows[inside], cols[inside]]
+
+
+    def _gather(self, x, y, epsg, args, raster, out):
+        inside, values = self._inside(x, y, epsg, args, raster)
+        out[inside] = values
+
+
+    def _fold(self, x, y, epsg, args, raster, out, lock):
+        inside, values = self._inside(x, y, epsg, args, raster)
+        with lock:
+            out[inside] = np.maximum(out[inside], values)
+
+
+    def _grid_chunks(self, x, y, chunk):
+        """Split a grid in chunks of rows
+
+        :return: generator of (offset, x, y)
+        """
+        step = max(1, chunk // max(1, len(y)))
+        for i in range(0, len(x), step):
+            xi = x[i:i+step]
+            yield i*len(y), np.repeat(xi, len(y)), np.tile(y, len(xi))
+
+
+    def lookup_array(self, x, y, box = None, epsg = 4326):
+        """Lookup values of points
+
+        :x, y: arrays of longitudes and latitudes
+
+        :box: optional box [lat_min,lon_min,lat_max,lon_max] where all
+        points belong to
+
+        :epsg: coordinate system of points
+
+        :return: array of shape (number of points, number of
+        channels). Points outside of the raster are SEA_LEVEL
+        """
+        args, raster = self._box_array(box)
+        res = np.full((len(x), raster.shape[2]),
+                      self.SEA_LEVEL, dtype = float)
+        self._gather(x, y, epsg, args, raster, res)
+        return res
+
+
+    def lookup_grid(self, x, y, box = None, epsg = 4326,
+                    chunk = 2**20):
+        """Lookup values on a grid
+
+        Points are not materialized at once, but in chunks of about
+        'chunk' points.
+
+        :x, y: vectors of longitudes and latitudes
+
+        :box, epsg: see 'lookup_array'
+
+        :return: array of shape (len(x)*len(y), number of
+        channels). Points are ordered as in itertools.product(x, y)
+        """
+        x = np.asarray(x, dtype = float)
+        y = np.asarray(y, dtype = float)
+        args, raster = self._box_array(box)
+        res = np.full((len(x)*len(y), raster.shape[2]),
+                      self.SEA_LEVEL, dtype = float)
+
+        for i, xi, yi in self._grid_chunks(x, y, chunk):
+            self._gather(xi, yi, epsg, args, raster,
+                         res[i:i+len(xi)])
+        return res
+
+
+    def fold_array(self, x, y, out, box = None, epsg = 4326,
+                   lock = None):
+        """Take maximum of values of points and 'out' inplace
+
+        :x, y, box, epsg: see 'lookup_array'
+
+        :out: array of shape (number of points, number of channels)
+
+        :lock: optional lock guarding 'out'
+        """
+        lock = lock or contextlib.nullcontext()
+        args, raster = self._box_array(box)
+        self._fold(x, y, epsg, args, raster, out, lock)
+
+
+    def fold_grid(self, x, y, out, box = None, epsg = 4326,
+                  lock = None, chunk = 2**20):
+        """Take maximum of values on a grid and 'out' inplace
+
+        :x, y, box, epsg, chunk: see 'lookup_grid'
+
+        :out: array of shape (len(x)*len(y), number of channels)
+
+        :lock: optional lock guarding 'out'
+        """
+        lock = lock or contextlib.nullcontext()
+        x = np.asarray(x, dtype = float)
+        y = np.asarray(y, dtype = float)
+        args, raster = self._box_array(box)
+        for i, xi, yi in self._grid_chunks(x, y, chunk):
+            self._fold(xi, yi, epsg, args, raster,
+                       out[i:i+len(xi)], lock)
+
+
     def lookup(self, points, box = None):
         """Lookup values of points
 
@@ -165,26 +314,9 @@ class GDALInterface(object):
 
         :return: a list of values
         """
-        points = self._get_pixels(points)
-        if box:
-            args = self._get_box(box)
-        else:
-            args = {'xoff': 0, 'yoff': 0,
-                    'xsize': self.src.RasterXSize,
-                    'ysize': self.src.RasterYSize}
-        raster = self._slice_array(**args)
-
-        res = []
-        for y,x in points:
-            y -= args['yoff']
-            x -= args['xoff']
-            if 0 <= y < raster.shape[0] \
-               and 0 <= x < raster.shape[1]:
-                res += [raster[y,x]]
-            else:
-                res += [self.SEA_LEVEL*np.ones((self.src.RasterCount,))]
-
-        return res
+        points = np.asarray(points, dtype = float).reshape(-1, 2)
+        return list(self.lookup_array(points[:,0], points[:,1],
+                                      box = box))
 
 
     def lookup_one(self, lat, lon):
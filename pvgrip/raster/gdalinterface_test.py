@@ -0,0 +1,65 @@
+import os
+import shutil
+import pytest
+
+import numpy as np
+
+pytest.importorskip('osgeo')
+
+from pvgrip.raster.io \
+    import save_gdal
+from pvgrip.raster.gdalinterface \
+    import GDALInterface
+
+
+def _legacy_lookup(interface, points):
+    # point by point lookup with osr transformations
+    data = interface._coordinate_transform.TransformPoints(points)
+    inv = interface.geo_transform_inv
+    raster = interface.points_array
+    res = []
+    for u, v, _ in data:
+        u, v = u - inv[0], v - inv[3]
+        y, x = int(inv[4]*u + inv[5]*v), int(inv[1]*u + inv[2]*v)
+        if 0 <= y < raster.shape[0] and 0 <= x < raster.shape[1]:
+            res += [raster[y,x]]
+        else:
+            res += [interface.SEA_LEVEL*np.ones((raster.shape[2],))]
+    return np.array(res, dtype = float)
+
+
+def _geotiff(fn, epsg, xmin, ymax, step):
+    rng = np.random.default_rng(0)
+    array = rng.normal(size = (50, 60, 2))
+    save_gdal(fn, array, (xmin, step, 0, ymax, 0, -step), epsg)
+    return fn
+
+
+@pytest.mark.parametrize('epsg,xmin,ymax,step,box',
+                         [(4326, 6.0, 50.5, 0.01,
+                           [50.0, 6.0, 50.5, 6.6]),
+                          (25832, 300000, 5600000, 10,
+                           [50.5, 6.17, 50.52, 6.2])])
+def test_lookup_array(epsg, xmin, ymax, step, box,
+                      path = 'test_lookup_array'):
+    os.makedirs(path, exist_ok = True)
+    try:
+        fn = _geotiff(os.path.join(path, 'raster.tif'),
+                      epsg, xmin, ymax, step)
+        interface = GDALInterface(fn)
+
+        rng = np.random.default_rng(1)
+        lat = rng.uniform(box[0] - 0.05, box[2] + 0.05, 1000)
+        lon = rng.uniform(box[1] - 0.05, box[3] + 0.05, 1000)
+        points = list(zip(lon.tolist(), lat.tolist()))
+
+        expected = _legacy_lookup(interface, points)
+        assert (expected == interface.SEA_LEVEL).any()
+        assert (expected != interface.SEA_LEVEL).any()
+
+        assert np.array_equal\
+            (interface.lookup_array(lon, lat), expected)
+        assert np.array_equal\
+            (np.array(interface.lookup(points)), expected)
+    finally:
+        shutil.rmtree(path)
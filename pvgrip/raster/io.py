@@ -1,7 +1,6 @@
 import os
 import cv2
 import shutil
-import pickle
 
 import numpy as np
 
@@ -13,6 +12,8 @@ from pvgrip.raster.gdalinterface \
     import GDALInterface
 from pvgrip.raster.addscale \
     import addscale
+from pvgrip.raster.container \
+    import write_raster
 from pvgrip.utils.files \
     import get_tempdir
 from pvgrip.utils.run_command \
@@ -78,11 +79,11 @@ def save_geotiff(data, ofn):
 
 
 def save_pickle(geotiff_fn, ofn):
-    """Save pickle from a geotiff
+    """Save raster container from a geotiff
 
     :geotiff_fn: input filename
 
-    :ofn: output filename. pickle in the same format as
+    :ofn: output filename. raster container in the same format as
     _sample_from_box
 
     """
@@ -99,9 +100,8 @@ def save_pickle(geotiff_fn, ofn):
     # itself are in arbitrary coordinate system...
     mesh['epsg'] = 4326
 
-    with open(ofn,'wb') as f:
-        pickle.dump({'raster': raster.points_array,
-                     'mesh': mesh}, f)
+    write_raster(ofn, {'raster': raster.points_array,
+                       'mesh': mesh})
 
 
 def save_png(data, ofn, normalize,
@@ -57,7 +57,7 @@ def _mesh_epsg(box, step, epsg):
     :epsg: integer code for the coordinate system
 
     :return: dictionary with 'mesh', 'raster_box', and 'step': 'mesh'
-    is a tuple of lon and lat coordinates defining the
+    is a tuple of lat and lon arrays of coordinates defining the
     grid. 'raster_box' and 'step' define what needed to make a
     georaster
 
@@ -67,15 +67,44 @@ def _mesh_epsg(box, step, epsg):
 
     lat = np.arange(box_mt[0], box_mt[2], step)
     lon = np.arange(box_mt[1], box_mt[3], step)
-
-    lat = [epsg2ll(i, box_mt[1], epsg = epsg)[0] for i in lat]
-    lon = [epsg2ll(box_mt[0], i, epsg = epsg)[1] for i in lon]
+    return _mesh_arrays(lat = lat, lon = lon, box_mt = box_mt,
+                        step = step, epsg = epsg)
+
+
+def _mesh_arrays(lat, lon, box_mt, step, epsg):
+    # latitudes along the west and longitudes along the south edge
+    nlat = len(lat)
+    lat, lon = epsg2ll\
+        (lat = np.concatenate((lat, np.full(len(lon), box_mt[0]))),
+         lon = np.concatenate((np.full(nlat, box_mt[1]), lon)),
+         epsg = epsg)
+    lat, lon = lat[:nlat], lon[nlat:]
     return {'mesh': (lat,lon),
             'raster_box': box_mt,
             'step': step,
             'epsg': epsg}
 
 
+def index_mesh(index, step, epsg):
+    """Generate mesh on the canonical grid of a given step
+
+    Points of the canonical grid have coordinates that are integer
+    multiples of the step. Meshes of adjacent boxes fit together.
+
+    :index: (lat_min, lon_min, lat_max, lon_max) integer indices of
+    the grid points in the epsg coordinate system, max are exclusive
+
+    :step, epsg: see '_mesh_epsg'
+
+    :return: see '_mesh_epsg'
+    """
+    lat = np.arange(index[0], index[2]) * step
+    lon = np.arange(index[1], index[3]) * step
+    box_mt = tuple(float(x * step) for x in index)
+    return _mesh_arrays(lat = lat, lon = lon, box_mt = box_mt,
+                        step = step, epsg = epsg)
+
+
 def mesh(box, step, mesh_type):
     epsg = determine_epsg(box = box, mesh_type = mesh_type)
     return _mesh_epsg(box = box, step = step, epsg = epsg)
@@ -86,3 +115,15 @@ def mesh2box(mesh):
     box = epsg2ll(lat = boxmt[0], lon = boxmt[1], epsg = mesh['epsg']) \
         + epsg2ll(lat = boxmt[2], lon = boxmt[3], epsg = mesh['epsg'])
     return box, mesh['epsg']
+
+
+def mesh_points(grid):
+    """Coordinates of all points of a mesh
+
+    :grid: output of 'mesh'
+
+    :return: (lon, lat) arrays ordered as
+    itertools.product(*grid['mesh'][::-1])
+    """
+    lat, lon = grid['mesh']
+    return np.repeat(lon, len(lat)), np.tile(lat, len(lon))
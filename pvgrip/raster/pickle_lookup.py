@@ -1,24 +1,256 @@
-import os
-import shutil
-
 import numpy as np
 
-import pvgrip.raster.io as io
+from pvgrip.utils.epsg \
+    import epsg2epsg
+
+
+SEA_LEVEL = -9999
+
+
+def _check_raster(data):
+    if 'raster' not in data:
+        raise RuntimeError('"raster" field is not in pickle!')
+    if 'mesh' not in data:
+        raise RuntimeError('"mesh" field is not in pickle!')
+    if 'raster_box' not in data['mesh']:
+        raise RuntimeError\
+            ('"raster_box" field is not in data["mesh"]!')
+    if 'epsg' not in data['mesh']:
+        raise RuntimeError\
+            ('"epsg" field is not in data["mesh"]!')
+
+
+def _pixels(data, x, y, epsg):
+    """Fractional pixel coordinates of points
+
+    The arithmetic follows the geotransform that io.save_geotiff
+    writes and GDALInterface inverts, so that the nearest pixels are
+    the same as in a GeoTIFF lookup.
+
+    :x, y: arrays of longitudes and latitudes
+
+    :epsg: coordinate system of points
+
+    :return: (rows, cols) float arrays
+    """
+    ymin, xmin, ymax, xmax = data['mesh']['raster_box']
+    nrows, ncols = data['raster'].shape[:2]
+    xres = (xmax - xmin)/float(ncols)
+    yres = (ymax - ymin)/float(nrows)
+    dev = xres * -yres
+
+    v, u = epsg2epsg(lat = np.asarray(y, dtype = float),
+                     lon = np.asarray(x, dtype = float),
+                     fr = epsg, to = data['mesh']['epsg'])
+    rows = xres / dev * (np.asarray(v, dtype = float) - ymax)
+    cols = -yres / dev * (np.asarray(u, dtype = float) - xmin)
+    return rows, cols
+
+
+def _trunc(a):
+    # truncate towards zero as int() does
+    return np.where(np.isfinite(a), np.trunc(a), -1).astype(np.int64)
+
+
+def _snap(a, eps = 1e-6):
+    # mesh points lie on pixel borders up to rounding errors
+    r = np.round(a)
+    return np.where(np.abs(a - r) < eps, r, a)
+
+
+def _window(data, box, epsg):
+    """Part of the raster that covers a box
+
+    Same as GDALInterface._get_box
+
+    :return: (row_min, col_min, row_max, col_max), max exclusive
+    """
+    nrows, ncols = data['raster'].shape[:2]
+    if not box:
+        return 0, 0, nrows, ncols
+
+    rows, cols = _pixels(data,
+                         x = [box[1], box[3], box[1], box[3]],
+                         y = [box[0], box[2], box[2], box[0]],
+                         epsg = epsg)
+    rows, cols = _trunc(rows), _trunc(cols)
+    yoff = min(rows[1], rows[2])
+    xoff = min(cols[0], cols[2])
+    ysize = max(rows[0], rows[3]) - yoff + 1
+    xsize = max(cols[1], cols[3]) - xoff + 1
+    yoff, xoff = max(yoff, 0), max(xoff, 0)
+    return yoff, xoff, \
+        min(yoff + ysize, nrows), min(xoff + xsize, ncols)
+
+
+def _nearest(raster, rows, cols):
+    return raster[_trunc(rows), _trunc(cols)]
+
+
+def _bilinear(raster, rows, cols):
+    # values are located at the mesh points, which are the lower
+    # left corners of the pixels
+    nrows, ncols = raster.shape[:2]
+    rows = np.clip(rows - 1, 0, nrows - 1)
+    cols = np.clip(cols, 0, ncols - 1)
+    r0 = np.floor(rows).astype(np.int64)
+    c0 = np.floor(cols).astype(np.int64)
+    r1 = np.minimum(r0 + 1, nrows - 1)
+    c1 = np.minimum(c0 + 1, ncols - 1)
+    wr = (rows - r0)[:,None]
+    wc = (cols - c0)[:,None]
+    return (1 - wr) * ((1 - wc) * raster[r0,c0] + wc * raster[r0,c1]) \
+        + wr * ((1 - wc) * raster[r1,c0] + wc * raster[r1,c1])
+
+
+def _area(raster, rows, cols, size):
+    # average of all mesh points within [x, x + size) x [y, y + size)
+    nrows, ncols, nch = raster.shape
+    srows, scols = size
+    r0 = np.clip(np.floor(rows - srows), 0, nrows).astype(np.int64)
+    r1 = np.clip(np.floor(rows), 0, nrows).astype(np.int64)
+    c0 = np.clip(np.ceil(cols), 0, ncols).astype(np.int64)
+    c1 = np.clip(np.ceil(cols + scols), 0, ncols).astype(np.int64)
+
+    csum = np.zeros((nrows + 1, ncols + 1, nch))
+    csum[1:,1:] = raster.cumsum(axis = 0).cumsum(axis = 1)
+    count = ((r1 - r0) * (c1 - c0))[:,None]
+    total = csum[r1,c1] - csum[r0,c1] - csum[r1,c0] + csum[r0,c0]
+
+    # footprints smaller than a pixel contain no mesh points
+    empty = count[:,0] <= 0
+    res = total / np.maximum(count, 1)
+    res[empty] = _nearest(raster, rows[empty], cols[empty])
+    return res
+
+
+def pickle_lookup(raster, points, box = None,
+                  method = 'nearest', size = None, epsg = 4326):
+    """Lookup values of points in a raster
+
+    :raster: raster data (output of sample_raster)
+
+    :points: list or array of (lon, lat)
+
+    :box: optional box [lat_min,lon_min,lat_max,lon_max] where all
+    points belong to
+
+    :method: 'nearest', 'bilinear' or 'area'
+
+    :size: footprint size for the 'area' method in units of the
+    raster coordinate system. By default the raster step
+
+    :epsg: coordinate system of points
+
+    :return: array of shape (number of points, number of
+    channels). Points outside of the raster are SEA_LEVEL
+    """
+    _check_raster(raster)
+    if method not in ('nearest', 'bilinear', 'area'):
+        raise RuntimeError("method = {} is not supported"\
+                           .format(method))
+
+    array = raster['raster']
+    if 2 == len(array.shape):
+        array = array[:,:,None]
+    points = np.asarray(points, dtype = float).reshape(-1, 2)
+    rows, cols = _pixels(raster, x = points[:,0], y = points[:,1],
+                         epsg = epsg)
+
+    rmin, cmin, rmax, cmax = _window(raster, box, epsg)
+    if 'nearest' == method:
+        inside = (rmin <= _trunc(rows)) & (_trunc(rows) < rmax) \
+            & (cmin <= _trunc(cols)) & (_trunc(cols) < cmax)
+    else:
+        # the south and east borders are mesh points as well
+        rows, cols = _snap(rows), _snap(cols)
+        inside = (rmin <= rows) & (rows <= rmax) \
+            & (cmin <= cols) & (cols <= cmax)
+    rows, cols = rows[inside], cols[inside]
+
+    res = np.full((len(points), array.shape[2]),
+                  SEA_LEVEL, dtype = float)
+    if 'nearest' == method:
+        res[inside] = _nearest(array, rows, cols)
+    elif 'bilinear' == method:
+        res[inside] = _bilinear(array, rows, cols)
+    else:
+        ymin, xmin, ymax, xmax = raster['mesh']['raster_box']
+        if size is None:
+            size = raster['mesh']['step']
+        size = (size * array.shape[0] / (ymax - ymin),
+                size * array.shape[1] / (xmax - xmin))
+        res[inside] = _area(array, rows, cols, size)
+    return res
+
+
+def _block_weights(factor):
+    """Weights of mesh points in a footprint of 'factor' steps
+
+    The footprint is centred at a mesh point, every mesh point
+    represents a pixel of one step centred at it. For even factors
+    the border pixels are halved.
+
+    :return: (offsets, weights)
+    """
+    half = factor / 2.0
+    offsets = np.arange(-(factor // 2), factor // 2 + 1)
+    weights = np.minimum(offsets + 0.5, half) \
+        - np.maximum(offsets - 0.5, -half)
+    return offsets[weights > 0], weights[weights > 0]
+
+
+def _block_sum(array, factor, axis):
+    # weighted sums over footprints centred at every factor-th
+    # point along an axis, points outside of the array are skipped
+    offsets, weights = _block_weights(factor)
+    n = array.shape[axis]
+    pad = [(0, 0)] * len(array.shape)
+    pad[axis] = (-offsets[0], offsets[-1])
+    array = np.pad(array, pad)
+
+    res = 0
+    for offset, weight in zip(offsets - offsets[0], weights):
+        res = res + weight * np.take\
+            (array, np.arange(offset, offset + n, factor), axis = axis)
+    return res
+
+
+def block_average(raster, factor):
+    """Downsample raster by averaging blocks of pixels
+
+    The resulting mesh is every 'factor'-th point of the original
+    mesh. Blocks are centred at the resulting mesh points and are
+    incomplete at the raster borders. Missing values (SEA_LEVEL) are
+    not averaged, blocks without values are SEA_LEVEL.
+
+    :raster: raster data (output of sample_raster)
 
-from pvgrip.raster.gdalinterface \
-    import GDALInterface
+    :factor: integer block size
 
-from pvgrip.utils.files \
-    import get_tempdir
+    :return: raster data
+    """
+    _check_raster(raster)
+    array = raster['raster']
+    if 2 == len(array.shape):
+        array = array[:,:,None]
+    lat, lon = raster['mesh']['mesh']
 
+    # the mesh starts at the south, rows are ordered from north
+    array = array[::-1]
+    valid = array != SEA_LEVEL
+    total = _block_sum(_block_sum(np.where(valid, array, 0.0),
+                                  factor, axis = 0),
+                       factor, axis = 1)
+    count = _block_sum(_block_sum(valid.astype(float),
+                                  factor, axis = 0),
+                       factor, axis = 1)
+    res = np.full(total.shape, SEA_LEVEL, dtype = float)
+    np.divide(total, count, out = res, where = count > 0)
+    res = res[::-1]
 
-def pickle_lookup(raster, points, box):
-    wdir = get_tempdir()
-    try:
-        tifffn = os.path.join(wdir, 'geotiff')
-        io.save_geotiff(raster, tifffn)
-        interface = GDALInterface(tifffn)
-        return np.array(interface.lookup(points = points,
-                                         box = box))
-    finally:
-        shutil.rmtree(wdir)
+    mesh = dict(raster['mesh'])
+    mesh['mesh'] = (np.asarray(lat)[::factor],
+                    np.asarray(lon)[::factor])
+    mesh['step'] = raster['mesh']['step'] * factor
+    return {'raster': res, 'mesh': mesh}
@@ -0,0 +1,139 @@
+import os
+import shutil
+import pytest
+
+import numpy as np
+
+from pvgrip.raster.mesh \
+    import mesh, mesh2box, mesh_points
+from pvgrip.raster.pickle_lookup \
+    import pickle_lookup, block_average, SEA_LEVEL
+
+
+def _raster(box, step, mesh_type):
+    grid = mesh(box = box, step = step, mesh_type = mesh_type)
+    rng = np.random.default_rng(0)
+    # values representable in a Float32 GeoTIFF
+    array = rng.normal(size = (len(grid['mesh'][0]),
+                               len(grid['mesh'][1]), 2))\
+               .astype(np.float32).astype(float)
+    return {'raster': array, 'mesh': grid}
+
+
+def _gdal_lookup(raster, points, box, path):
+    import pvgrip.raster.io as io
+    from pvgrip.raster.gdalinterface \
+        import GDALInterface
+
+    fn = os.path.join(path, 'geotiff')
+    io.save_geotiff(raster, fn)
+    points = np.asarray(points, dtype = float)
+    return GDALInterface(fn).lookup_array(points[:,0], points[:,1],
+                                          box = box)
+
+
+@pytest.mark.parametrize('box,step,mesh_type',
+                         [([50.70, 6.00, 50.72, 6.03], 10, 'utm'),
+                          ([50.70, 6.00, 50.72, 6.03], 0.0003, 4326)])
+def test_pickle_lookup_gdal(box, step, mesh_type,
+                            path = 'test_pickle_lookup_gdal'):
+    pytest.importorskip('osgeo')
+    os.makedirs(path, exist_ok = True)
+    try:
+        src = _raster(box, step, mesh_type)
+        sbox, epsg = mesh2box(src['mesh'])
+        grid = mesh(box = sbox, step = 0.7*step, mesh_type = epsg)
+        rng = np.random.default_rng(1)
+        points = np.concatenate\
+            ((np.column_stack(mesh_points(grid)),
+              np.column_stack((rng.uniform(5.99, 6.04, 1000),
+                               rng.uniform(50.69, 50.73, 1000)))))
+
+        for b in (sbox, None):
+            expected = _gdal_lookup(src, points, b, path)
+            assert np.array_equal\
+                (pickle_lookup(src, points, b), expected)
+    finally:
+        shutil.rmtree(path)
+
+
+def test_pickle_lookup_methods():
+    # mesh points are exactly on the raster grid
+    src = _raster([50.0, 6.0, 52.5, 9.0], 0.25, 4326)
+    points = np.column_stack(mesh_points(src['mesh']))
+    expected = np.transpose(np.flip(src['raster'], axis = 0),
+                            axes = (1,0,2)).reshape(-1, 2)
+
+    # on the own mesh the interpolations give back the raster
+    res = pickle_lookup(src, points, method = 'bilinear')
+    assert np.allclose(res, expected)
+    res = pickle_lookup(src, points, method = 'area')
+    assert np.allclose(res, expected)
+
+    res = pickle_lookup(src, [(0, 0), (7.1, 51.1)], method = 'bilinear')
+    assert (res[0] == SEA_LEVEL).all()
+    assert np.allclose(res[1], 0.36*src['raster'][5,4] \
+                       + 0.24*src['raster'][5,5] \
+                       + 0.24*src['raster'][4,4] \
+                       + 0.16*src['raster'][4,5])
+
+
+def _linear(box, step, mesh_type):
+    # channels are the row counted from the south and the column
+    src = _raster(box, step, mesh_type)
+    nrows, ncols = src['raster'].shape[:2]
+    rows, cols = np.meshgrid(np.arange(nrows)[::-1], np.arange(ncols),
+                             indexing = 'ij')
+    src['raster'] = np.stack([rows, cols], axis = 2).astype(float)
+    return src
+
+
+def test_block_average():
+    src = _raster([50.0, 6.0, 52.5, 9.0], 0.25, 4326)
+    nrows, ncols = src['raster'].shape[:2]
+    res = block_average(src, 3)
+
+    assert res['raster'].shape == \
+        ((nrows + 2) // 3, (ncols + 2) // 3, 2)
+    assert len(res['mesh']['mesh'][0]) == res['raster'].shape[0]
+    assert len(res['mesh']['mesh'][1]) == res['raster'].shape[1]
+    assert res['mesh']['step'] == 0.75
+
+    # blocks are centred at the mesh points
+    assert np.allclose(res['raster'][-2,1],
+                       src['raster'][-5:-2,2:5].mean(axis = (0,1)))
+    # the south-west block is incomplete
+    assert np.allclose(res['raster'][-1,0],
+                       src['raster'][-2:,:2].mean(axis = (0,1)))
+
+
+def test_block_average_centred():
+    src = _linear([50.0, 6.0, 52.5, 9.0], 0.25, 4326)
+    nrows, ncols = src['raster'].shape[:2]
+
+    for factor in (2, 3, 4):
+        res = block_average(src, factor)
+        rows = np.arange(0, nrows, factor)[::-1]
+        cols = np.arange(0, ncols, factor)
+        # away from the borders the mean of a linear field is the
+        # value at the centre
+        assert np.allclose(res['raster'][1:-1,1:-1,0],
+                           rows[1:-1,None])
+        assert np.allclose(res['raster'][1:-1,1:-1,1],
+                           cols[None,1:-1])
+
+
+def test_block_average_nodata():
+    src = _linear([50.0, 6.0, 52.5, 9.0], 0.25, 4326)
+    src['raster'][-5:-2,2:5] = SEA_LEVEL
+    src['raster'][-4,3] = 7
+    res = block_average(src, 3)
+
+    # only the valid value is averaged
+    assert np.allclose(res['raster'][-2,1], 7)
+    assert np.all(res['raster'] != SEA_LEVEL)
+
+    src['raster'][-4,3] = SEA_LEVEL
+    res = block_average(src, 3)
+    assert np.all(res['raster'][-2,1] == SEA_LEVEL)
+    assert 1 == np.sum(res['raster'][:,:,0] == SEA_LEVEL)
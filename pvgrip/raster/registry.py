@@ -0,0 +1,164 @@
+import json
+import time
+
+from pvgrip.utils.float_hash \
+    import float_hash
+from pvgrip.utils.redis.client \
+    import redis_client
+
+
+_KEY = 'pvgrip_raster_registry_{}'
+
+
+def grid_info(grid):
+    """Describe a mesh as a regular grid
+
+    :grid: output of 'mesh'
+
+    :return: dictionary with 'origin' (south-west point in epsg
+    coordinates), 'step', 'shape' (number of latitudes and
+    longitudes) and 'epsg'
+    """
+    return {'origin': [float(grid['raster_box'][0]),
+                       float(grid['raster_box'][1])],
+            'step': float(grid['step']),
+            'shape': [len(grid['mesh'][0]), len(grid['mesh'][1])],
+            'epsg': int(grid['epsg'])}
+
+
+def derivable(src, dst, tol = 1e-6):
+    """Check if a grid is a subgrid of another grid
+
+    :src, dst: output of 'grid_info'
+
+    :tol: tolerance relative to the step
+
+    :return: None or (factor, lat offset, lon offset): dst points
+    are every factor-th point of src starting at the offsets
+    """
+    if src['epsg'] != dst['epsg']:
+        return None
+
+    factor = dst['step'] / src['step']
+    if factor < 1 - tol or abs(factor - round(factor)) > tol:
+        return None
+    factor = int(round(factor))
+
+    res = [factor]
+    for o_src, o_dst, n_src, n_dst in zip(src['origin'], dst['origin'],
+                                          src['shape'], dst['shape']):
+        offset = round((o_dst - o_src) / src['step'])
+        if abs(o_dst - o_src - offset*src['step']) > tol*src['step']:
+            return None
+        if offset < 0 or offset + (n_dst - 1)*factor > n_src - 1:
+            return None
+        res += [offset]
+
+    if 1 == factor and 0 == res[1] and 0 == res[2] \
+       and list(src['shape']) == list(dst['shape']):
+        # the same grid
+        return None
+
+    return tuple(res)
+
+
+def decimate(raster, shape, factor, offsets):
+    """Select a subgrid of a raster
+
+    :raster: raster array, rows ordered from north
+
+    :shape, factor, offsets: subgrid, see 'derivable'
+
+    :return: array view
+    """
+    nlat = raster.shape[0]
+    start = nlat - 1 - offsets[0] - factor*(shape[0] - 1)
+    return raster[start:start + factor*(shape[0] - 1) + 1:factor,
+                  offsets[1]:offsets[1] + factor*(shape[1] - 1) + 1\
+                  :factor]
+
+
+class Raster_Registry:
+
+
+    def __init__(self, redis_url, ttl = 30*24*3600):
+        """Registry of sampled rasters
+
+        Rasters are registered with their grids. A raster on a
+        subgrid of a registered raster can be derived without
+        sampling the data sources again. Registered rasters keep
+        their missing values: values filled on a finer grid differ
+        from values filled on the subgrid.
+
+        :redis_url: how to connect to redis
+
+        :ttl: seconds after which entries are forgotten
+        """
+        self._redis = redis_client(redis_url)
+        self._ttl = ttl
+
+
+    def _key(self, epsg, data_re, stat, pdal_resolution, ensure_las):
+        return _KEY.format(float_hash
+                           (('raster_registry', int(epsg),
+                             data_re, stat, float(pdal_resolution),
+                             bool(ensure_las))))
+
+
+    def add(self, rpath, grid, **params):
+        """Register a raster
+
+        :rpath: remote path of the raster
+
+        :grid: output of 'mesh'
+
+        :params: data_re, stat, pdal_resolution, ensure_las
+        """
+        info = grid_info(grid)
+        info['time'] = time.time()
+        key = self._key(epsg = info['epsg'], **params)
+        self._redis.hset(key, rpath, json.dumps(info))
+        self._redis.expire(key, self._ttl)
+
+
+    def remove(self, rpath, epsg, **params):
+        self._redis.hdel(self._key(epsg = epsg, **params), rpath)
+
+
+    def find(self, grid, exists = lambda x: True, **params):
+        """Find a raster the grid can be derived from
+
+        Among suitable rasters the smallest one is selected.
+
+        :grid: output of 'mesh'
+
+        :exists: function that checks if a raster is still
+        available. Missing rasters are removed from the registry
+
+        :params: see 'add'
+
+        :return: None or (rpath, (factor, lat offset, lon offset))
+        """
+        dst = grid_info(grid)
+        key = self._key(epsg = dst['epsg'], **params)
+
+        candidates = []
+        for rpath, info in self._redis.hgetall(key).items():
+            rpath = rpath.decode() if isinstance(rpath, bytes) else rpath
+            info = json.loads(info)
+            if time.time() - info['time'] > self._ttl:
+                self._redis.hdel(key, rpath)
+                continue
+
+            how = derivable(src = info, dst = dst)
+            if how is None:
+                continue
+            candidates += [(info['shape'][0]*info['shape'][1],
+                            rpath, how)]
+
+        for _, rpath, how in sorted(candidates):
+            if exists(rpath):
+                return rpath, how
+            self._redis.hdel(key, rpath)
+
+        return None
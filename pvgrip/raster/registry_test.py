@@ -0,0 +1,107 @@
+import numpy as np
+
+from pvgrip.globals \
+    import REDIS_URL
+
+from pvgrip.raster.mesh \
+    import index_mesh
+from pvgrip.raster.fill \
+    import fill_missing
+from pvgrip.raster.registry \
+    import grid_info, derivable, decimate, Raster_Registry
+
+
+def _raster(index, step):
+    # value encodes the point coordinates, rows are ordered from north
+    lat = np.arange(index[0], index[2])[::-1] * step
+    lon = np.arange(index[1], index[3]) * step
+    return (1000*lat[:,None] + lon[None,:])[:,:,None]
+
+
+def test_derivable():
+    src = (100, 200, 140, 260)
+    src_grid = index_mesh(src, step = 1, epsg = 25832)
+    src_raster = _raster(src, step = 1)
+
+    # coarser step and a smaller box
+    for dst, step in (((50, 100, 70, 130), 2),
+                      ((110, 210, 120, 240), 1),
+                      ((34, 67, 46, 86), 3)):
+        grid = index_mesh(dst, step = step, epsg = 25832)
+        how = derivable(grid_info(src_grid), grid_info(grid))
+        assert how is not None
+        res = decimate(src_raster, shape = grid_info(grid)['shape'],
+                       factor = how[0], offsets = how[1:])
+        assert np.array_equal(res, _raster(dst, step = step))
+
+    # same grid, larger box, misaligned step and other epsg
+    for dst, step, epsg in (((100, 200, 140, 260), 1, 25832),
+                            ((99, 200, 140, 260), 1, 25832),
+                            ((40, 80, 50, 100), 2.5, 25832),
+                            ((110, 210, 120, 240), 1, 25833)):
+        grid = index_mesh(dst, step = step, epsg = epsg)
+        assert derivable(grid_info(src_grid), grid_info(grid)) is None
+
+
+def _raster_gap(index, step):
+    # nodata where the coordinates are within a gap
+    res = _raster(index, step = step).astype(float)
+    lat = np.arange(index[0], index[2])[::-1] * step
+    lon = np.arange(index[1], index[3]) * step
+    gap = ((lat >= 110) & (lat < 125))[:,None] \
+        & ((lon >= 203) & (lon < 240))[None,:]
+    res[gap] = -9999
+    return res
+
+
+def test_decimate_nodata():
+    src = (100, 200, 140, 260)
+    dst = (50, 100, 70, 130)
+    src_grid = index_mesh(src, step = 1, epsg = 25832)
+    dst_grid = index_mesh(dst, step = 2, epsg = 25832)
+    how = derivable(grid_info(src_grid), grid_info(dst_grid))
+    shape = grid_info(dst_grid)['shape']
+
+    # derived from an unfilled raster and filled is the same as
+    # sampled directly and filled
+    res = decimate(_raster_gap(src, step = 1), shape = shape,
+                   factor = how[0], offsets = how[1:])
+    direct = _raster_gap(dst, step = 2)
+    assert (direct == -9999).any()
+    assert np.array_equal(res, direct)
+    assert np.array_equal(fill_missing(res), fill_missing(direct))
+
+    # filled on the finer grid, values come from other neighbours
+    res = decimate(fill_missing(_raster_gap(src, step = 1)),
+                   shape = shape, factor = how[0], offsets = how[1:])
+    assert not np.array_equal(res, fill_missing(direct))
+
+
+def test_Raster_Registry():
+    registry = Raster_Registry(redis_url = REDIS_URL)
+    params = {'data_re': 'test_Raster_Registry',
+              'stat': 'max', 'pdal_resolution': 0.3,
+              'ensure_las': False}
+    small = index_mesh((100, 200, 140, 260), step = 1, epsg = 25832)
+    large = index_mesh((0, 0, 400, 400), step = 1, epsg = 25832)
+    dst = index_mesh((55, 105, 65, 125), step = 2, epsg = 25832)
+    try:
+        assert registry.find(grid = dst, **params) is None
+
+        registry.add('test_registry/large', grid = large, **params)
+        registry.add('test_registry/small', grid = small, **params)
+        assert registry.find(grid = dst, **params) == \
+            ('test_registry/small', (2, 10, 10))
+
+        # missing rasters are forgotten
+        assert registry.find\
+            (grid = dst, exists = lambda x: 'large' in x,
+             **params)[0] == 'test_registry/large'
+        assert registry.find(grid = dst, **params)[0] == \
+            'test_registry/large'
+
+        assert registry.find\
+            (grid = dst, **dict(params, stat = 'min')) is None
+    finally:
+        for x in ('test_registry/large', 'test_registry/small'):
+            registry.remove(x, epsg = 25832, **params)
@@ -0,0 +1,105 @@
+import logging
+import threading
+
+import numpy as np
+
+from concurrent.futures \
+    import ThreadPoolExecutor, as_completed
+
+from pvgrip.raster.gdalinterface \
+    import GDALInterface
+
+from pvgrip.storage.remotestorage_path \
+    import searchandget_locally
+
+from pvgrip.globals \
+    import RASTER_SAMPLE_THREADS
+
+
+class _Output:
+    """Output array allocated by the first opened source"""
+
+    def __init__(self, npoints):
+        self.npoints = npoints
+        self.lock = threading.Lock()
+        self.array = None
+
+
+    def get(self, nchannels):
+        with self.lock:
+            if self.array is None:
+                self.array = np.full((self.npoints, nchannels),
+                                     GDALInterface.SEA_LEVEL,
+                                     dtype = float)
+
+            if self.array.shape[1] != nchannels:
+                raise RuntimeError\
+                    ("""cannot join data sources of different shape!
+                    data_re matches data sources with channels:
+                    {} and {}""".format(nchannels,
+                                        self.array.shape[1]))
+            return self.array
+
+
+def _fold_source(fn, output, fold, get_locally, open_source):
+    fn = get_locally(fn)
+    with open_source(fn) as interface:
+        out = output.get(interface.src.RasterCount)
+        fold(interface, out, output.lock)
+
+
+def fold_sources(fns, npoints, fold,
+                 nthreads = RASTER_SAMPLE_THREADS,
+                 get_locally = searchandget_locally,
+                 open_source = GDALInterface):
+    """Take maximum among multiple data sources
+
+    Source files are fetched and read concurrently. Every thread
+    holds only the part of its source that intersects the box, the
+    values are folded into a single output array.
+
+    :fns: list of remote paths of the sources
+
+    :npoints: number of points in the output
+
+    :fold: function(interface, out, lock) that folds values of a
+    GDALInterface into 'out' (e.g. GDALInterface.fold_grid)
+
+    :nthreads: maximum number of sources processed concurrently
+
+    :get_locally: function that returns a local path of a source
+
+    :open_source: function that opens a local source as a context
+    manager with a GDALInterface-like interface
+
+    :return: array of shape (npoints, number of channels)
+    """
+    if not fns:
+        raise RuntimeError("no data sources to sample from!")
+
+    output = _Output(npoints)
+    if len(fns) < 2 or nthreads < 2:
+        for fn in fns:
+            _fold_source(fn, output, fold, get_locally, open_source)
+        return output.array
+
+    done = 0
+    pool = ThreadPoolExecutor\
+        (max_workers = min(nthreads, len(fns)))
+    try:
+        futures = [pool.submit(_fold_source, fn, output,
+                               fold, get_locally, open_source)
+                   for fn in fns]
+        for future in as_completed(futures):
+            future.result()
+            done += 1
+    except Exception as e:
+        logging.error("""Failed to sample data source
+        error: {}
+        done: {} of {}
+        """.format(str(e), done, len(fns)))
+        raise e
+    finally:
+        pool.shutdown(wait = False, cancel_futures = True)
+
+    return output.array
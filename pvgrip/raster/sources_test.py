@@ -0,0 +1,76 @@
+import time
+import types
+import pytest
+
+import numpy as np
+
+from pvgrip.raster.sources \
+    import fold_sources
+
+
+NPOINTS = 1000
+
+
+class _Source:
+    """Source covering a part of the points with random values"""
+
+    def __init__(self, fn):
+        seed, nchannels = fn
+        rng = np.random.default_rng(seed)
+        self.src = types.SimpleNamespace(RasterCount = nchannels)
+        self.inside = rng.random(NPOINTS) < 0.3
+        self.values = rng.normal(size = (self.inside.sum(), nchannels))
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args):
+        pass
+
+
+def _fold(interface, out, lock):
+    with lock:
+        out[interface.inside] = np.maximum(out[interface.inside],
+                                           interface.values)
+
+
+def _get_locally(fn):
+    time.sleep(0.01)
+    return fn
+
+
+def _serial(fns):
+    res = np.full((NPOINTS, fns[0][1]), -9999.0)
+    for fn in fns:
+        x = _Source(fn)
+        res[x.inside] = np.maximum(res[x.inside], x.values)
+    return res
+
+
+@pytest.mark.parametrize('nthreads', [1, 4])
+def test_fold_sources(nthreads):
+    fns = [(seed, 2) for seed in range(9)]
+    res = fold_sources(fns, npoints = NPOINTS, fold = _fold,
+                       nthreads = nthreads,
+                       get_locally = _get_locally,
+                       open_source = _Source)
+    assert np.array_equal(res, _serial(fns))
+
+
+def test_fold_sources_errors():
+    with pytest.raises(RuntimeError, match = 'different shape'):
+        fold_sources([(0, 1), (1, 2), (2, 1)], npoints = NPOINTS,
+                     fold = _fold, nthreads = 3,
+                     get_locally = _get_locally,
+                     open_source = _Source)
+
+    def _missing(fn):
+        raise RuntimeError('missing {}'.format(fn))
+
+    with pytest.raises(RuntimeError, match = 'missing'):
+        fold_sources([(0, 1), (1, 1)], npoints = NPOINTS,
+                     fold = _fold, nthreads = 2,
+                     get_locally = _missing,
+                     open_source = _Source)
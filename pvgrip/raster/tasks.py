@@ -2,8 +2,8 @@ import re
 import os
 import pickle
 import shutil
+import celery
 import logging
-import itertools
 
 import numpy as np
 import pandas as pd
@@ -11,22 +11,32 @@ import pandas as pd
 import pvgrip.raster.io as io
 
 from pvgrip.raster.utils \
-    import fill_missing, index2fn, \
-    route_neighbours
+    import index2fn, route_neighbours
+from pvgrip.raster.fill \
+    import fill_missing
 from pvgrip.raster.mesh \
-    import mesh, mesh2box
+    import mesh, mesh2box, mesh_points, index_mesh
+from pvgrip.raster.tiles \
+    import tile_index, index2box, intersect, window, layout_mesh, \
+    canonical_mesh
+from pvgrip.raster.registry \
+    import grid_info, derivable, decimate
 from pvgrip.raster.gdalinterface \
     import GDALInterface
 from pvgrip.raster.pickle_lookup \
-    import pickle_lookup
+    import pickle_lookup, block_average
+from pvgrip.raster.container \
+    import read_raster, write_raster, create_raster, write_pickle
 
 from pvgrip.storage.remotestorage_path \
-    import searchandget_locally
+    import searchandget_locally, RemoteStoragePath
+from pvgrip.raster.sources \
+    import fold_sources
 
 from pvgrip \
     import CELERY_APP
 from pvgrip.globals \
-    import get_SPATIAL_DATA
+    import get_SPATIAL_DATA, get_RASTER_REGISTRY
 from pvgrip.utils.cache_fn_results \
     import cache_fn_results
 from pvgrip.utils.celery_one_instance \
@@ -43,23 +53,18 @@ from pvgrip.utils.timeout \
     import Timeout
 
 
-def _read_pickle(fn):
-    with open(fn, 'rb') as f:
-        return pickle.load(f)
-
-
-def _process_lookup(arr, grid):
+def _process_lookup(arr, grid, fill = True):
     arr = np.array(arr).reshape(len(grid['mesh'][1]),
                                 len(grid['mesh'][0]),
                                 arr.shape[1])
-    arr = fill_missing(arr)
+    if fill:
+        arr = fill_missing(arr)
     arr = np.transpose(np.flip(arr, axis = 1),
                        axes=(1,0,2))
 
     ofn = get_tempfile()
     try:
-        with open(ofn, 'wb') as f:
-            pickle.dump({'raster': arr, 'mesh': grid}, f)
+        write_raster(ofn, {'raster': arr, 'mesh': grid})
     except Exception as e:
         remove_file(ofn)
         raise e
@@ -72,7 +77,7 @@ def _process_lookup(arr, grid):
 def save_geotiff(self, pickle_fn):
     logging.debug("save_geotiff\n{}"\
                   .format(format_dictionary(locals())))
-    data = _read_pickle(pickle_fn)
+    data = read_raster(pickle_fn)
     ofn = get_tempfile()
     try:
         io.save_geotiff(data, ofn)
@@ -90,7 +95,7 @@ def save_png(self, pickle_fn, normalize = False,
              scale_constant = 1):
     logging.debug("save_png\n{}"\
                   .format(format_dictionary(locals())))
-    data = _read_pickle(pickle_fn)
+    data = read_raster(pickle_fn)
 
     ofn = get_tempfile()
     try:
@@ -135,6 +140,25 @@ def save_pickle(self, geotiff_fn):
     return ofn
 
 
+@CELERY_APP.task(bind=True, base=WithRetry)
+@cache_fn_results(path_prefix='raster')
+@one_instance(expire = 30)
+def save_raster_pickle(self, pickle_fn):
+    """Convert a raster container to a pickle
+
+    Served for output_type = 'pickle', see container.write_pickle
+    """
+    logging.debug("save_raster_pickle\n{}"\
+                  .format(format_dictionary(locals())))
+    ofn = get_tempfile()
+    try:
+        write_pickle(ofn, read_raster(pickle_fn, mmap = False))
+    except Exception as e:
+        remove_file(ofn)
+        raise e
+    return ofn
+
+
 @CELERY_APP.task(bind=True, base=WithRetry)
 def dummy(self):
     return None
@@ -144,7 +168,12 @@ def dummy(self):
 @cache_fn_results(path_prefix='raster', minage = 1650884152)
 @one_instance(expire = 60*10)
 def sample_from_box(self, box, data_re, stat, mesh_type, step,
-                    pdal_resolution = 0.3, ensure_las = False):
+                    pdal_resolution = 0.3, ensure_las = False,
+                    fill = True):
+    """Sample a raster of a box
+
+    :fill: if False, missing values are not filled, see fill_raster
+    """
     logging.debug("sample_from_box\n{}"\
                   .format(format_dictionary(locals())))
     with Timeout(600):
@@ -153,49 +182,295 @@ def sample_from_box(self, box, data_re, stat, mesh_type, step,
                                     data_re = data_re)
 
     grid = mesh(box = box, step = step, mesh_type = mesh_type)
-    points = list(itertools.product(*grid['mesh'][::-1]))
-
-    res = None
-    for fn_idx in index.iterate():
-        fn = index2fn(fn_idx, stat = stat,
-                      pdal_resolution = pdal_resolution,
-                      ensure_las = ensure_las)
-        fn = searchandget_locally(fn)
-        interface = GDALInterface(fn)
-        x = np.array(interface.lookup(points = points,
-                                      box = box))
-
-        if res is None:
-            res = x
-            continue
-
-        if x.shape != res.shape:
+    return _sample_grid(grid = grid, box = box, index = index,
+                        stat = stat, pdal_resolution = pdal_resolution,
+                        ensure_las = ensure_las, fill = fill)
+
+
+def _sample_grid(grid, box, index, stat, pdal_resolution, ensure_las,
+                 fill = True):
+    lat, lon = grid['mesh']
+    fns = [index2fn(fn_idx, stat = stat,
+                    pdal_resolution = pdal_resolution,
+                    ensure_las = ensure_las)
+           for fn_idx in index.iterate()]
+    res = fold_sources\
+        (fns, npoints = len(lat)*len(lon),
+         fold = lambda interface, out, lock: \
+         interface.fold_grid(lon, lat, out, box = box, lock = lock))
+
+    return _process_lookup(arr = res, grid = grid, fill = fill)
+
+
+@CELERY_APP.task(bind=True, base=WithRetry)
+@cache_fn_results(path_prefix='raster', minage = 1650884152)
+@one_instance(expire = 60*10)
+def sample_from_tile(self, row, col, size, halo, step, epsg,
+                     data_re, stat, pdal_resolution = 0.3,
+                     ensure_las = False):
+    """Sample a tile of the canonical grid
+
+    Tiles do not depend on the requested box, hence are shared by
+    all requests that cover them. Missing values are not filled,
+    see fill_raster.
+
+    :row, col, size, halo: see tiles.tile_index
+
+    :step, epsg: canonical grid
+
+    Other arguments as in sample_from_box
+    """
+    logging.debug("sample_from_tile\n{}"\
+                  .format(format_dictionary(locals())))
+    grid = index_mesh(index = tile_index(row, col, size, halo),
+                      step = step, epsg = epsg)
+    box = index2box(index = tile_index(row, col, size, halo),
+                    step = step, epsg = epsg)
+    with Timeout(600):
+        SPATIAL_DATA = get_SPATIAL_DATA()
+        index = SPATIAL_DATA.subset(box = box,
+                                    data_re = data_re,
+                                    allow_empty = True)
+
+    if 0 == index.size():
+        ofn = get_tempfile()
+        try:
+            write_raster(ofn, {'raster': np.full
+                               ((size + 2*halo, size + 2*halo, 1),
+                                GDALInterface.SEA_LEVEL,
+                                dtype = float),
+                               'mesh': grid})
+        except Exception as e:
+            remove_file(ofn)
+            raise e
+        return ofn
+
+    return _sample_grid(grid = grid, box = box, index = index,
+                        stat = stat, pdal_resolution = pdal_resolution,
+                        ensure_las = ensure_las, fill = False)
+
+
+@CELERY_APP.task(bind=True, base=WithRetry)
+@cache_fn_results(path_prefix='raster')
+@one_instance(expire = 60*10)
+def mosaic(self, tiles_fns, layout):
+    """Assemble tiles into a single raster
+
+    Tiles are written one by one into a memory-mapped output.
+
+    :tiles_fns: list of files, output of sample_from_tile
+
+    :layout: output of tiles.tile_layout, in the order of tiles_fns
+    """
+    logging.debug("mosaic\n{}"\
+                  .format(format_dictionary(locals())))
+    if len(tiles_fns) != len(layout['tiles']):
+        raise RuntimeError\
+            ("number of tiles = {} != {}"\
+             .format(len(tiles_fns), len(layout['tiles'])))
+
+    index = layout['index']
+    ofn = get_tempfile()
+    try:
+        out = None
+        for fn, (row, col) in zip(tiles_fns, layout['tiles']):
+            tile = read_raster(fn)['raster']
+            src = tile_index(row, col, layout['size'], layout['halo'])
+            region = intersect(index, tile_index(row, col,
+                                                 layout['size']))
+            src, dst = window(src = src, dst = index, region = region)
+            part = tile[src]
+            if (part == GDALInterface.SEA_LEVEL).all():
+                continue
+
+            if out is None:
+                out = create_raster\
+                    (ofn, shape = (index[2] - index[0],
+                                   index[3] - index[1],
+                                   tile.shape[2]),
+                     fill = GDALInterface.SEA_LEVEL,
+                     mesh = layout_mesh(layout))
+
+            if tile.shape[2] != out.shape[2]:
+                raise RuntimeError\
+                    ("""cannot join tiles of different shape!
+                    {} and {}""".format(tile.shape, out.shape))
+            out[dst] = part
+
+        if out is None:
             raise RuntimeError\
-                ("""cannot join data sources of different shape!
-                data_re matches data sources with shapes:
-                {} and {}""".format(x.shape, res.shape))
+                ("no data available for the selected location")
+        out.flush()
+        del out
+    except Exception as e:
+        remove_file(ofn)
+        raise e
+    return ofn
+
+
+@CELERY_APP.task(bind=True, base=WithRetry)
+@cache_fn_results(path_prefix='raster')
+@one_instance(expire = 60*10)
+def fill_raster(self, pickle_fn):
+    """Fill missing values of a raster, see fill.fill_missing
+
+    Sampled rasters are assembled from tiles, registered and
+    derived unfilled (see raster.registry). Filling the final raster
+    here fills gaps across tile borders as in a raster sampled at
+    once, and derived rasters as if they were sampled directly.
+    """
+    logging.debug("fill_raster\n{}"\
+                  .format(format_dictionary(locals())))
+    data = read_raster(pickle_fn)
+    if not (data['raster'] == GDALInterface.SEA_LEVEL).any():
+        return pickle_fn
+
+    # the raster is a copy-on-write memory-map
+    data['raster'] = fill_missing(data['raster'],
+                                  missing_value = \
+                                  GDALInterface.SEA_LEVEL,
+                                  inplace = True)
+    ofn = get_tempfile()
+    try:
+        write_raster(ofn, data)
+    except Exception as e:
+        remove_file(ofn)
+        raise e
+    return ofn
+
+
+@CELERY_APP.task(bind=True, base=WithRetry)
+def register_raster(self, pickle_fn, data_re, stat,
+                    pdal_resolution, ensure_las):
+    """Register a sampled raster in the raster registry
+
+    :return: pickle_fn
+    """
+    data = read_raster(searchandget_locally(pickle_fn))
+    get_RASTER_REGISTRY().add(rpath = pickle_fn, grid = data['mesh'],
+                              data_re = data_re, stat = stat,
+                              pdal_resolution = pdal_resolution,
+                              ensure_las = ensure_las)
+    return pickle_fn
+
+
+def _target_grid(box, step, mesh_type, canonical):
+    if canonical:
+        return canonical_mesh(box = box, step = step,
+                              mesh_type = mesh_type)
+    return mesh(box = box, step = step, mesh_type = mesh_type)
 
-        # take maximum among multiple data sources!
-        res = np.array((res,x)).max(axis=0)
 
-    return _process_lookup(arr = res, grid = grid)
+@CELERY_APP.task(bind=True, base=WithRetry)
+def derive_or_sample(self, box, step, mesh_type, canonical, sample,
+                     data_re, stat, pdal_resolution, ensure_las):
+    """Derive a raster from a registered raster or sample it
+
+    The registry is looked up when the task runs, so that cached
+    call plans do not depend on a particular registered raster.
+
+    :box, step, mesh_type, canonical: see 'derive_raster'
+
+    :sample: signature that samples the raster
+
+    :data_re, stat, pdal_resolution, ensure_las: sampled data
+    """
+    found = get_RASTER_REGISTRY().find\
+        (grid = _target_grid(box = box, step = step,
+                             mesh_type = mesh_type,
+                             canonical = canonical),
+         exists = lambda x: RemoteStoragePath(x).in_storage(),
+         data_re = data_re, stat = stat,
+         pdal_resolution = pdal_resolution,
+         ensure_las = ensure_las)
+    if found is None:
+        return self.replace(celery.signature(sample))
+
+    return self.replace(derive_raster.signature\
+                        (kwargs = {'pickle_fn': found[0],
+                                   'box': box,
+                                   'step': step,
+                                   'mesh_type': mesh_type,
+                                   'canonical': canonical},
+                         immutable = True))
+
+
+@CELERY_APP.task(bind=True, base=WithRetry)
+@cache_fn_results(path_prefix='raster')
+@one_instance(expire = 60*10)
+def derive_raster(self, pickle_fn, box, step, mesh_type, canonical):
+    """Derive a raster from a raster sampled on a finer or a covering
+    grid
+
+    :pickle_fn: raster to derive from, see registry.derivable
+
+    :box, step, mesh_type: requested raster
+
+    :canonical: if True, the requested raster is on the canonical
+    grid (see tiles.canonical_mesh)
+    """
+    logging.debug("derive_raster\n{}"\
+                  .format(format_dictionary(locals())))
+    grid = _target_grid(box = box, step = step, mesh_type = mesh_type,
+                        canonical = canonical)
+    src = read_raster(pickle_fn)
+    dst = grid_info(grid)
+    how = derivable(src = grid_info(src['mesh']), dst = dst)
+    if how is None:
+        raise RuntimeError\
+            ("cannot derive raster for box = {}, step = {} from {}"\
+             .format(box, step, pickle_fn))
+
+    ofn = get_tempfile()
+    try:
+        write_raster(ofn, {'raster': decimate(src['raster'],
+                                              shape = dst['shape'],
+                                              factor = how[0],
+                                              offsets = how[1:]),
+                           'mesh': grid})
+    except Exception as e:
+        remove_file(ofn)
+        raise e
+    return ofn
 
 
 @CELERY_APP.task(bind=True, base=WithRetry)
 @cache_fn_results(path_prefix='raster', minage = 1650884152)
 @one_instance(expire = 60*10)
-def resample_from_pickle(self, pickle_fn, new_step):
+def resample_from_pickle(self, pickle_fn, new_step,
+                         method = 'nearest'):
+    """Resample raster to a new step
+
+    :method: 'nearest', 'bilinear', 'area' or 'block'. 'block'
+    averages blocks of pixels if new_step is a multiple of the raster
+    step, and falls back to 'area' otherwise
+    """
     logging.debug("resample_from_pickle\n{}"\
                   .format(format_dictionary(locals())))
-    src = _read_pickle(pickle_fn)
+    src = read_raster(pickle_fn)
 
     if src['mesh']['step'] == new_step:
         return pickle_fn
 
+    if 'block' == method:
+        factor = new_step / src['mesh']['step']
+        if factor > 1.5 and np.isclose(factor, round(factor)):
+            res = block_average(src, int(round(factor)))
+            ofn = get_tempfile()
+            try:
+                write_raster(ofn, res)
+            except Exception as e:
+                remove_file(ofn)
+                raise e
+            return ofn
+        method = 'area'
+
     box, mesh_type = mesh2box(src['mesh'])
     grid = mesh(box = box, step = new_step, mesh_type = mesh_type)
-    points = list(itertools.product(*grid['mesh'][::-1]))
-    return _process_lookup(arr = pickle_lookup(src, points, box),
+    points = np.column_stack(mesh_points(grid))
+    return _process_lookup(arr = pickle_lookup(src, points, box,
+                                               method = method,
+                                               size = new_step),
                            grid = grid)
 
 
@@ -210,7 +485,7 @@ def sample_route_neighbour(self, pickle_fn, route_fn,
     with open(route_fn, 'rb') as f:
         route = pickle.load(f)
 
-    src = _read_pickle(pickle_fn)
+    src = read_raster(pickle_fn)
 
     box, epsg = mesh2box(src['mesh'])
     points, names = route_neighbours\
@@ -257,30 +532,17 @@ def sample_from_points(self, route_fn, box,
         index = SPATIAL_DATA.subset(box = box,
                                     data_re = data_re)
 
-    points = [(x['longitude'],x['latitude']) for x in route]
-
-    res = None
-    for fn_idx in index.iterate():
-        fn = index2fn(fn_idx, stat = stat,
-                      pdal_resolution = pdal_resolution,
-                      ensure_las = ensure_las)
-        fn = searchandget_locally(fn)
-        interface = GDALInterface(fn)
-        x = np.array(interface.lookup(points = points,
-                                      box = box))
-
-        if res is None:
-            res = x
-            continue
-
-        if x.shape != res.shape:
-            raise RuntimeError\
-                ("""cannot join data sources of different shape!
-                data_re matches data sources with shapes:
-                {} and {}""".format(x.shape, res.shape))
-
-        # take maximum among multiple data sources!
-        res = np.array((res,x)).max(axis=0)
+    lon = np.array([x['longitude'] for x in route], dtype = float)
+    lat = np.array([x['latitude'] for x in route], dtype = float)
+
+    fns = [index2fn(fn_idx, stat = stat,
+                    pdal_resolution = pdal_resolution,
+                    ensure_las = ensure_las)
+           for fn_idx in index.iterate()]
+    res = fold_sources\
+        (fns, npoints = len(route),
+         fold = lambda interface, out, lock: \
+         interface.fold_array(lon, lat, out, box = box, lock = lock))
 
     for i in range(len(route)):
         for k in range(res[i].shape[0]):
@@ -0,0 +1,147 @@
+import numpy as np
+
+from pvgrip.raster.mesh \
+    import determine_epsg, index_mesh
+from pvgrip.utils.epsg \
+    import ll2epsg, epsg2ll
+
+
+def box2index(box, step, epsg):
+    """Indices of the canonical grid covering a box
+
+    :box: box location in WGS84 ('epsg:4326')
+
+    :step, epsg: canonical grid
+
+    :return: (lat_min, lon_min, lat_max, lon_max) integer indices,
+    max are exclusive. See 'index_mesh'
+    """
+    box_mt = ll2epsg(lat = box[0], lon = box[1], epsg = epsg) \
+           + ll2epsg(lat = box[2], lon = box[3], epsg = epsg)
+    return (int(np.floor(box_mt[0] / step)),
+            int(np.floor(box_mt[1] / step)),
+            int(np.ceil(box_mt[2] / step)),
+            int(np.ceil(box_mt[3] / step)))
+
+
+def index2box(index, step, epsg):
+    """Box in WGS84 that contains a part of the canonical grid
+
+    :index: see 'box2index'
+
+    :return: [lat_min,lon_min,lat_max,lon_max]
+    """
+    lat = np.array([index[0], index[0], index[2], index[2]]) * step
+    lon = np.array([index[1], index[3], index[1], index[3]]) * step
+    lat, lon = epsg2ll(lat = lat, lon = lon, epsg = epsg)
+    return [float(min(lat)), float(min(lon)),
+            float(max(lat)), float(max(lon))]
+
+
+def tile_index(row, col, size, halo = 0):
+    """Indices of a tile of the canonical grid
+
+    :row, col: tile position
+
+    :size: number of grid points per tile side
+
+    :halo: number of grid points added at each side
+
+    :return: see 'box2index'
+    """
+    return (row*size - halo, col*size - halo,
+            (row + 1)*size + halo, (col + 1)*size + halo)
+
+
+def tile_layout(box, step, mesh_type, size, halo = 0):
+    """Split a box into tiles of the canonical grid
+
+    :box: box location in WGS84 ('epsg:4326')
+
+    :step, mesh_type: see 'mesh'
+
+    :size, halo: see 'tile_index'
+
+    :return: dictionary with 'index' of the box, 'tiles' (list of
+    (row, col)) and 'step', 'epsg', 'size', 'halo' of the grid
+    """
+    epsg = determine_epsg(box = box, mesh_type = mesh_type)
+    index = box2index(box = box, step = step, epsg = epsg)
+    rows = range(index[0] // size, (index[2] - 1) // size + 1)
+    cols = range(index[1] // size, (index[3] - 1) // size + 1)
+    return {'index': index,
+            'tiles': [(i, j) for i in rows for j in cols],
+            'step': step,
+            'epsg': epsg,
+            'size': size,
+            'halo': halo}
+
+
+def canonical_mesh(box, step, mesh_type):
+    """Mesh of the canonical grid points covering a box
+
+    :box, step, mesh_type: see 'mesh'
+    """
+    epsg = determine_epsg(box = box, mesh_type = mesh_type)
+    return index_mesh(index = box2index(box = box, step = step,
+                                        epsg = epsg),
+                      step = step, epsg = epsg)
+
+
+def layout_mesh(layout):
+    return index_mesh(index = layout['index'],
+                      step = layout['step'],
+                      epsg = layout['epsg'])
+
+
+def layout_npoints(layout):
+    index = layout['index']
+    return (index[2] - index[0]) * (index[3] - index[1])
+
+
+def layout_box(layout):
+    """Box in WGS84 that contains all tiles of a layout with halo
+
+    Data sources have to be available for the whole box.
+    """
+    rows = [x[0] for x in layout['tiles']]
+    cols = [x[1] for x in layout['tiles']]
+    # grid lines are curved in WGS84, use the tiles at the border
+    boxes = [index2box(index = tile_index(row, col, layout['size'],
+                                          layout['halo']),
+                       step = layout['step'], epsg = layout['epsg'])
+             for row, col in layout['tiles']
+             if row in (min(rows), max(rows))
+             or col in (min(cols), max(cols))]
+    return [min(x[0] for x in boxes), min(x[1] for x in boxes),
+            max(x[2] for x in boxes), max(x[3] for x in boxes)]
+
+
+def window(src, dst, region):
+    """Slices of rasters on the same canonical grid
+
+    Raster rows are ordered from north to south.
+
+    :src, dst: indices of the source and destination rasters
+
+    :region: indices of the part to copy, contained in both rasters
+
+    :return: (src slices, dst slices)
+    """
+    def _slices(index):
+        return (slice(index[2] - region[2], index[2] - region[0]),
+                slice(region[1] - index[1], region[3] - index[1]))
+
+    return _slices(src), _slices(dst)
+
+
+def intersect(a, b):
+    """Intersection of indices
+
+    :return: indices or None if empty
+    """
+    res = (max(a[0], b[0]), max(a[1], b[1]),
+           min(a[2], b[2]), min(a[3], b[3]))
+    if res[0] >= res[2] or res[1] >= res[3]:
+        return None
+    return res
@@ -0,0 +1,91 @@
+import numpy as np
+
+from pvgrip.raster.mesh \
+    import index_mesh
+from pvgrip.utils.epsg \
+    import ll2epsg
+from pvgrip.raster.tiles \
+    import box2index, index2box, tile_index, tile_layout, \
+    layout_mesh, layout_npoints, layout_box, window, intersect
+
+
+def _raster(index):
+    # value encodes the grid point, rows are ordered from north
+    lat = np.arange(index[0], index[2])[::-1]
+    lon = np.arange(index[1], index[3])
+    return (1000*lat[:,None] + lon[None,:])[:,:,None]
+
+
+def test_tile_layout():
+    box = [50.70, 6.00, 50.75, 6.10]
+    layout = tile_layout(box = box, step = 1, mesh_type = 25832,
+                         size = 1000, halo = 5)
+    index = layout['index']
+
+    assert layout['epsg'] == 25832
+    assert index == box2index(box = box, step = 1, epsg = 25832)
+    assert layout_npoints(layout) == \
+        (index[2] - index[0]) * (index[3] - index[1])
+
+    # tiles cover the box
+    rows = sorted(set(x[0] for x in layout['tiles']))
+    cols = sorted(set(x[1] for x in layout['tiles']))
+    assert len(layout['tiles']) == len(rows) * len(cols)
+    first = tile_index(rows[0], cols[0], 1000)
+    last = tile_index(rows[-1], cols[-1], 1000)
+    assert first[0] <= index[0] and first[1] <= index[1]
+    assert last[2] >= index[2] and last[3] >= index[3]
+
+    # the box in WGS84 contains the whole tile
+    tile = tile_index(rows[0], cols[0], 1000, 5)
+    tbox = index2box(tile, step = 1, epsg = 25832)
+    lat, lon = ll2epsg\
+        (lat = np.array([tbox[0], tbox[0], tbox[2], tbox[2]]),
+         lon = np.array([tbox[1], tbox[3], tbox[1], tbox[3]]),
+         epsg = 25832)
+    assert lat.min() <= tile[0] and lon.min() <= tile[1]
+    assert lat.max() >= tile[2] and lon.max() >= tile[3]
+
+    # the box of the layout contains all tiles with halo
+    lbox = layout_box(layout)
+    for row, col in layout['tiles']:
+        tbox = index2box(tile_index(row, col, 1000, 5),
+                         step = 1, epsg = 25832)
+        assert lbox[0] <= tbox[0] and lbox[1] <= tbox[1]
+        assert lbox[2] >= tbox[2] and lbox[3] >= tbox[3]
+    assert lbox[0] < box[0] and lbox[3] > box[3]
+
+
+def test_mosaic_windows():
+    layout = tile_layout(box = [50.70, 6.00, 50.75, 6.10],
+                         step = 0.001, mesh_type = 4326,
+                         size = 16, halo = 3)
+    index = layout['index']
+    expected = _raster(index)
+
+    out = np.zeros(expected.shape)
+    for row, col in layout['tiles']:
+        src = tile_index(row, col, layout['size'], layout['halo'])
+        region = intersect(index, tile_index(row, col, layout['size']))
+        src, dst = window(src = src, dst = index, region = region)
+        out[dst] = _raster(tile_index(row, col, layout['size'],
+                                      layout['halo']))[src]
+    assert np.array_equal(out, expected)
+
+    # meshes of tiles fit into the mesh of the layout
+    grid = layout_mesh(layout)
+    row, col = layout['tiles'][-1]
+    tile = tile_index(row, col, layout['size'])
+    tgrid = index_mesh(tile, step = 0.001, epsg = 4326)
+    region = intersect(index, tile)
+    assert np.allclose\
+        (grid['mesh'][0][region[0] - index[0]:region[2] - index[0]],
+         tgrid['mesh'][0][region[0] - tile[0]:region[2] - tile[0]])
+    assert np.allclose\
+        (grid['mesh'][1][region[1] - index[1]:region[3] - index[1]],
+         tgrid['mesh'][1][region[1] - tile[1]:region[3] - tile[1]])
+
+
+def test_intersect():
+    assert intersect((0, 0, 10, 10), (5, 5, 20, 20)) == (5, 5, 10, 10)
+    assert intersect((0, 0, 10, 10), (10, 0, 20, 10)) is None
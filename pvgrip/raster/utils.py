@@ -4,41 +4,50 @@ import itertools
 
 import numpy as np
 
-from scipy import ndimage as nd
-
 from pvgrip.raster.mesh \
     import mesh
 from pvgrip.utils.epsg \
     import epsg2ll, ll2epsg
 
 
-def fill_missing(data, missing_value = -9999):
-    """Replace the value of missing 'data' cells (indicated by
-    'missing_value') by the value of the nearest cell
-
-    Taken from: https://stackoverflow.com/a/27745627
+def _box_too_big(box, step, mesh_type, limit, max_points):
+    """Check if a box is too big
 
+    :return: (error message or None, grid)
     """
-    missing = data == missing_value
-    ind = nd.distance_transform_edt(missing,
-                                    return_distances=False,
-                                    return_indices=True)
-    return data[tuple(ind)]
-
-
-def check_box_not_too_big(box, step, mesh_type,
-                          limit = 4400, max_points = 2e+7):
     const = 1 if '4326' == str(mesh_type) else 111000
     if const*abs(box[2] - box[0])/step > limit \
        or const*abs(box[3] - box[1])/step > limit:
-        raise RuntimeError\
-            ("step in box should not be larger than %.2f" % limit)
+        return "step in box should not be larger than %.2f" % limit, \
+            None
 
     grid = mesh(box = box, step = step, mesh_type = mesh_type)
     if len(grid['mesh'][0])*len(grid['mesh'][1]) \
        > max_points:
-        raise RuntimeError\
-            ("either box or resolution is too high!")
+        return "either box or resolution is too high!", grid
+
+    return None, grid
+
+
+def is_box_too_big(box, step, mesh_type,
+                   limit = 4400, max_points = 2e+7):
+    """Check if a box is too big to be sampled at once
+
+    :return: True or False
+    """
+    msg, _ = _box_too_big(box = box, step = step,
+                          mesh_type = mesh_type,
+                          limit = limit, max_points = max_points)
+    return msg is not None
+
+
+def check_box_not_too_big(box, step, mesh_type,
+                          limit = 4400, max_points = 2e+7):
+    msg, grid = _box_too_big(box = box, step = step,
+                             mesh_type = mesh_type,
+                             limit = limit, max_points = max_points)
+    if msg is not None:
+        raise RuntimeError(msg)
 
     return len(grid['mesh'][1]), len(grid['mesh'][0])
 
@@ -58,9 +58,11 @@ def route_rasters(tsvfn_uploaded, box, box_delta, **kwargs):
         rasters = pickle.load(f)
 
     kwargs['mesh_type'] = determine_epsg(_max_box(rasters), kwargs['mesh_type'])
-    check_box_not_too_big(box = rasters[0]['box'],
-                          step = kwargs['step'],
-                          mesh_type = kwargs['mesh_type'])
+    # rasters of a route are processed as a whole and are not tiled
+    for x in rasters:
+        check_box_not_too_big(box = x['box'],
+                              step = kwargs['step'],
+                              mesh_type = kwargs['mesh_type'])
 
     return check_all_data_available\
         (rasters = rasters, **kwargs), \
@@ -138,7 +140,7 @@ def render_raster_from_route(tsvfn_uploaded, box, box_delta,
     for raster in rasters:
         x = sample_raster(
             box=raster['box'],
-            output_type='pickle' if do_filter else output_type,
+            output_type='raster' if do_filter else output_type,
             **kwargs)
 
         if do_filter:
@@ -13,6 +13,8 @@ from pvgrip.raster.calls \
     import sample_raster, convert_from_to
 from pvgrip.raster.mesh \
     import determine_epsg
+from pvgrip.raster.utils \
+    import check_box_not_too_big
 
 from pvgrip.storage.remotestorage_path \
     import searchandget_locally
@@ -38,6 +40,9 @@ def shadow(timestr, what='shadow',
 
     kwargs['output_type'] = 'geotiff'
     kwargs['mesh_type'] = determine_epsg(kwargs['box'], kwargs['mesh_type'])
+    check_box_not_too_big(box = kwargs['box'],
+                          step = kwargs['step'],
+                          mesh_type = kwargs['mesh_type'])
     tasks = sample_raster(**kwargs)
 
     tasks |= compute_incidence.signature\
@@ -58,6 +63,9 @@ def average_shadow(timestrs_fn, output_type='png', **kwargs):
     """
     kwargs['output_type'] = 'geotiff'
     kwargs['mesh_type'] = determine_epsg(kwargs['box'], kwargs['mesh_type'])
+    check_box_not_too_big(box = kwargs['box'],
+                          step = kwargs['step'],
+                          mesh_type = kwargs['mesh_type'])
     tasks = sample_raster(**kwargs)
 
     # read timestrs
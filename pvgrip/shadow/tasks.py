@@ -1,7 +1,6 @@
 import cv2
 import shutil
 import logging
-import pickle
 
 import numpy as np
 
@@ -12,6 +11,8 @@ from pvgrip.raster.gdalinterface \
     import GDALInterface
 from pvgrip.raster.io \
     import save_gdal
+from pvgrip.raster.container \
+    import write_raster
 
 from pvgrip.grass.io \
     import upload_grass_data, download_grass_data
@@ -128,8 +129,7 @@ def average_png(self, png_files):
 
     ofn = get_tempfile()
     try:
-        with open(ofn, 'wb') as f:
-            pickle.dump({'raster': res}, f)
+        write_raster(ofn, {'raster': res})
     except Exception as e:
         remove_file(ofn)
         raise e
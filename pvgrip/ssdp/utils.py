@@ -1,7 +1,6 @@
 import os
 import pytz
 import shutil
-import pickle
 import logging
 import datetime
 
@@ -10,6 +9,8 @@ import numpy as np
 
 from pvgrip.utils.files \
     import get_tempfile, remove_file, get_tempdir
+from pvgrip.raster.container \
+    import read_raster, write_raster
 from pvgrip.utils.run_command \
     import run_command
 from pvgrip.globals \
@@ -40,14 +41,13 @@ def call_ssdp(what):
 
 
 def pickle2ssdp_topography(ifn, ofn):
-    """Convert pickle raster data to ssdp topography format
+    """Convert raster data to ssdp topography format
 
-    :ifn: input pickle file (output of sample_raster)
+    :ifn: input raster file (output of sample_raster)
 
     :return: ofn output file in the ssdp tsv format
     """
-    with open(ifn, 'rb') as f:
-        data = pickle.load(f)
+    data = read_raster(ifn)
 
     box = data['mesh']['raster_box']
     step = data['mesh']['step']
@@ -69,13 +69,13 @@ def pickle2ssdp_topography(ifn, ofn):
 
 
 def array_1d_2pickle(ssdp_fn, data, ofn):
-    """Convert ssdp output array to a sample_raster pickle
+    """Convert ssdp output array to a sample_raster raster file
 
     :ssdp_fn: ssdp output file with 1d array
 
     :data: second element of what pickle2ssdp_topography returns
 
-    :ofn: filename where to write pickle file
+    :ofn: filename where to write raster file
     """
     with open(ssdp_fn, 'r') as f:
         ssdp_data = [float(line.rstrip()) for line in f]
@@ -85,8 +85,7 @@ def array_1d_2pickle(ssdp_fn, data, ofn):
         (data['raster'].shape,
          order='F')[::-1,:,:]
 
-    with open(ofn, 'wb') as f:
-        pickle.dump(data,f)
+    write_raster(ofn, data)
 
     return ofn
 
@@ -1,6 +1,9 @@
 import json
 import subprocess
 
+from pvgrip.utils.cache_metrics \
+    import summary
+
 
 def _call(what='active'):
     ps = subprocess\
@@ -16,6 +19,7 @@ def _call(what='active'):
 
 def status():
     return {'active': _call('active'),
-            'scheduled': _call('scheduled')}
+            'scheduled': _call('scheduled'),
+            'cache': summary()}
 
 
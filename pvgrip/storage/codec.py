@@ -0,0 +1,184 @@
+import os
+import struct
+
+import numpy as np
+
+
+MAGIC = b'PVGRIPC\x01'
+_HEADER = struct.Struct('<8sBBQ')
+_BLOCK = struct.Struct('<II')
+BLOCK_SIZE = 16*1024**2
+
+
+def _zlib():
+    import zlib
+    return (lambda x: zlib.compress(x, 1), zlib.decompress)
+
+
+def _zstd():
+    import zstandard
+    return (lambda x: zstandard.ZstdCompressor(level = 3).compress(x),
+            lambda x: zstandard.ZstdDecompressor().decompress(x))
+
+
+def _lz4():
+    import lz4.frame
+    return (lz4.frame.compress, lz4.frame.decompress)
+
+
+# codec name -> (id in the header, function returning
+# (compress, decompress))
+CODECS = {'zlib': (1, _zlib),
+          'zstd': (2, _zstd),
+          'lz4': (3, _lz4)}
+_IDS = {v[0]: k for k, v in CODECS.items()}
+
+
+def _get_codec(name):
+    if name not in CODECS:
+        raise RuntimeError("unknown codec = {}".format(name))
+
+    try:
+        return CODECS[name][1]()
+    except ImportError as e:
+        raise RuntimeError("codec = {} is not available: {}"\
+                           .format(name, e))
+
+
+def _shuffle(data, itemsize):
+    """Group bytes of the same significance together
+
+    """
+    if itemsize < 2:
+        return data
+
+    n = len(data) // itemsize * itemsize
+    x = np.frombuffer(data, dtype = np.uint8, count = n)
+    return x.reshape(-1, itemsize).T.tobytes() + data[n:]
+
+
+def _unshuffle(data, itemsize):
+    if itemsize < 2:
+        return data
+
+    n = len(data) // itemsize * itemsize
+    x = np.frombuffer(data, dtype = np.uint8, count = n)
+    return x.reshape(itemsize, -1).T.tobytes() + data[n:]
+
+
+def is_compressed(fn):
+    with open(fn, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def _write(fn, write):
+    """Write a file atomically
+
+    :write: function that writes to an open file, returns False if
+    the file should not be written
+    """
+    tmp = fn + '.codec_tmp'
+    try:
+        with open(tmp, 'wb') as f:
+            res = write(f)
+        if res is False:
+            os.unlink(tmp)
+            return False
+        os.replace(tmp, fn)
+        return True
+    except:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+def _read_exactly(f, n):
+    res = f.read(n)
+    if len(res) != n:
+        raise RuntimeError("truncated compressed file")
+    return res
+
+
+def compress_file(ifn, ofn, codec = 'zstd', shuffle = 8,
+                  min_size = 64*1024, max_ratio = 0.9):
+    """Write a compressed copy of a file
+
+    The file is compressed in independent blocks of BLOCK_SIZE
+    bytes, so that it is never held in memory. Small files and files
+    that do not compress well are not compressed.
+
+    :ifn, ofn: input and output file paths
+
+    :codec: one of CODECS
+
+    :shuffle: item size for the byte-shuffle filter, 0 to disable
+
+    :min_size: minimum size of files to compress in bytes
+
+    :max_ratio: maximum compressed/original size ratio
+
+    :return: True if ofn is written
+    """
+    size = os.path.getsize(ifn)
+    if size < min_size or is_compressed(ifn):
+        return False
+
+    fcompress, _ = _get_codec(codec)
+    # blocks hold whole items for the shuffle
+    block_size = BLOCK_SIZE // max(1, shuffle) * max(1, shuffle)
+
+    def _compress(f):
+        f.write(_HEADER.pack(MAGIC, CODECS[codec][0],
+                             shuffle, size))
+        total = _HEADER.size
+        with open(ifn, 'rb') as fin:
+            for data in iter(lambda: fin.read(block_size), b''):
+                res = fcompress(_shuffle(data, shuffle))
+                f.write(_BLOCK.pack(len(data), len(res)))
+                f.write(res)
+                total += _BLOCK.size + len(res)
+                if total > max_ratio*size:
+                    return False
+        return True
+
+    return _write(ofn, _compress)
+
+
+def decompress_file(fn):
+    """Decompress a file in place
+
+    The file is replaced by a new one, hence other hardlinks to it
+    are not modified. Files are decompressed block by block.
+
+    :return: True if the file was compressed
+    """
+    if not is_compressed(fn):
+        return False
+
+    with open(fn, 'rb') as fin:
+        _, codec, shuffle, size = _HEADER.unpack\
+            (_read_exactly(fin, _HEADER.size))
+        if codec not in _IDS:
+            raise RuntimeError("unknown codec id = {}".format(codec))
+
+        _, fdecompress = _get_codec(_IDS[codec])
+
+        def _decompress(f):
+            total = 0
+            for head in iter(lambda: fin.read(_BLOCK.size), b''):
+                if len(head) != _BLOCK.size:
+                    raise RuntimeError("truncated compressed file")
+                n, ncompressed = _BLOCK.unpack(head)
+                data = _unshuffle(fdecompress\
+                                  (_read_exactly(fin, ncompressed)),
+                                  shuffle)
+                if len(data) != n:
+                    raise RuntimeError("corrupted block")
+                f.write(data)
+                total += n
+            if total != size:
+                raise RuntimeError\
+                    ("decompressed size {} != expected {}"\
+                     .format(total, size))
+
+        return _write(fn, _decompress)
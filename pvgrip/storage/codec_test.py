@@ -0,0 +1,86 @@
+import os
+import pickle
+import shutil
+import pytest
+
+import numpy as np
+
+from pvgrip.storage import codec as codec_module
+from pvgrip.storage.codec \
+    import compress_file, decompress_file, is_compressed, CODECS
+
+
+@pytest.mark.parametrize('codec', list(CODECS))
+@pytest.mark.parametrize('shuffle', [0, 8])
+def test_compress_file_codecs(codec, shuffle):
+    pytest.importorskip({'zlib': 'zlib', 'zstd': 'zstandard',
+                         'lz4': 'lz4'}[codec])
+
+    path = 'test_compress_file_codecs'
+    try:
+        os.makedirs(path)
+        data = pickle.dumps({'raster': np.cumsum(np.ones((100,101))),
+                             'mesh': 'mesh'}) + b'tail'
+        src = os.path.join(path, 'src')
+        with open(src, 'wb') as f:
+            f.write(data)
+
+        dst = os.path.join(path, 'dst')
+        assert compress_file(src, dst, codec = codec,
+                             shuffle = shuffle, min_size = 0)
+        assert os.path.getsize(dst) < len(data)
+        assert decompress_file(dst)
+        with open(dst, 'rb') as f:
+            assert data == f.read()
+    finally:
+        shutil.rmtree(path)
+
+
+def test_compress_file():
+    path = 'test_compress_file'
+    try:
+        os.makedirs(path)
+        src = os.path.join(path, 'src')
+        with open(src, 'wb') as f:
+            pickle.dump(np.zeros((300,300)), f)
+        link = os.path.join(path, 'link')
+        os.link(src, link)
+
+        dst = os.path.join(path, 'dst')
+        assert compress_file(src, dst, codec = 'zlib')
+        assert is_compressed(dst)
+        assert os.path.getsize(dst) < os.path.getsize(src)
+
+        os.replace(dst, link)
+        os.link(link, dst)
+        assert decompress_file(dst)
+        assert not decompress_file(dst)
+        with open(dst, 'rb') as f:
+            assert 0 == pickle.load(f).sum()
+        # other hardlinks are untouched
+        assert is_compressed(link)
+
+        with open(src, 'wb') as f:
+            f.write(os.urandom(100*1024))
+        assert not compress_file(src, dst, codec = 'zlib')
+    finally:
+        shutil.rmtree(path)
+
+
+def test_compress_file_blocks(monkeypatch):
+    monkeypatch.setattr(codec_module, 'BLOCK_SIZE', 1000)
+    path = 'test_compress_file_blocks'
+    try:
+        os.makedirs(path)
+        data = pickle.dumps(np.cumsum(np.ones(10001))) + b'tail'
+        src = os.path.join(path, 'src')
+        with open(src, 'wb') as f:
+            f.write(data)
+
+        dst = os.path.join(path, 'dst')
+        assert compress_file(src, dst, codec = 'zlib', min_size = 0)
+        assert decompress_file(dst)
+        with open(dst, 'rb') as f:
+            assert data == f.read()
+    finally:
+        shutil.rmtree(path)
@@ -1,97 +1,338 @@
 import os
 import time
+import shutil
+import sqlite3
 import logging
-import diskcache
+import threading
+
+from contextlib import contextmanager
+
+
+class LRU_Policy:
+    """Evict the least recently used file
+
+    """
+    name = 'lru'
+
+
+    def priority(self, clock, recency, size, cost, hits):
+        return recency
+
+
+class GDSF_Policy:
+    """GreedyDual-Size-Frequency eviction
+
+    The priority of a file is
+
+        clock + hits * cost / size
+
+    and the file with the lowest priority is evicted. The clock is
+    set to the priority of the last evicted file, so files that are
+    not accessed age. Large files that are cheap to get again are
+    evicted first.
+
+    """
+    name = 'gdsf'
+
+
+    def __init__(self, default_cost = 1):
+        """init
+
+        :default_cost: cost of files with unknown cost
+        """
+        self.default_cost = default_cost
+
+
+    def priority(self, clock, recency, size, cost, hits):
+        if cost is None:
+            cost = self.default_cost
+        return clock + hits * cost / max(size or 0, 1024)
+
+
+POLICIES = {x.name: x for x in (LRU_Policy, GDSF_Policy)}
 
 
 class Files_LRUCache:
 
 
-    def __init__(self, maxsize, path = '.', check_every = 6):
+    def __init__(self, maxsize, path = '.', check_every = 6,
+                 timeout = 60, policy = 'lru'):
         """Implements LRU list of file paths
 
+        The list is kept in a sqlite database (in WAL mode) with one
+        row per tracked file. Rows are indexed by path and by eviction
+        priority, hence lookups, updates and evictions do not depend
+        on the number of tracked files. Every modification is done in
+        a single transaction, so the cache can be shared between
+        processes.
+
         :maxsize: maximum size in GB of stored files
 
-        :path: path where to store diskcache db
+        :path: path where to store the sqlite db
 
         :check_every: number of hours to check the content of cache
 
+        :timeout: seconds to wait for a database lock
+
+        :policy: eviction policy, either a name in POLICIES or an
+        object with the 'priority' method
+
         """
         self.maxsize = maxsize*(1024**3)
         self.check_every = check_every * (60**2)
+        self.timeout = timeout
+        self.policy = POLICIES[policy]() \
+            if isinstance(policy, str) else policy
 
         self.path = path
         os.makedirs(self.path, exist_ok = True)
 
         path = os.path.join(self.path,"_Files_LRUCache")
-        self._deque = diskcache.Deque\
-            (directory = path + '_deque')
-        self._sizes = diskcache.Cache\
-            (directory = path + '_cache',
-             size_limit = (1024**3))
-        self._lock = diskcache.RLock(self._sizes, '_lock')
+        self._dbfn = path + '.sqlite'
+        self._legacy = (path + '_deque', path + '_cache')
+        self._local = threading.local()
+
+        self._import_legacy()
+        self._check_policy()
+
+
+    def _connect(self):
+        db = sqlite3.connect(self._dbfn, timeout = self.timeout,
+                             isolation_level = None)
+        db.execute('PRAGMA journal_mode=WAL')
+        db.execute('PRAGMA synchronous=NORMAL')
+        db.execute("""
+        CREATE TABLE IF NOT EXISTS files
+        (path TEXT PRIMARY KEY,
+         size INTEGER,
+         recency INTEGER NOT NULL)""")
+        db.execute("""
+        CREATE INDEX IF NOT EXISTS files_recency
+        ON files (recency)""")
+        columns = [x[1] for x in db.execute("PRAGMA table_info(files)")]
+        for column, definition in (('cost', 'REAL'),
+                                   ('hits', 'INTEGER NOT NULL DEFAULT 1'),
+                                   ('priority', 'REAL')):
+            if column not in columns:
+                try:
+                    db.execute("ALTER TABLE files ADD COLUMN {} {}"\
+                               .format(column, definition))
+                except sqlite3.OperationalError:
+                    # another process has just added it
+                    pass
+        db.execute("""
+        CREATE INDEX IF NOT EXISTS files_priority
+        ON files (priority)""")
+        db.execute("""
+        CREATE TABLE IF NOT EXISTS meta
+        (key TEXT PRIMARY KEY,
+         value REAL NOT NULL)""")
+        db.execute("""
+        INSERT OR IGNORE INTO meta (key, value)
+        VALUES ('total', 0), ('checked_at', ?), ('clock', 0)""",
+                   (time.time(),))
+        # the eviction policy name is text, meta values are numbers
+        db.execute("""
+        CREATE TABLE IF NOT EXISTS policy
+        (id INTEGER PRIMARY KEY CHECK (id = 0),
+         name TEXT NOT NULL)""")
+        db.execute("""
+        INSERT OR IGNORE INTO policy (id, name) VALUES (0, '')""")
+        if db.execute("SELECT 1 FROM meta WHERE key = 'policy'")\
+             .fetchone():
+            # stored in meta by older versions
+            db.execute("DELETE FROM meta WHERE key = 'policy'")
+        return db
+
+
+    @property
+    def _db(self):
+        # connections are neither shared between threads nor
+        # carried over a fork
+        if getattr(self._local, 'pid', None) != os.getpid():
+            self._local.db = self._connect()
+            self._local.pid = os.getpid()
+        return self._local.db
+
+
+    @contextmanager
+    def _transaction(self):
+        db = self._db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            yield db
+        except:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+
+
+    def _import_legacy(self):
+        """Import the content of the old diskcache based list
+
+        """
+        if not os.path.isdir(self._legacy[0]):
+            return
+
+        import diskcache
+
+        with self._transaction() as db:
+            # another process might have done this already
+            if not os.path.isdir(self._legacy[0]):
+                return
 
-        with self._lock:
-            if 'total' not in self._sizes:
-                self._sizes['total'] = 0
-            if 'checked_at' not in self._sizes:
-                self._sizes['checked_at'] = time.time()
+            deque = diskcache.Deque(directory = self._legacy[0])
+            sizes = diskcache.Cache(directory = self._legacy[1])
+            for item in deque:
+                self._update_order(db, item)
+                size = sizes.get('file://' + item)
+                if size is not None:
+                    self._set_size(db, item, None, size)
+                self._update_priority(db, item)
+            deque.cache.close()
+            sizes.close()
 
+            for x in self._legacy:
+                shutil.rmtree(x, ignore_errors = True)
 
-    def _remove_from_sizes(self, item):
-        if ('file://' + item) in self._sizes:
-            self._sizes['total'] -= \
-                self._sizes['file://' + item]
-            del self._sizes['file://' + item]
-            return True
 
-        return False
+    def _check_policy(self):
+        """Recompute priorities if the eviction policy has changed
+
+        """
+        if self._get_policy(self._db) == self.policy.name:
+            return
+
+        with self._transaction() as db:
+            db.execute("UPDATE meta SET value = 0 "
+                       "WHERE key = 'clock'")
+            rows = db.execute("SELECT path FROM files").fetchall()
+            for item, in rows:
+                self._update_priority(db, item)
+            db.execute("UPDATE policy SET name = ? WHERE id = 0",
+                       (self.policy.name,))
+
+
+    def _get_policy(self, db):
+        return db.execute("SELECT name FROM policy WHERE id = 0")\
+                 .fetchone()[0]
+
+
+    def _update_priority(self, db, item):
+        row = db.execute("""
+        SELECT recency, size, cost, hits
+        FROM files WHERE path = ?""", (item,)).fetchone()
+        if row is None:
+            return
+
+        priority = self.policy.priority\
+            (self._get_meta(db, 'clock'), *row)
+        db.execute("UPDATE files SET priority = ? WHERE path = ?",
+                   (priority, item))
+
+
+    def _get_meta(self, db, key):
+        return db.execute("SELECT value FROM meta WHERE key = ?",
+                          (key,)).fetchone()[0]
+
+
+    def _add_total(self, db, delta):
+        db.execute("UPDATE meta SET value = value + ? "
+                   "WHERE key = 'total'", (delta,))
+
+
+    def _get_size(self, db, item):
+        """Return (if tracked, size or None if size is unknown)
+        """
+        row = db.execute("SELECT size FROM files WHERE path = ?",
+                         (item,)).fetchone()
+        if row is None:
+            return False, None
+        return True, row[0]
+
+
+    def _set_size(self, db, item, old, size):
+        db.execute("UPDATE files SET size = ? WHERE path = ?",
+                   (size, item))
+        self._add_total(db, size - (old or 0))
+
+
+    def _remove(self, db, item, size):
+        db.execute("DELETE FROM files WHERE path = ?", (item,))
+        self._add_total(db, -(size or 0))
 
 
     def check_content(self):
         """Check content of lists and remove deleted files
         """
-        with self._lock:
-            [self._update_sizes(p) for p in self._deque]
+        rows = self._db.execute("SELECT path, size FROM files")\
+                       .fetchall()
+
+        changed = []
+        for item, size in rows:
+            if not os.path.exists(item):
+                if size is not None:
+                    changed += [item]
+                continue
+
+            if os.stat(item).st_size != size:
+                changed += [item]
+
+        if not changed:
+            return
+
+        with self._transaction() as db:
+            for item in changed:
+                self._update_sizes(db, item)
+                self._update_priority(db, item)
+
 
+    def _update_order(self, db, item, cost = None):
+        db.execute("""
+        INSERT INTO files (path, size, recency, cost, hits)
+        VALUES (?, NULL,
+                (SELECT COALESCE(MAX(recency), 0) + 1 FROM files),
+                ?, 1)
+        ON CONFLICT (path) DO UPDATE
+        SET recency = excluded.recency,
+            cost = COALESCE(excluded.cost, cost),
+            hits = hits + 1""", (item, cost))
 
-    def _update_order(self, item):
-        if item in self._deque:
-            self._deque.remove(item)
-        self._deque.append(item)
 
+    def _update_sizes(self, db, item):
+        tracked, old = self._get_size(db, item)
 
-    def _update_sizes(self, item):
         if not os.path.exists(item):
-            if self._remove_from_sizes(item):
-                # here only if something was deleted from _sizes
-                self._deque.remove(item)
+            if tracked and old is not None:
+                # here only if the file was there before
+                self._remove(db, item, old)
             return
 
         size = os.stat(item).st_size
+        if tracked and old != size:
+            self._set_size(db, item, old, size)
 
-        if ('file://' + item) not in self._sizes:
-            self._sizes['total'] += size
-            self._sizes['file://' + item] = size
-            return
 
-        if self._sizes['file://' + item] != size:
-            self._sizes['total'] += \
-                size - self._sizes['file://' + item]
-            self._sizes['file://' + item] = size
-            return
+    def _update(self, db, item, cost = None):
+        """Update item in a transaction
 
+        :return: True if the content of cache is due to be checked
+        """
+        self._update_order(db, item, cost)
+        self._update_sizes(db, item)
+        self._update_priority(db, item)
 
-    def _update(self, item):
-        self._update_order(item)
-        self._update_sizes(item)
+        now = time.time()
+        if (now - self._get_meta(db, 'checked_at')) \
+           <= self.check_every:
+            return False
 
-        if (time.time() - self._sizes['checked_at']) > self.check_every:
-            self._sizes['checked_at'] = time.time()
-            self.check_content()
+        db.execute("UPDATE meta SET value = ? "
+                   "WHERE key = 'checked_at'", (now,))
+        return True
 
 
-    def add(self, fn):
+    def add(self, fn, cost = None):
         """Add a file to a cache
 
         File does not have to exist at a time of addition. Any query
@@ -99,20 +340,30 @@ class Files_LRUCache:
 
         :fn: path to a file
 
+        :cost: optional cost (e.g. seconds) to get the file again,
+        if None the previously recorded cost is kept
+
         """
-        with self._lock:
-            while self._sizes['total'] >= self.maxsize \
-                  and len(self._deque) > 0:
-                self.popleft()
-            self._update(fn)
+        with self._transaction() as db:
+            while self._get_meta(db, 'total') >= self.maxsize \
+                  and self._popleft(db) is not None:
+                pass
+            check = self._update(db, fn, cost)
+
+        if check:
+            self.check_content()
 
 
     def __contains__(self, item):
-        if item not in self._deque:
+        tracked, _ = self._get_size(self._db, item)
+        if not tracked:
             return False
 
-        with self._lock:
-            self._update(item)
+        with self._transaction() as db:
+            check = self._update(db, item)
+
+        if check:
+            self.check_content()
 
         if not os.path.exists(item):
             return False
@@ -120,33 +371,59 @@ class Files_LRUCache:
         return True
 
 
+    def paths(self):
+        """Iterate over all tracked paths
+
+        """
+        for x in self._db.execute("SELECT path FROM files"):
+            yield x[0]
+
+
     def __len__(self):
-        return len(self._deque)
+        return self._db.execute("SELECT COUNT(*) FROM files")\
+                       .fetchone()[0]
 
 
     def size(self):
         """Return total used space in bytes
         """
-        return self._sizes['total']
+        return int(self._get_meta(self._db, 'total'))
+
+
+    def _popleft(self, db):
+        row = db.execute("""
+        SELECT path, size, priority FROM files
+        ORDER BY priority LIMIT 1""").fetchone()
+        if row is None:
+            return None
+
+        item, size, priority = row
+        db.execute("UPDATE meta SET value = MAX(value, ?) "
+                   "WHERE key = 'clock'", (priority or 0,))
+        try:
+            os.remove(item)
+        except:
+            pass
+
+        self._remove(db, item, size)
+        logging.debug("""
+        file is removed from cache: {}
+        Files_LRUCache size: {:.5f} GB
+        Files_LRUCache usage: {:.2%}
+        """.format(item, self._get_meta(db, 'total')/(1024**3),
+                   self._get_meta(db, 'total') / self.maxsize))
+        return item
 
 
     def popleft(self):
-        """Pop the least recently used file
+        """Pop the file with the lowest eviction priority
 
         Popping tries to delete the tracked by cache file.
         """
-        with self._lock:
-            item = self._deque.popleft()
-            try:
-                os.remove(item)
-            except:
-                pass
+        with self._transaction() as db:
+            item = self._popleft(db)
+
+        if item is None:
+            raise IndexError('pop from an empty Files_LRUCache')
 
-            self._remove_from_sizes(item)
-            logging.debug("""
-            file is removed from cache: {}
-            Files_LRUCache size: {:.5f} GB
-            Files_LRUCache usage: {:.2%}
-            """.format(item, self.size()/(1024**3),
-                       self.size() / self.maxsize))
-            return item
+        return item
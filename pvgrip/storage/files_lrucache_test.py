@@ -138,3 +138,91 @@ def test_Files_LRUCache_large_number_of_files(N = int(1e+3)):
         assert N*1024 == cache.size()
     finally:
         shutil.rmtree(path)
+
+
+def _add_files(path, prefix, N):
+    cache = Files_LRUCache(maxsize = 1, path = path)
+    for i in range(N):
+        p = os.path.join(path, "{}_{}_test_file".format(prefix, i))
+        touch(p)
+        cache.add(p)
+
+
+def test_Files_LRUCache_processes(N = 100, nprocs = 4):
+    import multiprocessing
+
+    path="test_Files_LRUCache_processes"
+    try:
+        os.makedirs(path, exist_ok = True)
+        cache = Files_LRUCache(maxsize = 1, path = path)
+
+        procs = [multiprocessing.Process\
+                 (target = _add_files, args = (path, i, N))
+                 for i in range(nprocs)]
+        [p.start() for p in procs]
+        [p.join() for p in procs]
+
+        assert nprocs*N == len(cache)
+        assert nprocs*N*1024 == cache.size()
+    finally:
+        shutil.rmtree(path)
+
+
+def test_Files_LRUCache_legacy():
+    import diskcache
+
+    path="test_Files_LRUCache_legacy"
+    try:
+        os.makedirs(path, exist_ok = True)
+        prefix = os.path.join(path, "_Files_LRUCache")
+        deque = diskcache.Deque(directory = prefix + '_deque')
+        sizes = diskcache.Cache(directory = prefix + '_cache')
+
+        for x in ("a", "b", "c"):
+            p = os.path.join(path, x)
+            touch(p)
+            deque.append(p)
+            sizes['file://' + p] = 1024
+        sizes['total'] = 3*1024
+
+        cache = Files_LRUCache(maxsize = 1, path = path)
+        assert 3 == len(cache)
+        assert 3*1024 == cache.size()
+        assert not os.path.exists(prefix + '_deque')
+        assert os.path.join(path, "a") == cache.popleft()
+    finally:
+        shutil.rmtree(path)
+
+
+def test_Files_LRUCache_gdsf():
+    path = "test_Files_LRUCache_gdsf"
+    try:
+        os.makedirs(path, exist_ok = True)
+        cache = Files_LRUCache(maxsize = 25*1024/(1024**3), path = path,
+                               policy = 'gdsf')
+
+        # large and cheap, then small and expensive
+        touch(os.path.join(path, 'large'), size = 20*1024)
+        cache.add(os.path.join(path, 'large'), cost = 1)
+        touch(os.path.join(path, 'small'), size = 2*1024)
+        cache.add(os.path.join(path, 'small'), cost = 10)
+        touch(os.path.join(path, 'new'), size = 4*1024)
+        cache.add(os.path.join(path, 'new'), cost = 1)
+        touch(os.path.join(path, 'new2'), size = 1024)
+        cache.add(os.path.join(path, 'new2'), cost = 1)
+
+        # the large file is evicted, although it is not the least
+        # recently used one
+        assert os.path.join(path, 'large') not in cache
+        assert os.path.join(path, 'small') in cache
+        assert os.path.join(path, 'new') in cache
+
+        # changing policy recomputes priorities
+        cache = Files_LRUCache(maxsize = 25*1024/(1024**3), path = path)
+        assert os.path.join(path, 'new2') == cache.popleft()
+
+        # meta holds numbers only
+        types = cache._db.execute("SELECT typeof(value) FROM meta")
+        assert {x for x, in types} <= {'real', 'integer'}
+    finally:
+        shutil.rmtree(path)
@@ -1,5 +1,6 @@
 import os
 import time
+import uuid
 import shutil
 import logging
 
@@ -7,14 +8,6 @@ from pvgrip.utils.redis.lock \
     import RedisLock
 
 
-def _touch(fn, times = None):
-    f = open(fn, 'a')
-    try:
-        os.utime(fn, times)
-    finally:
-        f.close()
-
-
 def _unlink(fn):
     try:
         os.unlink(fn)
@@ -29,18 +22,51 @@ def _mkdir(fn):
         pass
 
 
-def _copy_or_link(src, dst):
-    _mkdir(dst)
+def _fsync_dir(path):
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
 
     try:
-        os.link(src, dst)
-    except OSError as e:
+        os.fsync(fd)
+    except OSError:
         pass
+    finally:
+        os.close(fd)
+
+
+def _copy_or_link(src, dst, timestamp = None):
+    """Atomically place a copy (or a hardlink) of src to dst
+
+    The content is first written to a temporary file next to dst,
+    flushed to disk and then renamed to dst. Hence, dst is either
+    absent, the old file or the complete new file.
+
+    :timestamp: optionally set timestamp of dst
+    """
+    _mkdir(dst)
+    tmp = os.path.join(os.path.dirname(dst),
+                       ".{}.tmp-{}".format(os.path.basename(dst),
+                                           uuid.uuid4().hex))
 
     try:
-        shutil.copyfile(src, dst)
-    except shutil.SameFileError as e:
-        pass
+        try:
+            os.link(src, tmp)
+        except OSError:
+            shutil.copyfile(src, tmp)
+            with open(tmp, 'rb+') as f:
+                os.fsync(f.fileno())
+
+        if timestamp is not None:
+            os.utime(tmp, (timestamp, timestamp))
+
+        os.replace(tmp, dst)
+    except:
+        _unlink(tmp)
+        raise
+
+    _fsync_dir(os.path.dirname(dst))
 
 
 class LOCALIO_Files:
@@ -49,6 +75,11 @@ class LOCALIO_Files:
                  lock_expire = 600, lock_sleep = 1):
         """init
 
+        Files are written to a temporary file and atomically renamed,
+        so readers never take a lock and never see a partial
+        file. Writers to the same path are serialised with a redis
+        lock.
+
         :root: path to the root of data directory
 
         :redis_url: url describing how to reach redis
@@ -65,6 +96,7 @@ class LOCALIO_Files:
         self._lock_expire = lock_expire
         self._lock_sleep = lock_sleep
         self._sanityfn = os.path.join(self._root,'localio.sanity')
+        self._cleanup_failchecks()
 
 
     def _sanity(self):
@@ -79,24 +111,27 @@ class LOCALIO_Files:
         return os.path.join(self._root, "data", fn.lstrip(os.path.sep))
 
 
-    def _check_fn(self, storage_fn):
-        res = os.path.join(self._root, "failchecks", storage_fn.lstrip(os.path.sep))
-        _mkdir(res)
-        return res
+    def _cleanup_failchecks(self):
+        """Remove files left by interrupted writes of older versions
 
+        Previously writers marked unfinished files in the
+        'failchecks' directory.
+        """
+        path = os.path.join(self._root, "failchecks")
+        if not os.path.isdir(path):
+            return
 
-    def _check(self, storage_fn):
-        cfn = self._check_fn(storage_fn)
-        sfn = self._storage_fn(storage_fn)
+        for root, _, files in os.walk(path):
+            for fn in files:
+                cfn = os.path.join(root, fn)
+                sfn = self._storage_fn(os.path.relpath(cfn, path))
+                logging.error("""a check file for {} exists!
+                removing {} and {}
+                """.format(sfn, sfn, cfn))
+                _unlink(sfn)
+                _unlink(cfn)
 
-        if os.path.exists(cfn):
-            _unlink(sfn)
-            _unlink(cfn)
-            msg = """a check file for {} exists!
-            removing {} and {}
-            """.format(storage_fn, sfn, cfn)
-            logging.error(msg)
-            raise RuntimeError(msg)
+        shutil.rmtree(path, ignore_errors = True)
 
 
     def _lock(self, storage_fn):
@@ -107,38 +142,38 @@ class LOCALIO_Files:
 
 
     def __contains__(self, storage_fn):
-        with self._lock(storage_fn):
-            self._sanity()
-
-            try:
-                self._check(storage_fn)
-            except:
-                return False
+        self._sanity()
+        return os.path.isfile(self._storage_fn(storage_fn))
 
-            return os.path.isfile(self._storage_fn(storage_fn))
 
+    def contains_many(self, storage_fns):
+        """Check many files at once
 
-    def _set_timestamp(self, storage_fn, timestamp):
-        if timestamp is None:
-            return
+        :storage_fns: list of paths relative to the storage root
 
-        sfn = self._storage_fn(storage_fn)
-        os.utime(sfn, (timestamp, timestamp))
+        :return: list of booleans
+        """
+        self._sanity()
+        return [os.path.isfile(self._storage_fn(x)) \
+                for x in storage_fns]
 
 
     def get_timestamp(self, storage_fn):
-        if storage_fn not in self:
+        self._sanity()
+        try:
+            return os.stat(self._storage_fn(storage_fn)).st_mtime
+        except FileNotFoundError:
             return None
 
-        return os.stat(self._storage_fn(storage_fn)).st_mtime
-
 
     def update_timestamp(self, storage_fn):
-        if storage_fn not in self:
+        self._sanity()
+        now = time.time()
+        try:
+            os.utime(self._storage_fn(storage_fn), (now, now))
+        except FileNotFoundError:
             return None
 
-        self._set_timestamp(storage_fn, time.time())
-
 
     def download(self, storage_fn, ofn):
         """download file locally
@@ -148,13 +183,13 @@ class LOCALIO_Files:
         :ofn: output file path
 
         """
-        if storage_fn not in self:
+        self._sanity()
+        try:
+            _copy_or_link(self._storage_fn(storage_fn), ofn)
+        except FileNotFoundError:
             raise RuntimeError('{} not in storage!'\
                                .format(storage_fn))
 
-        with self._lock(storage_fn):
-            _copy_or_link(self._storage_fn(storage_fn), ofn)
-
 
     def upload(self, ifn, storage_fn, timestamp = None):
         """upload file to the storage
@@ -169,14 +204,8 @@ class LOCALIO_Files:
         """
         with self._lock(storage_fn):
             self._sanity()
-
-            chck = self._check_fn(storage_fn)
-            _touch(chck)
-
-            _copy_or_link(ifn, self._storage_fn(storage_fn))
-            self._set_timestamp(storage_fn, timestamp)
-
-            _unlink(chck)
+            _copy_or_link(ifn, self._storage_fn(storage_fn),
+                          timestamp)
 
 
     def link(self, src, dst, timestamp = None):
@@ -196,17 +225,13 @@ class LOCALIO_Files:
         if -1 == timestamp:
             timestamp = self.get_timestamp(src)
 
-        with self._lock(src) and self._lock(dst):
-            chck = self._check_fn(dst)
-            _touch(chck)
-
-            sdst = self._storage_fn(dst)
-            if os.path.isfile(sdst):
-                _unlink(sdst)
-            _copy_or_link(self._storage_fn(src), sdst)
-            self._set_timestamp(dst, timestamp)
-
-            _unlink(chck)
+        with self._lock(dst):
+            try:
+                _copy_or_link(self._storage_fn(src),
+                              self._storage_fn(dst), timestamp)
+            except FileNotFoundError:
+                raise RuntimeError('{} not in storage!'\
+                                   .format(src))
 
 
     def delete(self, storage_fn):
@@ -219,4 +244,3 @@ class LOCALIO_Files:
 
         with self._lock(storage_fn):
             _unlink(self._storage_fn(storage_fn))
-            _unlink(self._check_fn(storage_fn))
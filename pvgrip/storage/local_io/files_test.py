@@ -0,0 +1,119 @@
+import os
+import shutil
+import multiprocessing
+
+from pvgrip.globals \
+    import REDIS_URL
+
+from pvgrip.storage.local_io.files \
+    import LOCALIO_Files
+
+
+_SIZE = 4*1024**2
+
+
+def _storage(path):
+    os.makedirs(path, exist_ok = True)
+    open(os.path.join(path, 'localio.sanity'), 'w').close()
+    return LOCALIO_Files(root = path, redis_url = REDIS_URL,
+                         lock_sleep = 0.01)
+
+
+def _write(fn, char):
+    with open(fn, 'wb') as f:
+        f.write(char*_SIZE)
+
+
+def _writer(path, nwrites):
+    storage = _storage(path)
+    for i in range(nwrites):
+        fn = os.path.join(path, 'src_{}'.format(i))
+        _write(fn, b'ab'[i % 2:i % 2 + 1])
+        storage.upload(fn, 'file')
+
+
+def _reader(path, nreads, queue):
+    storage = _storage(path)
+    res = True
+    for i in range(nreads):
+        ofn = os.path.join(path, 'dst_{}_{}'.format(os.getpid(), i))
+        if 'file' not in storage:
+            continue
+        storage.download('file', ofn)
+        with open(ofn, 'rb') as f:
+            data = f.read()
+        res &= len(data) == _SIZE and \
+            data in (b'a'*_SIZE, b'b'*_SIZE)
+        os.unlink(ofn)
+    queue.put(res)
+
+
+def test_LOCALIO_Files():
+    path = 'test_LOCALIO_Files'
+    try:
+        storage = _storage(path)
+        fn = os.path.join(path, 'src')
+        _write(fn, b'a')
+
+        assert 'one' not in storage
+        assert storage.get_timestamp('one') is None
+        storage.upload(fn, 'one', timestamp = 123)
+        assert 'one' in storage
+        assert 123 == storage.get_timestamp('one')
+        assert [True, False] == storage.contains_many(['one', 'two'])
+
+        storage.link('one', 'two', -1)
+        assert 123 == storage.get_timestamp('two')
+        storage.update_timestamp('two')
+        assert 123 < storage.get_timestamp('two')
+
+        storage.download('two', os.path.join(path, 'dst'))
+        with open(os.path.join(path, 'dst'), 'rb') as f:
+            assert b'a'*_SIZE == f.read()
+
+        storage.delete('two')
+        assert 'two' not in storage
+        assert not [x for x in os.listdir(os.path.join(path, 'data'))
+                    if x.startswith('.')]
+    finally:
+        shutil.rmtree(path)
+
+
+def test_LOCALIO_Files_concurrent():
+    path = 'test_LOCALIO_Files_concurrent'
+    try:
+        _storage(path)
+        queue = multiprocessing.Queue()
+        writer = multiprocessing.Process\
+            (target = _writer, args = (path, 20))
+        readers = [multiprocessing.Process\
+                   (target = _reader, args = (path, 50, queue))
+                   for _ in range(4)]
+        writer.start()
+        [p.start() for p in readers]
+        res = [queue.get() for _ in readers]
+        writer.join()
+        [p.join() for p in readers]
+
+        assert all(res)
+    finally:
+        shutil.rmtree(path)
+
+
+def test_LOCALIO_Files_failchecks():
+    path = 'test_LOCALIO_Files_failchecks'
+    try:
+        storage = _storage(path)
+        fn = os.path.join(path, 'src')
+        _write(fn, b'a')
+        storage.upload(fn, 'dir/one')
+
+        os.makedirs(os.path.join(path, 'failchecks', 'dir'))
+        open(os.path.join(path, 'failchecks', 'dir', 'one'), 'w')\
+            .close()
+
+        storage = _storage(path)
+        assert 'dir/one' not in storage
+        assert not os.path.exists(os.path.join(path, 'failchecks'))
+    finally:
+        shutil.rmtree(path)
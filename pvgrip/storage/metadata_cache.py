@@ -0,0 +1,82 @@
+import threading
+
+from cachetools \
+    import TTLCache
+
+
+class Metadata_Cache:
+
+
+    def __init__(self, ttl_positive = 60, ttl_negative = 5,
+                 maxsize = 100000):
+        """Cache of remote storage metadata
+
+        Keeps for each (remotetype, path) if the file is in storage
+        and its timestamp. Files known to be in storage are
+        remembered for 'ttl_positive' seconds, missing files for
+        'ttl_negative' seconds.
+
+        :ttl_positive, ttl_negative: time to live in seconds
+
+        :maxsize: maximum number of entries of each kind
+
+        """
+        self.ttl_positive = ttl_positive
+        self._positive = TTLCache(maxsize = maxsize, ttl = ttl_positive)
+        self._negative = TTLCache(maxsize = maxsize, ttl = ttl_negative)
+        self._lock = threading.Lock()
+
+
+    def exists(self, remotetype, path):
+        """Check if a file is in storage
+
+        :return: True, False or None if unknown
+        """
+        key = (remotetype, path)
+        with self._lock:
+            if key in self._positive:
+                return True
+            if key in self._negative:
+                return False
+        return None
+
+
+    def timestamp(self, remotetype, path):
+        """Get timestamp of the file
+
+        :return: timestamp or None if unknown
+        """
+        with self._lock:
+            return self._positive.get((remotetype, path))
+
+
+    def set(self, remotetype, path, exists, timestamp = None):
+        """Remember metadata of a file
+
+        :exists: if file is in storage
+
+        :timestamp: timestamp of a file, if known
+        """
+        key = (remotetype, path)
+        with self._lock:
+            self._positive.pop(key, None)
+            self._negative.pop(key, None)
+            if exists:
+                self._positive[key] = timestamp
+            else:
+                self._negative[key] = None
+
+
+    def invalidate(self, remotetype, path):
+        """Forget everything about a file
+        """
+        key = (remotetype, path)
+        with self._lock:
+            self._positive.pop(key, None)
+            self._negative.pop(key, None)
+
+
+    def clear(self):
+        with self._lock:
+            self._positive.clear()
+            self._negative.clear()
@@ -0,0 +1,32 @@
+import time
+
+from pvgrip.storage.metadata_cache \
+    import Metadata_Cache
+
+
+def test_Metadata_Cache():
+    cache = Metadata_Cache(ttl_positive = 1, ttl_negative = 0.5)
+
+    assert cache.exists('ipfs_path', 'a') is None
+    cache.set('ipfs_path', 'a', True)
+    cache.set('ipfs_path', 'b', False)
+    assert cache.exists('ipfs_path', 'a')
+    assert cache.timestamp('ipfs_path', 'a') is None
+    assert cache.exists('ipfs_path', 'b') is False
+    assert cache.exists('localmount_hdf', 'a') is None
+
+    cache.set('ipfs_path', 'a', True, 123)
+    assert 123 == cache.timestamp('ipfs_path', 'a')
+
+    cache.set('ipfs_path', 'b', True, 321)
+    assert cache.exists('ipfs_path', 'b')
+
+    cache.invalidate('ipfs_path', 'b')
+    assert cache.exists('ipfs_path', 'b') is None
+
+    cache.set('ipfs_path', 'b', False)
+    time.sleep(0.6)
+    assert cache.exists('ipfs_path', 'b') is None
+    assert cache.exists('ipfs_path', 'a')
+    time.sleep(0.5)
+    assert cache.exists('ipfs_path', 'a') is None
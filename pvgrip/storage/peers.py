@@ -0,0 +1,237 @@
+import os
+import uuid
+import socket
+import hashlib
+import logging
+import requests
+import threading
+
+from cachetools \
+    import LRUCache
+from http.server \
+    import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+from pvgrip.utils.redis.client \
+    import redis_client
+
+
+_KEY = 'pvgrip_peers_{}'
+_CHUNK_SIZE = 1024**2
+
+
+def _hash_file(fn, chunk_size = _CHUNK_SIZE):
+    h = hashlib.md5()
+
+    with open(fn, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+
+    return h.hexdigest()
+
+
+class _Handler(SimpleHTTPRequestHandler):
+
+    def __init__(self, *args, allowed, **kwargs):
+        self._allowed = allowed
+        super().__init__(*args, **kwargs)
+
+
+    def send_head(self):
+        path = self.translate_path(self.path)
+        real = os.path.realpath(path)
+        if not real.startswith(os.path.realpath(self.directory)
+                               + os.path.sep) \
+           or not os.path.isfile(real) \
+           or not self._allowed(path):
+            self.send_error(404, "File not found")
+            return None
+        return super().send_head()
+
+
+    def list_directory(self, path):
+        self.send_error(404, "File not found")
+        return None
+
+
+    def log_message(self, format, *args):
+        logging.debug("peer server: " + format % args)
+
+
+def serve(root, port, allowed, host = '0.0.0.0'):
+    """Serve files of a directory over http in a daemon thread
+
+    Directory listings are not served.
+
+    :root: directory to serve
+
+    :port: port to listen on
+
+    :host: interface to listen on. The address announced to peers
+    (see Peer_Directory) may differ, e.g. in a container
+
+    :allowed: function that checks if a file (absolute path under
+    root) can be served, e.g. if it is a cached result
+
+    :return: the server
+    """
+    server = ThreadingHTTPServer\
+        ((host, int(port)),
+         lambda *args, **kwargs: _Handler\
+         (*args, directory = root, allowed = allowed, **kwargs))
+    server.daemon_threads = True
+    threading.Thread(target = server.serve_forever,
+                     daemon = True).start()
+    logging.info("peer server: serving {} on {}:{}"\
+                 .format(root, host, port))
+    return server
+
+
+class Peer_Directory:
+
+
+    def __init__(self, redis_url, root, address = None, port = 8082,
+                 ttl = 3600, timeout = 30, announce = True):
+        """Directory of files cached locally on workers
+
+        Workers announce files under 'root' they hold. Files are
+        identified by their path relative to 'root'. Other workers
+        download them from the peer file server, with the md5 of the
+        file verified.
+
+        :redis_url: how to connect to redis
+
+        :root: directory served by the peer file servers
+
+        :address: host:port of the file server of this worker. By
+        default, hostname and port
+
+        :ttl: seconds after which an entry is forgotten, unless
+        announced again
+
+        :timeout: seconds to wait for a peer to respond
+
+        :announce: if False, files are not announced, e.g. if the
+        file server of this worker is not running. Files are still
+        fetched from peers
+
+        """
+        self._redis = redis_client(redis_url)
+        self._root = os.path.abspath(root)
+        if address is None:
+            address = '{}:{}'.format(socket.gethostname(), port)
+        self.address = address
+        self._ttl = ttl
+        self._timeout = timeout
+        self._announce = announce
+        # path -> (mtime, size, md5) of announced files
+        self._hashes = LRUCache(maxsize = 100000)
+        self._lock = threading.Lock()
+
+
+    def _relpath(self, path):
+        res = os.path.relpath(os.path.abspath(path), self._root)
+        if res.startswith('..'):
+            return None
+        return res
+
+
+    def _remember(self, path, md5):
+        st = os.stat(path)
+        with self._lock:
+            self._hashes[path] = (st.st_mtime_ns, st.st_size, md5)
+
+
+    def _md5(self, path):
+        """md5 of a file, computed once as long as it is unchanged
+
+        """
+        st = os.stat(path)
+        with self._lock:
+            res = self._hashes.get(path)
+        if res is not None and res[:2] == (st.st_mtime_ns, st.st_size):
+            return res[2]
+
+        md5 = _hash_file(path)
+        self._remember(path, md5)
+        return md5
+
+
+    def add(self, path):
+        """Announce that a file is available on this worker
+
+        """
+        rel = self._relpath(path)
+        if not self._announce or rel is None:
+            return
+
+        key = _KEY.format(rel)
+        pipe = self._redis.pipeline(transaction = False)
+        pipe.hset(key, self.address, self._md5(path))
+        pipe.expire(key, self._ttl)
+        pipe.execute()
+
+
+    def remove(self, path, address = None):
+        """Forget that a file is available on a peer
+
+        :address: address of the peer, by default this worker
+        """
+        address = self.address if address is None else address
+        self._redis.hdel(_KEY.format(self._relpath(path)), address)
+
+
+    def peers(self, path):
+        """Get peers that hold a file
+
+        :return: dictionary address -> md5
+        """
+        res = self._redis.hgetall(_KEY.format(self._relpath(path)))
+        return {k.decode(): v.decode() for k, v in res.items()
+                if k.decode() != self.address}
+
+
+    def _download(self, address, md5, path, ofn):
+        url = 'http://{}/{}'.format(address, self._relpath(path))
+        h = hashlib.md5()
+        with requests.get(url, stream = True,
+                          timeout = self._timeout) as r:
+            r.raise_for_status()
+            with open(ofn, 'wb') as f:
+                for chunk in r.iter_content(_CHUNK_SIZE):
+                    f.write(chunk)
+                    h.update(chunk)
+
+        if h.hexdigest() != md5:
+            raise RuntimeError("md5 mismatch: {} != {}"\
+                               .format(h.hexdigest(), md5))
+
+
+    def fetch(self, path):
+        """Download a file from a peer
+
+        Peers that fail to deliver the file are forgotten.
+
+        :return: True if the file was downloaded to path
+        """
+        if self._relpath(path) is None:
+            return False
+
+        for address, md5 in self.peers(path).items():
+            tmp = '{}.tmp-{}'.format(path, uuid.uuid4().hex)
+            try:
+                self._download(address, md5, path, tmp)
+                os.replace(tmp, path)
+                self._remember(path, md5)
+                return True
+            except Exception as e:
+                logging.warning("""Failed to fetch file from peer
+                path: {}
+                peer: {}
+                error: {}
+                """.format(path, address, str(e)))
+                self.remove(path, address)
+            finally:
+                if os.path.exists(tmp):
+                    os.unlink(tmp)
+
+        return False
@@ -0,0 +1,101 @@
+import os
+import shutil
+import requests
+
+from pvgrip.globals \
+    import REDIS_URL
+
+from pvgrip.storage import peers
+from pvgrip.storage.peers \
+    import Peer_Directory, serve
+
+
+def _write(fn, data):
+    os.makedirs(os.path.dirname(fn), exist_ok = True)
+    with open(fn, 'wb') as f:
+        f.write(data)
+
+
+def test_Peer_Directory():
+    path = os.path.abspath('test_Peer_Directory')
+    root_a = os.path.join(path, 'a')
+    root_b = os.path.join(path, 'b')
+    server = serve(root = root_a, port = 18082,
+                   allowed = lambda x: not x.endswith('private'))
+    try:
+        peer_a = Peer_Directory(redis_url = REDIS_URL, root = root_a,
+                                address = 'localhost:18082')
+        peer_b = Peer_Directory(redis_url = REDIS_URL, root = root_b,
+                                address = 'localhost:18083')
+
+        src = os.path.join(root_a, 'x', 'file')
+        dst = os.path.join(root_b, 'x', 'file')
+        _write(src, b'12345'*1000)
+        os.makedirs(os.path.dirname(dst), exist_ok = True)
+
+        assert not peer_b.fetch(dst)
+        peer_a.add(src)
+        assert 'localhost:18082' in peer_b.peers(dst)
+        assert 'localhost:18082' not in peer_a.peers(dst)
+        assert peer_b.fetch(dst)
+        with open(dst, 'rb') as f:
+            assert f.read() == b'12345'*1000
+
+        # only allowed files under root are served
+        _write(os.path.join(root_a, 'x', 'private'), b'private')
+        _write(os.path.join(path, 'outside'), b'outside')
+        for x in ('x/private', '../outside', 'x/'):
+            res = requests.get('http://localhost:18082/' + x)
+            assert 404 == res.status_code
+
+        # corrupted file is rejected and the peer forgotten
+        os.unlink(dst)
+        _write(src, b'54321'*1000)
+        assert not peer_b.fetch(dst)
+        assert not os.path.exists(dst)
+        assert not peer_b.peers(dst)
+    finally:
+        server.shutdown()
+        server.server_close()
+        peer_b.remove(dst, 'localhost:18082')
+        shutil.rmtree(path)
+
+
+def test_Peer_Directory_hash(monkeypatch):
+    path = os.path.abspath('test_Peer_Directory_hash')
+    calls = []
+    hash_file = peers._hash_file
+    monkeypatch.setattr(peers, '_hash_file',
+                        lambda fn: calls.append(fn) or hash_file(fn))
+    fn = os.path.join(path, 'file')
+    peer = Peer_Directory(redis_url = REDIS_URL, root = path,
+                          address = 'localhost:18084')
+    try:
+        _write(fn, b'12345')
+        peer.add(fn)
+        peer.add(fn)
+        assert calls == [fn]
+
+        # changed files are hashed again
+        _write(fn, b'123456')
+        peer.add(fn)
+        assert calls == [fn, fn]
+    finally:
+        peer.remove(fn)
+        shutil.rmtree(path)
+
+
+def test_Peer_Directory_announce():
+    path = os.path.abspath('test_Peer_Directory_announce')
+    fn = os.path.join(path, 'file')
+    peer = Peer_Directory(redis_url = REDIS_URL, root = path,
+                          address = 'localhost:18085',
+                          announce = False)
+    try:
+        _write(fn, b'12345')
+        peer.add(fn)
+        assert not Peer_Directory(redis_url = REDIS_URL, root = path,
+                                  address = 'localhost:18086')\
+                                  .peers(fn)
+    finally:
+        shutil.rmtree(path)
@@ -1,10 +1,21 @@
 import os
 import re
+import time
 import logging
 import filelock
 
+from concurrent.futures \
+    import ThreadPoolExecutor
+
 from pvgrip.globals \
-    import ALLOWED_REMOTE, RESULTS_PATH
+    import ALLOWED_REMOTE, RESULTS_PATH, \
+    STORAGE_CODEC, STORAGE_CODEC_SHUFFLE, WRITE_BEHIND, \
+    CACHE_AFFINITY, PEER_FETCH
+
+from pvgrip.storage.codec \
+    import compress_file, decompress_file
+from pvgrip.utils.files \
+    import get_tempfile, remove_file
 
 REGEX = re.compile(r'^(.*)://(.*)')
 
@@ -54,6 +65,18 @@ def searchif_instorage(fn):
     return False
 
 
+def searchif_instorage_many(fns):
+    """Bulk version of searchif_instorage
+
+    :fns: list of filepaths
+
+    :return: dictionary fn -> remotetype or None if fn is in no
+    storage
+    """
+    return RemoteStoragePath.in_storage_many\
+        (fns, ignoreiflocal = True)
+
+
 def search_determineremote(fn, ignore_remote):
     for remotetype in ALLOWED_REMOTE:
         if remotetype == ignore_remote:
@@ -67,6 +90,39 @@ def search_determineremote(fn, ignore_remote):
     return None
 
 
+def _get_storage(remotetype):
+    if remotetype == 'ipfs_path':
+        from pvgrip.globals \
+            import get_IPFS_STORAGE
+        return get_IPFS_STORAGE()
+    elif re.match(r'localmount_.*',remotetype):
+        from pvgrip.globals \
+            import get_LOCAL_STORAGE
+        return get_LOCAL_STORAGE(remotetype)
+    else:
+        raise RuntimeError\
+            ("unknown remotetype = {}".format(remotetype))
+
+
+def _contains_many(storage, paths, nthreads):
+    """Check which paths are in storage
+
+    Uses 'contains_many' of a storage if available, otherwise
+    queries storage concurrently path by path.
+
+    :return: list of booleans
+    """
+    if hasattr(storage, 'contains_many'):
+        return storage.contains_many(paths)
+
+    if len(paths) < 2:
+        return [x in storage for x in paths]
+
+    with ThreadPoolExecutor\
+         (max_workers = min(nthreads, len(paths))) as pool:
+        return list(pool.map(lambda x: x in storage, paths))
+
+
 class RemoteStoragePath:
 
     def __init__(self, path, remotetype = 'cassandra_path'):
@@ -110,17 +166,7 @@ class RemoteStoragePath:
 
     @property
     def _storage(self):
-        if self.remotetype == 'ipfs_path':
-            from pvgrip.globals \
-                import get_IPFS_STORAGE
-            return get_IPFS_STORAGE()
-        elif re.match(r'localmount_.*',self.remotetype):
-            from pvgrip.globals \
-                import get_LOCAL_STORAGE
-            return get_LOCAL_STORAGE(self.remotetype)
-        else:
-            raise RuntimeError\
-                ("unknown remotetype = {}".format(self.remotetype))
+        return _get_storage(self.remotetype)
 
 
     @property
@@ -129,9 +175,63 @@ class RemoteStoragePath:
         return get_RESULTS_CACHE()
 
 
+    @property
+    def _metadata(self):
+        from pvgrip.globals import get_METADATA_CACHE
+        return get_METADATA_CACHE()
+
+
+    def _add_local(self, cost = None):
+        """Add file to the local cache and advertise it
+
+        """
+        self._localcache.add(self.path, cost = cost)
+        if not CACHE_AFFINITY and not PEER_FETCH:
+            return
+
+        from pvgrip.globals \
+            import get_CACHE_AFFINITY, get_PEER_DIRECTORY
+        try:
+            if CACHE_AFFINITY:
+                get_CACHE_AFFINITY().advertise([self.path])
+            if PEER_FETCH:
+                get_PEER_DIRECTORY().add(self.path)
+        except Exception as e:
+            logging.warning("""Failed to advertise file: {}
+            error: {}
+            """.format(self.path, str(e)))
+
+
+    @property
+    def _write_behind(self):
+        from pvgrip.globals import get_WRITE_BEHIND
+        return get_WRITE_BEHIND()
+
+
+    def _pending(self):
+        """Check if the file is being uploaded in background
+
+        Pending files are remembered as being in storage.
+
+        :return: True if the upload is pending
+        """
+        if not WRITE_BEHIND:
+            return False
+
+        res = self._write_behind.pending(self)
+        if res is None:
+            return False
+
+        self._metadata.set(self.remotetype, self.path, True, res)
+        return True
+
+
     def in_storage(self, ignoreiflocal = False):
         """Check if self in storage
 
+        Results are remembered in the worker metadata cache. Files
+        that are being uploaded in background count as stored.
+
         :ignoreiflocal: if True then remote storage is not even
         checked
         """
@@ -139,7 +239,79 @@ class RemoteStoragePath:
             if self.path in self._localcache:
                 return True
 
-        return self.path in self._storage
+        res = self._metadata.exists(self.remotetype, self.path)
+        if res is not None:
+            return res
+
+        res = self.path in self._storage
+        if not res and self._pending():
+            return True
+
+        self._metadata.set(self.remotetype, self.path, res)
+        return res
+
+
+    @staticmethod
+    def in_storage_many(paths, ignoreiflocal = False,
+                        remotetypes = None, nthreads = 16):
+        """Check many paths in all remote storages
+
+        Remote storages are queried in order, each with only paths
+        not found so far. Paths within a storage are checked
+        concurrently.
+
+        :paths: list of paths (without remotetype prefix)
+
+        :ignoreiflocal: if True then paths in the local cache are
+        not checked remotely
+
+        :remotetypes: list of remotetypes to check. By default,
+        ALLOWED_REMOTE
+
+        :nthreads: maximum number of concurrent queries
+
+        :return: dictionary path -> first remotetype containing the
+        path or None. Paths in local cache are attributed to the first
+        remotetype
+        """
+        if remotetypes is None:
+            remotetypes = ALLOWED_REMOTE
+
+        res = {x: None for x in paths}
+        left = list(res)
+        if not left or not remotetypes:
+            return res
+
+        from pvgrip.globals \
+            import get_RESULTS_CACHE, get_METADATA_CACHE
+        metadata = get_METADATA_CACHE()
+
+        if ignoreiflocal:
+            cache = get_RESULTS_CACHE()
+            for x in left:
+                if x in cache:
+                    res[x] = remotetypes[0]
+            left = [x for x in left if res[x] is None]
+
+        for remotetype in remotetypes:
+            if not left:
+                break
+
+            known = {x: metadata.exists(remotetype, x)
+                     for x in left}
+            query = [x for x in left if known[x] is None]
+            found = _contains_many(_get_storage(remotetype),
+                                   query, nthreads)
+            for x, isin in zip(query, found):
+                metadata.set(remotetype, x, isin)
+                known[x] = isin
+
+            for x in left:
+                if known[x]:
+                    res[x] = remotetype
+            left = [x for x in left if res[x] is None]
+
+        return res
 
 
     def get_cid(self):
@@ -152,11 +324,34 @@ class RemoteStoragePath:
 
 
     def get_timestamp(self):
-        return self._storage.get_timestamp(self.path)
+        res = self._metadata.timestamp(self.remotetype, self.path)
+        if res is not None:
+            return res
+
+        res = self._storage.get_timestamp(self.path)
+        if res is None and self._pending():
+            return self._metadata.timestamp(self.remotetype, self.path)
+
+        self._metadata.set(self.remotetype, self.path,
+                           res is not None, res)
+        return res
 
 
     def update_timestamp(self):
-        return self._storage.update_timestamp(self.path)
+        """Update timestamp of the file
+
+        Timestamps that are younger than the positive metadata ttl
+        are not updated.
+        """
+        now = time.time()
+        res = self._metadata.timestamp(self.remotetype, self.path)
+        if res is not None \
+           and now - res < self._metadata.ttl_positive:
+            return None
+
+        res = self._storage.update_timestamp(self.path)
+        self._metadata.set(self.remotetype, self.path, True, now)
+        return res
 
 
     def get_locally(self):
@@ -167,8 +362,27 @@ class RemoteStoragePath:
             if self.path in self._localcache:
                 return self.path
 
+            if WRITE_BEHIND and self._write_behind.is_local(self):
+                return self.path
+
+            if PEER_FETCH:
+                from pvgrip.globals import get_PEER_DIRECTORY
+                start = time.time()
+                if get_PEER_DIRECTORY().fetch(self.path):
+                    logging.debug("get_locally: fetched from a peer")
+                    self._add_local(cost = time.time() - start)
+                    self._localcache.add(self._lock_fn)
+                    return self.path
+
             logging.debug("get_locally: check local")
-            if self.path not in self._storage:
+            instorage = self.path in self._storage
+            if not instorage and self._pending():
+                logging.debug("get_locally: wait for upload")
+                self._write_behind.wait(self)
+                instorage = self.path in self._storage
+
+            if not instorage:
+                self._metadata.set(self.remotetype, self.path, False)
                 raise NotInStorage\
                     ("{path} not a {remotetype}!"\
                      .format(path=self.path,
@@ -177,7 +391,10 @@ class RemoteStoragePath:
             logging.debug("get_locally: check remote")
             try:
                 logging.debug("get_locally: start downloading")
+                start = time.time()
                 self._storage.download(self.path, self.path)
+                decompress_file(self.path)
+                cost = time.time() - start
                 logging.debug("get_locally: finish downloading")
             except Exception as e:
                 logging.error("""Failed to download file: {}
@@ -187,22 +404,59 @@ class RemoteStoragePath:
                 raise e
 
             logging.debug("get_locally: add to localcache")
-            self._localcache.add(self.path)
+            self._add_local(cost = cost)
             self._localcache.add(self._lock_fn)
             return self.path
 
 
-    def upload(self):
+    def upload(self, cost = None, background = False):
+        """Upload file to the remote storage
+
+        :cost: optional cost (e.g. computation time in seconds) to
+        reproduce the file. Used by the local cache eviction policy
+
+        :background: if True and write-behind is enabled, return
+        immediately and upload the file in a background thread
+
+        If the storage codec is set, a compressed copy is uploaded,
+        while the local file stays uncompressed.
+        """
+        if background and WRITE_BEHIND:
+            def _upload():
+                try:
+                    self.upload(cost = cost)
+                except Exception:
+                    # the file was remembered as stored while pending
+                    self._metadata.invalidate(self.remotetype, self.path)
+                    # keep the file evictable
+                    self._add_local(cost = cost)
+                    raise
+            self._write_behind.submit(self, _upload)
+            return
+
+        tmp = None
+        ifn = self.path
+        if 'none' != STORAGE_CODEC:
+            tmp = get_tempfile()
+            if compress_file(self.path, tmp,
+                             codec = STORAGE_CODEC,
+                             shuffle = STORAGE_CODEC_SHUFFLE):
+                ifn = tmp
+
         try:
-            self._storage.upload(self.path, self.path)
+            self._storage.upload(ifn, self.path)
         except Exception as e:
             logging.error("""Failed to upload file: {}
             error: {}
             remotetype: {}
             """.format(self.path,str(e),self.remotetype))
+            self._metadata.invalidate(self.remotetype, self.path)
             raise e
+        finally:
+            remove_file(tmp)
 
-        self._localcache.add(self.path)
+        self._metadata.set(self.remotetype, self.path, True)
+        self._add_local(cost = cost)
 
 
     def link(self, src, timestamp = None):
@@ -216,7 +470,19 @@ class RemoteStoragePath:
             remotetype: {}
             """.format(src, self.path,
                        str(e),self.remotetype))
+            self._metadata.invalidate(self.remotetype, self.path)
             raise e
 
+        self._metadata.set(self.remotetype, self.path, True)
         if os.path.exists(self.path):
-            self._localcache.add(self.path)
+            self._add_local()
+
+
+    def delete(self):
+        """Delete file from the remote storage
+
+        """
+        try:
+            self._storage.delete(self.path)
+        finally:
+            self._metadata.set(self.remotetype, self.path, False)
@@ -197,7 +197,8 @@ class Spatial_Data:
         self._upload_raster_data(path, las_dirs.keys())
 
 
-    def subset(self, data_re, box=None, rasters = None):
+    def subset(self, data_re, box=None, rasters = None,
+               allow_empty = False):
         """Generate a subset index containing required data
 
         :data_re: regular expression to match filenames
@@ -210,6 +211,9 @@ class Spatial_Data:
         not None, 'box' argument is ignored, and a polygon is formed
         using the provided list of boxes in the 'rasters' list
 
+        :allow_empty: if False, raise an error when no data is
+        available
+
         :return: Polygon_File_Index
         """
         if rasters:
@@ -222,7 +226,7 @@ class Spatial_Data:
             (how = lambda x:
              _subset_filter_how(x, data_re))
 
-        if 0 == index.size():
+        if 0 == index.size() and not allow_empty:
             raise RuntimeError\
                 ("no data available for the selected location")
 
@@ -1,5 +1,9 @@
 import os
+import re
+import time
+import uuid
 import hashlib
+import filelock
 
 from pvgrip.utils.cache_fn_results \
     import cache_fn_results
@@ -11,7 +15,12 @@ from pvgrip.globals \
     import RESULTS_PATH
 
 
-def _hash_file(fn, chunk_size = 4096):
+_CHUNK_SIZE = 1024**2
+_PARTS_PATH = os.path.join(RESULTS_PATH, "upload_parts")
+_PARTS_EXPIRE = 24*60*60
+
+
+def _hash_file(fn, chunk_size = _CHUNK_SIZE):
     h = hashlib.md5()
 
     with open(fn, 'rb') as f:
@@ -21,21 +30,286 @@ def _hash_file(fn, chunk_size = 4096):
     return h.hexdigest()
 
 
+def _copy_hash(chunks, dst, h = None):
+    """Write chunks to an open file and hash in one pass
+
+    :chunks: iterable of bytes
+
+    :dst: writable file object
+
+    :h: hashlib object to update
+
+    :return: number of copied bytes
+    """
+    n = 0
+    for chunk in chunks:
+        dst.write(chunk)
+        if h is not None:
+            h.update(chunk)
+        n += len(chunk)
+
+    return n
+
+
+def _body_chunks(environ, chunk_size = _CHUNK_SIZE):
+    """Read a request body in chunks
+
+    The body is read from the WSGI input, so that it is never held
+    in memory or spooled to a temporary file as a whole.
+
+    :environ: WSGI environment
+    """
+    stream = environ['wsgi.input']
+    left = environ.get('CONTENT_LENGTH')
+    left = int(left) if left else None
+    while left is None or left > 0:
+        chunk = stream.read(chunk_size if left is None
+                            else min(chunk_size, left))
+        if not chunk:
+            break
+        if left is not None:
+            left -= len(chunk)
+        yield chunk
+
+    if left:
+        raise RuntimeError("request body is incomplete, "
+                           "{} bytes are missing".format(left))
+
+
+def _split_at(chunks, buf, sep):
+    """Yield data up to a separator
+
+    :chunks: iterator of bytes
+
+    :buf: data read before
+
+    :return: data read after the separator
+    """
+    while True:
+        i = buf.find(sep)
+        if i >= 0:
+            if i:
+                yield buf[:i]
+            return buf[i + len(sep):]
+
+        # the separator may start at the end of the buffer
+        n = len(buf) - len(sep) + 1
+        if n > 0:
+            yield buf[:n]
+            buf = buf[n:]
+
+        chunk = next(chunks, b'')
+        if not chunk:
+            raise RuntimeError("malformed multipart body")
+        buf += chunk
+
+
+def _run(gen, out = None):
+    """Run a generator, collecting its chunks to a list
+
+    :return: value returned by the generator
+    """
+    while True:
+        try:
+            chunk = next(gen)
+        except StopIteration as e:
+            return e.value
+        if out is not None:
+            out.append(chunk)
+
+
+def _multipart_field(chunks, boundary, name):
+    """Yield content of a field of a multipart/form-data body
+
+    :chunks: iterable of bytes of the body
+
+    :boundary: boundary of the body parts
+
+    :name: name of the field
+    """
+    chunks = iter(chunks)
+    delimiter = b'\r\n--' + boundary
+    # the first delimiter is not preceded by a line break
+    buf = _run(_split_at(chunks, b'\r\n', delimiter))
+    while True:
+        while len(buf) < 2:
+            chunk = next(chunks, b'')
+            if not chunk:
+                raise RuntimeError("malformed multipart body")
+            buf += chunk
+        if buf.startswith(b'--'):
+            break
+
+        headers = []
+        buf = _run(_split_at(chunks, buf, b'\r\n\r\n'), headers)
+        field = re.search(r'name="([^"]*)"',
+                          b''.join(headers).decode('latin-1'))
+        if field is not None and name == field.group(1):
+            yield from _split_at(chunks, buf, delimiter)
+            return
+        buf = _run(_split_at(chunks, buf, delimiter))
+
+    raise RuntimeError("'{}' is missing in the request"\
+                       .format(name))
+
+
+def _request_file(environ, name = 'data', chunk_size = _CHUNK_SIZE):
+    """Read a file uploaded in a request body in chunks
+
+    :environ: WSGI environment. The body is either the file, or
+    multipart/form-data with the file in the 'name' field (as sent
+    by 'curl -F data=@file')
+
+    :return: iterable of bytes
+    """
+    chunks = _body_chunks(environ, chunk_size = chunk_size)
+    ctype = environ.get('CONTENT_TYPE', '')
+    if not ctype.startswith('multipart/form-data'):
+        return chunks
+
+    boundary = re.search(r'boundary="?([^";]+)"?', ctype)
+    if boundary is None:
+        raise RuntimeError("multipart boundary is missing")
+    return _multipart_field(chunks,
+                            boundary = boundary.group(1)\
+                            .encode('latin-1'),
+                            name = name)
+
+
 @cache_fn_results(keys = ['name'], link = True, ofn_arg = 'name')
 def _upload_file(fn, name):
     return fn
 
 
+def _store(fn, md5):
+    """Store file under its content hash
+
+    If the hash is already in storage, the existing file is returned
+    and nothing is written.
+    """
+    name = os.path.join(RESULTS_PATH, "upload", md5)
+    return _upload_file(fn = fn, name = name)
+
+
 def upload(request_data):
+    """Upload a file to the storage
+
+    :request_data: either a bottle request, whose body is written to
+    the file and hashed while it is received (see _request_file), or
+    an object with the .save(ofn, overwrite) method
+
+    """
     ofn = get_tempfile()
 
-    request_data.save(ofn, overwrite = True)
-    name = os.path.join\
-        (RESULTS_PATH, "upload", _hash_file(ofn))
-    name = _upload_file(fn = ofn, name = name)
+    try:
+        if hasattr(request_data, 'environ'):
+            h = hashlib.md5()
+            with open(ofn, 'wb') as f:
+                _copy_hash(_request_file(request_data.environ), f, h)
+            md5 = h.hexdigest()
+        else:
+            request_data.save(ofn, overwrite = True)
+            md5 = _hash_file(ofn)
+
+        return {'storage_fn': _store(ofn, md5)}
+    finally:
+        remove_file(ofn)
+
+
+def _part_fn(upload_id):
+    if not re.match(r'^[0-9a-f]{32}$', upload_id):
+        raise RuntimeError("invalid upload_id = {}"\
+                           .format(upload_id))
+
+    return os.path.join(_PARTS_PATH, upload_id)
+
+
+def _part_lock(upload_id):
+    return filelock.FileLock(_part_fn(upload_id) + '.lock')
+
+
+def _cleanup_parts():
+    now = time.time()
+    for fn in os.listdir(_PARTS_PATH):
+        fn = os.path.join(_PARTS_PATH, fn)
+        try:
+            if now - os.stat(fn).st_mtime > _PARTS_EXPIRE:
+                os.unlink(fn)
+        except FileNotFoundError:
+            pass
+
+
+def _part_status(upload_id):
+    fn = _part_fn(upload_id)
+    if not os.path.exists(fn):
+        raise RuntimeError("unknown upload_id = {}"\
+                           .format(upload_id))
+
+    return {'upload_id': upload_id,
+            'offset': os.path.getsize(fn)}
 
-    remove_file(ofn)
-    return {'storage_fn': name}
+
+def upload_start(upload_id = 'NA'):
+    """Start or resume a chunked upload
+
+    :upload_id: if 'NA' a new upload is started, otherwise the
+    status of an existing upload is returned
+
+    :return: dictionary with upload_id and offset, the number of
+    already received bytes
+    """
+    os.makedirs(_PARTS_PATH, exist_ok = True)
+
+    if 'NA' != upload_id:
+        return _part_status(upload_id)
+
+    _cleanup_parts()
+    upload_id = uuid.uuid4().hex
+    open(_part_fn(upload_id), 'wb').close()
+    return _part_status(upload_id)
+
+
+def upload_chunk(upload_id, offset, data):
+    """Append a chunk to an upload
+
+    :upload_id: id returned by upload_start
+
+    :offset: position of the chunk. Must be equal to the number of
+    already received bytes
+
+    :data: WSGI environment of the request with the chunk as body
+
+    """
+    fn = _part_fn(upload_id)
+    with _part_lock(upload_id):
+        status = _part_status(upload_id)
+        if int(offset) != status['offset']:
+            raise RuntimeError\
+                ("offset = {} does not match received {} bytes"\
+                 .format(offset, status['offset']))
+
+        with open(fn, 'ab') as f:
+            _copy_hash(_body_chunks(data), f)
+            f.flush()
+            os.fsync(f.fileno())
+
+        return _part_status(upload_id)
+
+
+def upload_finish(upload_id):
+    """Finish a chunked upload and store the file
+
+    :upload_id: id returned by upload_start
+
+    """
+    fn = _part_fn(upload_id)
+    with _part_lock(upload_id):
+        _part_status(upload_id)
+        res = {'storage_fn': _store(fn, _hash_file(fn))}
+        # parts are kept if storing fails, so finish can be retried
+        remove_file(fn)
+        remove_file(fn + '.lock')
+        return res
 
 
 class Saveas_Requestdata:
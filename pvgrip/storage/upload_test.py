@@ -0,0 +1,55 @@
+import io
+import os
+import pytest
+
+from pvgrip.storage.upload \
+    import _request_file
+
+
+_MULTIPART = 'multipart/form-data; boundary=xyz'
+
+
+def _environ(body, ctype = 'application/octet-stream'):
+    return {'wsgi.input': io.BytesIO(body),
+            'CONTENT_LENGTH': str(len(body)),
+            'CONTENT_TYPE': ctype}
+
+
+def _multipart(data):
+    return b'preamble\r\n--xyz\r\n' \
+        b'Content-Disposition: form-data; name="other"\r\n\r\n' \
+        b'other\r\n--xyz\r\n' \
+        b'Content-Disposition: form-data; name="data"; ' \
+        b'filename="data.tsv"\r\n' \
+        b'Content-Type: application/octet-stream\r\n\r\n' \
+        + data + b'\r\n--xyz--\r\n'
+
+
+@pytest.mark.parametrize('chunk_size', [1, 3, 7, 1024])
+def test_request_file(chunk_size):
+    # data looks like a part of the delimiter
+    data = os.urandom(1000) + b'\r\n--xy' + os.urandom(100)
+
+    res = _request_file(_environ(data), chunk_size = chunk_size)
+    assert data == b''.join(res)
+
+    res = _request_file(_environ(_multipart(data), _MULTIPART),
+                        chunk_size = chunk_size)
+    assert data == b''.join(res)
+
+
+def test_request_file_errors():
+    environ = _environ(b'12345')
+    environ['CONTENT_LENGTH'] = '10'
+    with pytest.raises(RuntimeError):
+        b''.join(_request_file(environ))
+
+    body = b'--xyz\r\n' \
+        b'Content-Disposition: form-data; name="other"\r\n\r\n' \
+        b'other\r\n--xyz--\r\n'
+    with pytest.raises(RuntimeError):
+        b''.join(_request_file(_environ(body, _MULTIPART)))
+
+    with pytest.raises(RuntimeError):
+        b''.join(_request_file(_environ(_multipart(b'x')[:-20],
+                                        _MULTIPART)))
@@ -0,0 +1,155 @@
+import os
+import time
+import socket
+import logging
+import threading
+
+from concurrent.futures \
+    import ThreadPoolExecutor
+
+from pvgrip.utils.redis.client \
+    import redis_client
+
+
+_KEY = 'pvgrip_upload_pending_{}'
+
+
+class Write_Behind:
+
+
+    def __init__(self, redis_url, nthreads = 2, ttl = 60,
+                 poll = 0.5):
+        """Upload files to a remote storage in background
+
+        While a file is being uploaded, a pending marker is kept in
+        redis. Readers on other nodes can wait for it to disappear.
+
+        :redis_url: how to connect to redis
+
+        :nthreads: number of concurrent uploads
+
+        :ttl: seconds after which a pending marker expires. The
+        marker is refreshed while the upload runs, so that it expires
+        shortly after the uploading process dies
+
+        :poll: seconds between checks of the pending marker
+
+        """
+        self._redis = redis_client(redis_url)
+        self._pool = ThreadPoolExecutor(max_workers = nthreads)
+        self._ttl = ttl
+        self._poll = poll
+        self._host = socket.gethostname()
+        self._local = set()
+        self._lock = threading.Lock()
+
+
+    def _key(self, rpath):
+        return _KEY.format(str(rpath))
+
+
+    def _keepalive(self, rpath, stop):
+        while not stop.wait(self._ttl / 3):
+            try:
+                self._redis.expire(self._key(rpath), self._ttl)
+            except Exception as e:
+                logging.warning("""Failed to refresh pending marker
+                path: {}
+                error: {}
+                """.format(str(rpath), str(e)))
+
+
+    def _upload(self, rpath, upload):
+        stop = threading.Event()
+        keepalive = threading.Thread(target = self._keepalive,
+                                     args = (rpath, stop),
+                                     daemon = True)
+        keepalive.start()
+        try:
+            upload()
+        except Exception as e:
+            logging.error("""Write-behind upload failed!
+            path: {}
+            error: {}
+            """.format(str(rpath), str(e)))
+        finally:
+            stop.set()
+            keepalive.join()
+            self._redis.delete(self._key(rpath))
+            with self._lock:
+                self._local.discard(rpath.path)
+
+
+    def submit(self, rpath, upload):
+        """Upload a file in background
+
+        :rpath: RemoteStoragePath of the file
+
+        :upload: function without arguments that uploads the file
+        """
+        self._redis.set(self._key(rpath),
+                        '{}|{}'.format(self._host, time.time()),
+                        ex = self._ttl)
+        with self._lock:
+            self._local.add(rpath.path)
+        return self._pool.submit(self._upload, rpath, upload)
+
+
+    def _marker(self, rpath):
+        res = self._redis.get(self._key(rpath))
+        if res is None:
+            return None
+
+        host, start = res.decode().split('|')
+        return host, float(start)
+
+
+    def is_local(self, rpath):
+        """Check if a file is being uploaded from this host
+
+        Such files are available locally.
+        """
+        with self._lock:
+            if rpath.path in self._local:
+                return True
+
+        res = self._marker(rpath)
+        return res is not None and res[0] == self._host \
+            and os.path.exists(rpath.path)
+
+
+    def pending(self, rpath):
+        """Get time when the upload of a file has started
+
+        :return: unixtime or None if the file is not being uploaded
+        """
+        res = self._marker(rpath)
+        if res is None:
+            return None
+
+        return res[1]
+
+
+    def wait(self, rpath, timeout = None):
+        """Wait until the file is not being uploaded
+
+        :timeout: maximum number of seconds to wait. By default
+        wait while the upload is pending: the marker of a dead upload
+        expires after ttl
+
+        :return: True if the upload is done
+        """
+        start = time.time()
+        while self.pending(rpath) is not None:
+            if timeout is not None and time.time() - start > timeout:
+                return False
+            time.sleep(self._poll)
+
+        return True
+
+
+    def drain(self):
+        """Wait for all uploads to finish
+
+        """
+        self._pool.shutdown(wait = True)
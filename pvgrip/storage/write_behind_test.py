@@ -0,0 +1,68 @@
+import time
+import threading
+
+from pvgrip.globals \
+    import REDIS_URL
+
+from pvgrip.storage.write_behind \
+    import Write_Behind
+
+
+class _Path:
+
+    def __init__(self, path):
+        self.path = path
+
+    def __str__(self):
+        return 'test://' + self.path
+
+
+def test_Write_Behind():
+    wb = Write_Behind(redis_url = REDIS_URL, nthreads = 2,
+                      ttl = 10, poll = 0.01)
+    rpath = _Path('test_write_behind/file')
+    release = threading.Event()
+    done = []
+
+    def upload():
+        release.wait()
+        done.append(rpath.path)
+
+    wb.submit(rpath, upload)
+    assert wb.pending(rpath) is not None
+    assert wb.is_local(rpath)
+    assert not wb.wait(rpath, timeout = 0.05)
+
+    release.set()
+    assert wb.wait(rpath)
+    assert done == [rpath.path]
+    assert wb.pending(rpath) is None
+    assert not wb.is_local(rpath)
+
+
+def test_Write_Behind_fail():
+    wb = Write_Behind(redis_url = REDIS_URL, poll = 0.01)
+    rpath = _Path('test_write_behind/fail')
+
+    def upload():
+        time.sleep(0.05)
+        raise RuntimeError("upload failed")
+
+    wb.submit(rpath, upload)
+    wb.drain()
+    assert wb.pending(rpath) is None
+
+
+def test_Write_Behind_keepalive():
+    wb = Write_Behind(redis_url = REDIS_URL, ttl = 1, poll = 0.01)
+    rpath = _Path('test_write_behind/keepalive')
+    release = threading.Event()
+
+    wb.submit(rpath, release.wait)
+    try:
+        # the marker outlives its ttl while the upload runs
+        time.sleep(2)
+        assert wb.pending(rpath) is not None
+    finally:
+        release.set()
+    assert wb.wait(rpath, timeout = 5)
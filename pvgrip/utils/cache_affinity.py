@@ -0,0 +1,248 @@
+import time
+import socket
+import logging
+import threading
+
+from pvgrip.utils.redis.bloom \
+    import Redis_Bloom
+from pvgrip.utils.redis.client \
+    import redis_client
+
+
+_QUEUE = 'pvgrip_affinity_{}'
+_BLOOM = 'pvgrip_affinity_bloom_{}'
+_HEARTBEAT = 'pvgrip_affinity_heartbeat_{}'
+_REBUILD = 'pvgrip_affinity_rebuild_{}'
+_WORKERS = 'pvgrip_affinity_workers'
+
+
+class Cache_Affinity:
+
+
+    def __init__(self, redis_url, nbits = 4*1024**2,
+                 timeout = 60, backlog = 10, rebuild = 600,
+                 default_queue = 'celery'):
+        """Advertise content of the worker cache and route tasks to it
+
+        Each worker host keeps a Bloom filter of the locally cached
+        files in redis and consumes from its own queue. Tasks whose
+        main input is cached on a live host are routed to that
+        queue.
+
+        :redis_url: how to connect to redis
+
+        :nbits: size of the Bloom filter in bits
+
+        :timeout: seconds without heartbeat after which a host is
+        considered dead
+
+        :backlog: maximum number of waiting tasks in a host queue
+
+        :rebuild: seconds between rebuilds of the Bloom filter. A
+        rebuild forgets evicted files
+
+        :default_queue: shared queue, where tasks of dead hosts are
+        moved
+
+        """
+        self._redis_url = redis_url
+        self._redis = redis_client(redis_url)
+        self._nbits = nbits
+        self._timeout = timeout
+        self._backlog = backlog
+        self._rebuild = rebuild
+        self._default_queue = default_queue
+        self._host = socket.gethostname()
+        self._last_heartbeat = 0
+        self._last_maintain = 0
+
+
+    @property
+    def queue(self):
+        return _QUEUE.format(self._host)
+
+
+    def _bloom(self, host):
+        return Redis_Bloom(name = _BLOOM.format(host),
+                           redis_url = self._redis_url,
+                           nbits = self._nbits)
+
+
+    def heartbeat(self, force = False):
+        """Announce that this host is alive
+
+        :force: if False, heartbeat is sent at most every
+        timeout/3 seconds
+        """
+        now = time.time()
+        if not force and now - self._last_heartbeat < self._timeout/3:
+            return
+
+        pipe = self._redis.pipeline(transaction = False)
+        pipe.set(_HEARTBEAT.format(self._host), now,
+                 ex = self._timeout)
+        pipe.sadd(_WORKERS, self._host)
+        _, added = pipe.execute()
+        if added:
+            # the host was considered dead, rebuild its Bloom filter
+            # on the next maintenance
+            self._redis.delete(_REBUILD.format(self._host))
+        self._last_heartbeat = now
+
+
+    def _keepalive(self):
+        while True:
+            try:
+                self.heartbeat(force = True)
+            except Exception as e:
+                logging.warning("""cache affinity heartbeat failed
+                error = {}
+                """.format(str(e)))
+            time.sleep(self._timeout/3)
+
+
+    def start_heartbeat(self):
+        """Send heartbeats in a daemon thread
+
+        Idle hosts are alive as well, their cache is still warm.
+        """
+        threading.Thread(target = self._keepalive,
+                         daemon = True).start()
+
+
+    def advertise(self, paths):
+        """Announce that paths are cached on this host
+
+        :paths: list of local paths
+        """
+        self._bloom(self._host).add(paths)
+        self.heartbeat()
+
+
+    def maintain(self, cache):
+        """Rebuild the Bloom filter and rescue tasks of dead hosts
+
+        Only one process per host does the work every 'rebuild'
+        seconds.
+
+        :cache: Files_LRUCache of this host
+        """
+        now = time.time()
+        if now - self._last_maintain < self._timeout/3:
+            return
+        self._last_maintain = now
+
+        self.heartbeat()
+        if not self._redis.set(_REBUILD.format(self._host), 1,
+                               nx = True, ex = self._rebuild):
+            return
+
+        self._bloom(self._host).replace(cache.paths())
+        for host in self.hosts(alive = False):
+            self.rescue(host)
+
+
+    def hosts(self, alive = True):
+        """List hosts
+
+        :alive: if True, list hosts with heartbeat, otherwise hosts
+        without it
+        """
+        hosts = sorted(x.decode() for x in self._redis.smembers(_WORKERS))
+        pipe = self._redis.pipeline(transaction = False)
+        for host in hosts:
+            pipe.exists(_HEARTBEAT.format(host))
+        return [host for host, isalive in zip(hosts, pipe.execute())
+                if bool(isalive) == alive]
+
+
+    def rescue(self, host):
+        """Move waiting tasks of a dead host to the shared queue
+
+        Hosts with a heartbeat are left as they are.
+        """
+        if self._redis.exists(_HEARTBEAT.format(host)):
+            return
+
+        queue = _QUEUE.format(host)
+        n = 0
+        while self._redis.rpoplpush(queue, self._default_queue):
+            n += 1
+
+        if n:
+            logging.warning("""moved tasks of a dead host
+            host = {}
+            ntasks = {}
+            """.format(host, n))
+        self._redis.srem(_WORKERS, host)
+        self._bloom(host).delete()
+
+
+    def route(self, path):
+        """Find a queue of a live host that has path cached
+
+        The current host is preferred.
+
+        :path: local path of a file
+
+        :return: queue name or None
+        """
+        hosts = self.hosts()
+        if self._host in hosts:
+            hosts.remove(self._host)
+            hosts.insert(0, self._host)
+
+        for host in hosts:
+            if path not in self._bloom(host):
+                continue
+
+            if self._redis.llen(_QUEUE.format(host)) >= self._backlog:
+                continue
+
+            return _QUEUE.format(host)
+
+        return None
+
+
+def _main_input(args, kwargs):
+    from pvgrip.storage.remotestorage_path \
+        import RemoteStoragePath, is_remote_path
+
+    for x in list(args) + list(kwargs.values()):
+        if isinstance(x, (list, tuple)) and len(x):
+            x = x[0]
+        if is_remote_path(x):
+            return RemoteStoragePath(x).path
+
+    return None
+
+
+def route_task(name, args, kwargs, options, task = None, **kw):
+    """Celery router sending tasks to hosts caching their main input
+
+    The main input is the first remote path among the arguments. When
+    no live host has it, the task goes to the default queue.
+    """
+    from pvgrip.globals \
+        import CACHE_AFFINITY, get_CACHE_AFFINITY
+
+    if not CACHE_AFFINITY:
+        return None
+
+    try:
+        path = _main_input(args or [], kwargs or {})
+        if path is None:
+            return None
+
+        queue = get_CACHE_AFFINITY().route(path)
+    except Exception as e:
+        logging.warning("""cache affinity routing failed
+        task = {}
+        error = {}
+        """.format(name, str(e)))
+        return None
+
+    if queue is None:
+        return None
+
+    return {'queue': queue}
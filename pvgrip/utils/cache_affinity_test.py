@@ -0,0 +1,57 @@
+from pvgrip.globals \
+    import REDIS_URL
+
+from pvgrip.utils.cache_affinity \
+    import Cache_Affinity
+from pvgrip.utils.redis.client \
+    import redis_client
+
+
+class _Cache:
+
+    def __init__(self, paths):
+        self._paths = paths
+
+    def paths(self):
+        return iter(self._paths)
+
+
+def test_Cache_Affinity():
+    affinity = Cache_Affinity(redis_url = REDIS_URL,
+                              nbits = 1024*8, backlog = 2,
+                              default_queue = 'test_Cache_Affinity')
+    client = redis_client(REDIS_URL)
+    try:
+        affinity.heartbeat(force = True)
+        assert affinity.route('test_affinity/a') is None
+
+        affinity.advertise(['test_affinity/a'])
+        assert affinity.route('test_affinity/a') == affinity.queue
+
+        client.rpush(affinity.queue, 'task1', 'task2')
+        assert affinity.route('test_affinity/a') is None
+        client.delete(affinity.queue)
+
+        affinity.maintain(_Cache(['test_affinity/b']))
+        assert affinity.route('test_affinity/a') is None
+        assert affinity.route('test_affinity/b') == affinity.queue
+
+        # hosts with a heartbeat keep their Bloom filter
+        affinity.rescue(affinity._host)
+        assert affinity.route('test_affinity/b') == affinity.queue
+
+        # a dead host is forgotten and rebuilds when it is back
+        client.delete('pvgrip_affinity_heartbeat_{}'\
+                      .format(affinity._host))
+        affinity.rescue(affinity._host)
+        assert affinity.route('test_affinity/b') is None
+        affinity.heartbeat(force = True)
+        assert not client.exists('pvgrip_affinity_rebuild_{}'\
+                                 .format(affinity._host))
+    finally:
+        client.delete('pvgrip_affinity_heartbeat_{}'\
+                      .format(affinity._host))
+        affinity.rescue(affinity._host)
+        client.delete('pvgrip_affinity_rebuild_{}'\
+                      .format(affinity._host),
+                      'test_Cache_Affinity')
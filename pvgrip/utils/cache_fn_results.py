@@ -1,19 +1,23 @@
 import os
 import json
+import time
 import pickle
 import celery
 import logging
 
 from functools import wraps
+from concurrent.futures \
+    import ThreadPoolExecutor, as_completed
 
 from pvgrip.globals \
-    import DEFAULT_REMOTE, RESULTS_PATH
+    import DEFAULT_REMOTE, RESULTS_PATH, LEGACY_CACHE_KEYS, \
+    PREFETCH_THREADS, WRITE_BEHIND
 
 from pvgrip.storage.remotestorage_path \
     import RemoteStoragePath, is_remote_path, \
     searchandget_locally, search_determineremote
 from pvgrip.utils.float_hash \
-    import float_hash
+    import float_hash, float_hash_v1
 
 from pvgrip.utils.files \
     import get_tempfile, remove_file, move_file
@@ -21,38 +25,134 @@ from pvgrip.utils.files \
 from pvgrip.utils.tasks \
     import call_fn_cache
 
+from pvgrip.utils.cache_metrics \
+    import Cache_Metrics
 
-def _get_locally_item(x):
+
+def _remote_paths(x, res):
+    """Collect all remote paths among the arguments
+
+    Dictionaries, lists and tuples are walked recursively.
+
+    :res: dictionary where found paths are added as keys
+    """
+    if isinstance(x, dict):
+        for v in x.values():
+            _remote_paths(v, res)
+    elif isinstance(x, (list, tuple)):
+        for v in x:
+            _remote_paths(v, res)
+    elif isinstance(x, str) and is_remote_path(x):
+        res[x] = None
+
+    return res
+
+
+def _get_locally_item(x, local):
+    """Replace remote paths with local ones
+
+    :local: dictionary remote path -> local path
+    """
     if isinstance(x, dict):
-        x = {k:_get_locally_item(v) for k,v in x.items()}
+        return {k:_get_locally_item(v, local) for k,v in x.items()}
 
-    if isinstance(x, (list, tuple)) and \
-       len(x) and isinstance(x[0], str):
-        x = [_get_locally_item(v) for v in x]
+    if isinstance(x, (list, tuple)):
+        res = [_get_locally_item(v, local) for v in x]
+        if any(a is not b for a,b in zip(res, x)):
+            return res
+        return x
 
-    if isinstance(x, str) and \
-       is_remote_path(x):
-        x = RemoteStoragePath(x).get_locally()
+    if isinstance(x, str) and x in local:
+        return local[x]
 
     return x
 
 
+def _prefetch(paths, nthreads = PREFETCH_THREADS):
+    """Download remote paths concurrently
+
+    Fails on the first error, pending downloads are cancelled.
+
+    :paths: list of remote paths
+
+    :nthreads: maximum number of concurrent downloads
+
+    :return: dictionary remote path -> local path
+    """
+    if len(paths) < 2 or nthreads < 2:
+        return {x: RemoteStoragePath(x).get_locally()
+                for x in paths}
+
+    res = {}
+    step = max(10, len(paths) // 10)
+    pool = ThreadPoolExecutor\
+        (max_workers = min(nthreads, len(paths)))
+    try:
+        futures = {pool.submit(RemoteStoragePath(x).get_locally): x
+                   for x in paths}
+        for future in as_completed(futures):
+            res[futures[future]] = future.result()
+            if 0 == len(res) % step or len(res) == len(paths):
+                logging.info("prefetch: {} of {} files are local"\
+                             .format(len(res), len(paths)))
+    except Exception as e:
+        logging.error("""Failed to prefetch file
+        error: {}
+        done: {} of {}
+        """.format(str(e), len(res), len(paths)))
+        raise e
+    finally:
+        pool.shutdown(wait = False, cancel_futures = True)
+
+    return res
+
+
+def _local_size(x):
+    """Total size of local files among the arguments
+
+    Walks arguments in the same way as '_get_locally_item'.
+    """
+    if isinstance(x, dict):
+        return sum(_local_size(v) for v in x.values())
+
+    if isinstance(x, (list, tuple)):
+        return sum(_local_size(v) for v in x)
+
+    if isinstance(x, str) and os.path.isfile(x):
+        return os.path.getsize(x)
+
+    return 0
+
+
+def _prefix_label(path_prefix, path_prefix_arg, kwargs):
+    res = '' if path_prefix is None else path_prefix
+    if path_prefix_arg is not None and \
+       path_prefix_arg in kwargs:
+        res = os.path.join(res, str(kwargs[path_prefix_arg]))
+    return res
+
+
 def _get_locally(*args, **kwargs):
     """Make sure all remote files are available locally
 
-    Note, only the first level of argument is walked. For example, if
-    argument is a list of files, this list is not checked.
+    Arguments are walked recursively and all found remote files are
+    downloaded concurrently.
     """
-    args = [_get_locally_item(x) for x in args]
+    local = _prefetch(list(_remote_paths([args, kwargs], {})))
+    if not local:
+        return list(args), kwargs
+
+    args = [_get_locally_item(x, local) for x in args]
 
-    kwargs = {k:_get_locally_item(v) \
+    kwargs = {k:_get_locally_item(v, local) \
               for k,v in kwargs.items()}
 
     return args, kwargs
 
 
 def _compute_ofn(fun, args, kwargs, keys, ofn_arg,
-                 prefix = None, prefix_arg = None):
+                 prefix = None, prefix_arg = None,
+                 hash_function = float_hash):
     """Compute ofn and key
 
     """
@@ -79,7 +179,7 @@ def _compute_ofn(fun, args, kwargs, keys, ofn_arg,
                     if k in keys}
     else:
         uniq = (args, kwargs)
-    key = float_hash(("cache_results", fun.__name__, uniq))
+    key = hash_function(("cache_results", fun.__name__, uniq))
 
     ofn = os.path.join(RESULTS_PATH, prefix, fun.__name__)
     os.makedirs(ofn, exist_ok = True)
@@ -132,6 +232,64 @@ def _ifpass_minage(minage, fntime, kwargs):
     return True
 
 
+def _legacy_ofn(ofn_arg, kwargs, suffix = '', **ofn_kwargs):
+    """Get a function that computes ofn with the legacy hash
+
+    The legacy hash is slow, hence it is computed only if needed.
+
+    :suffix: string to append to the ofn
+
+    :return: function returning ofn, or None if legacy keys are
+    not used
+    """
+    if not LEGACY_CACHE_KEYS:
+        return lambda: None
+
+    if ofn_arg is not None and ofn_arg in kwargs:
+        return lambda: None
+
+    return lambda: _compute_ofn(ofn_arg = ofn_arg, kwargs = kwargs,
+                                hash_function = float_hash_v1,
+                                **ofn_kwargs) + suffix
+
+
+def _in_cache(rpath, legacy_ofn, minage, kwargs, metrics):
+    """Check if a cached value is available
+
+    If the value is missing, but is stored under the legacy key,
+    then it is linked to rpath.
+
+    :rpath: RemoteStoragePath of the cached value
+
+    :legacy_ofn: function returning path computed with the legacy
+    key or None
+
+    :metrics: Cache_Metrics
+    """
+    if rpath.in_storage():
+        if _ifpass_minage(minage, rpath.get_timestamp(), kwargs):
+            return True
+        metrics.inc('minage_rejections')
+
+    legacy_ofn = legacy_ofn()
+    if legacy_ofn is None:
+        return False
+
+    legacy = RemoteStoragePath(legacy_ofn,
+                               remotetype = rpath.remotetype)
+    if not legacy.in_storage() or \
+       not _ifpass_minage(minage, legacy.get_timestamp(), kwargs):
+        return False
+
+    logging.debug("""
+    Linking value stored under the legacy key!
+    legacy = {}
+    ofn = {}
+    """.format(legacy_ofn, rpath.path))
+    rpath.link(legacy.path, timestamp = -1)
+    return True
+
+
 def cache_fn_results(keys = None,
                      link = False,
                      ignore = lambda x: False,
@@ -168,6 +326,16 @@ def cache_fn_results(keys = None,
     def wrapper(fun):
         @wraps(fun)
         def wrap(*args, **kwargs):
+            metrics = Cache_Metrics\
+                (function = fun.__name__,
+                 prefix = _prefix_label(path_prefix,
+                                        path_prefix_arg, kwargs))
+            try:
+                return _wrap(metrics, *args, **kwargs)
+            finally:
+                metrics.flush()
+
+        def _wrap(metrics, *args, **kwargs):
             ofn = _compute_ofn(fun = fun,
                                args = args,
                                kwargs = kwargs,
@@ -177,11 +345,19 @@ def cache_fn_results(keys = None,
                                prefix_arg = path_prefix_arg)
             ofn_rpath = RemoteStoragePath\
                 (ofn, remotetype=storage_type)
-
-            if ofn_rpath.in_storage() and \
-               _ifpass_minage(minage,
-                              ofn_rpath.get_timestamp(),
-                              kwargs):
+            legacy_ofn = _legacy_ofn(fun = fun,
+                                     args = args,
+                                     kwargs = kwargs,
+                                     keys = keys,
+                                     ofn_arg = ofn_arg,
+                                     prefix = path_prefix_arg,
+                                     prefix_arg = path_prefix_arg)
+
+            with metrics.timer('lookup'):
+                hit = _in_cache(ofn_rpath, legacy_ofn, minage,
+                                kwargs, metrics)
+            if hit:
+                metrics.inc('hits')
                 logging.debug("""
                 File is in cache!
                 ofn = {}
@@ -194,6 +370,7 @@ def cache_fn_results(keys = None,
                     ofn_rpath.update_timestamp()
                 return str(ofn_rpath)
 
+            metrics.inc('misses')
             logging.debug("""
                 File is NOT in cache!
                 ofn = {}
@@ -205,8 +382,15 @@ def cache_fn_results(keys = None,
 
             # make all filenames in arguments available locally
             if get_args_locally:
-                args, kwargs = _get_locally(*args, **kwargs)
+                with metrics.timer('get_locally'):
+                    args, kwargs = _get_locally(*args, **kwargs)
+                metrics.inc('bytes_in',
+                            _local_size(list(args)) + \
+                            _local_size(kwargs))
+            start = time.time()
             tfn = fun(*args, **kwargs)
+            cost = time.time() - start
+            metrics.observe('compute', cost)
 
             # check ignore condition
             if ignore(tfn):
@@ -224,7 +408,11 @@ def cache_fn_results(keys = None,
                 ofn_rpath.link(tfn_lpath)
                 return str(ofn_rpath)
 
-            ofn_rpath.upload()
+            with metrics.timer('upload'):
+                ofn_rpath.upload(cost = cost,
+                                 background = WRITE_BEHIND)
+            if os.path.isfile(ofn):
+                metrics.inc('bytes_out', os.path.getsize(ofn))
             return str(ofn_rpath)
         return wrap
     return wrapper
@@ -266,6 +454,16 @@ def call_cache_fn_results(keys = None,
     def wrapper(fun):
         @wraps(fun)
         def wrap(*args, **kwargs):
+            metrics = Cache_Metrics\
+                (function = fun.__name__,
+                 prefix = _prefix_label(path_prefix,
+                                        path_prefix_arg, kwargs))
+            try:
+                return _wrap(metrics, *args, **kwargs)
+            finally:
+                metrics.flush()
+
+        def _wrap(metrics, *args, **kwargs):
             ofn = _compute_ofn(fun = fun,
                                args = args,
                                kwargs = kwargs,
@@ -275,11 +473,19 @@ def call_cache_fn_results(keys = None,
                                ofn_arg = None)
             ofn_rpath = RemoteStoragePath\
                 (ofn, remotetype=storage_type)
-
-            if ofn_rpath.in_storage() and \
-               _ifpass_minage(minage,
-                              ofn_rpath.get_timestamp(),
-                              kwargs):
+            legacy_ofn = _legacy_ofn(fun = fun,
+                                     args = args,
+                                     kwargs = kwargs,
+                                     keys = keys,
+                                     prefix = path_prefix,
+                                     prefix_arg = path_prefix_arg,
+                                     ofn_arg = None)
+
+            with metrics.timer('lookup'):
+                hit = _in_cache(ofn_rpath, legacy_ofn, minage,
+                                kwargs, metrics)
+            if hit:
+                metrics.inc('hits')
                 logging.debug("""
                 Result of the call function is in cache!
                 ofn = {}
@@ -295,6 +501,7 @@ def call_cache_fn_results(keys = None,
                                'ofn': str(ofn_rpath),
                                'storage_type': storage_type})
 
+            metrics.inc('misses')
             logging.debug("""
             Result of the call function is NOT in cache!
             ofn = {}
@@ -307,14 +514,21 @@ def call_cache_fn_results(keys = None,
             call_fn = RemoteStoragePath\
                 (ofn + '_call.json',
                  remotetype=storage_type)
-            if call_fn.in_storage() and \
-               _ifpass_minage(minage,
-                              call_fn.get_timestamp(),
-                              kwargs):
+            if _in_cache(call_fn,
+                         _legacy_ofn(fun = fun,
+                                     args = args,
+                                     kwargs = kwargs,
+                                     keys = keys,
+                                     prefix = path_prefix,
+                                     prefix_arg = path_prefix_arg,
+                                     ofn_arg = None,
+                                     suffix = '_call.json'),
+                         minage, kwargs, metrics):
                 with open(call_fn.get_locally(), 'r') as f:
                     return celery.signature(json.load(f))
 
-            calls = fun(*args, **kwargs) # this can be long
+            with metrics.timer('compute'):
+                calls = fun(*args, **kwargs) # this can be long
             calls |= call_fn_cache.signature\
                 (kwargs = {'ofn': str(ofn_rpath),
                            'storage_type': storage_type})
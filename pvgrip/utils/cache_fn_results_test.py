@@ -0,0 +1,85 @@
+import time
+import pytest
+import threading
+
+from pvgrip.utils import cache_fn_results as cache
+
+
+class _Stop(Exception):
+    pass
+
+
+def _stop(**kwargs):
+    raise _Stop()
+
+
+def test_cache_fn_results_metrics_prefix(monkeypatch):
+    labels = []
+
+    class _Metrics:
+
+        def __init__(self, function, prefix):
+            labels.append((function, prefix))
+
+        def flush(self):
+            pass
+
+    monkeypatch.setattr(cache, 'Cache_Metrics', _Metrics)
+    monkeypatch.setattr(cache, '_compute_ofn', _stop)
+
+    @cache.cache_fn_results(path_prefix = 'raster')
+    def fun(x):
+        pass
+
+    @cache.cache_fn_results(path_prefix = 'raster',
+                            path_prefix_arg = 'what')
+    def fun_arg(what):
+        pass
+
+    with pytest.raises(_Stop):
+        fun(x = 1)
+    with pytest.raises(_Stop):
+        fun_arg(what = 'max')
+    assert labels == [('fun', 'raster'), ('fun_arg', 'raster/max')]
+
+
+def _fake_storage(get_locally):
+    class _Path:
+
+        def __init__(self, path, remotetype = None):
+            self._path = path
+
+        def get_locally(self):
+            return get_locally(self._path)
+
+    return _Path
+
+
+def test_prefetch(monkeypatch):
+    paths = ['test_prefetch/{}'.format(i) for i in range(4)]
+
+    # every download waits for the others
+    barrier = threading.Barrier(len(paths), timeout = 10)
+    def _get_locally(path):
+        barrier.wait()
+        return 'local/' + path
+
+    monkeypatch.setattr(cache, 'RemoteStoragePath',
+                        _fake_storage(_get_locally))
+    assert cache._prefetch(paths, nthreads = len(paths)) == \
+        {x: 'local/' + x for x in paths}
+
+
+def test_prefetch_error(monkeypatch):
+    paths = ['test_prefetch/{}'.format(i) for i in range(8)]
+
+    def _get_locally(path):
+        if path == paths[3]:
+            raise RuntimeError('failed ' + path)
+        time.sleep(0.01)
+        return 'local/' + path
+
+    monkeypatch.setattr(cache, 'RemoteStoragePath',
+                        _fake_storage(_get_locally))
+    with pytest.raises(RuntimeError, match = 'failed'):
+        cache._prefetch(paths, nthreads = 2)
@@ -0,0 +1,211 @@
+import time
+import socket
+import logging
+
+from contextlib \
+    import contextmanager
+from collections \
+    import defaultdict
+
+from pvgrip.globals \
+    import REDIS_URL
+
+from pvgrip.utils.redis.client \
+    import redis_client
+
+
+BUCKETS = (0.001, 0.01, 0.1, 0.5, 1, 5, 10, 60, 300, 1800)
+COUNTERS = ('hits', 'misses', 'minage_rejections',
+            'bytes_in', 'bytes_out')
+STAGES = ('lookup', 'get_locally', 'compute', 'upload')
+
+_KEY = 'pvgrip_cache_metrics_{}'
+_WORKERS = 'pvgrip_cache_metrics_workers'
+_EXPIRE = 7*24*60*60
+
+
+class Cache_Metrics:
+
+
+    def __init__(self, function, prefix = ''):
+        """Collect metrics of a single cached call
+
+        Metrics are accumulated locally and are written to redis with
+        'flush' in a single pipeline. Redis keeps a hash per worker
+        host.
+
+        :function: name of the cached function
+
+        :prefix: path prefix of the cached results
+
+        """
+        self._label = '{}|{}'.format(function, prefix)
+        self._data = defaultdict(float)
+
+
+    def inc(self, name, value = 1):
+        """Increment a counter
+
+        :name: one of COUNTERS
+        """
+        self._data['counter|{}|{}'.format(self._label, name)] += value
+
+
+    def observe(self, stage, seconds):
+        """Add a stage duration to the histogram
+
+        :stage: one of STAGES
+        """
+        le = next((x for x in BUCKETS if seconds <= x), '+Inf')
+        self._data['bucket|{}|{}|{}'\
+                   .format(self._label, stage, le)] += 1
+        self._data['sum|{}|{}'\
+                   .format(self._label, stage)] += seconds
+
+
+    @contextmanager
+    def timer(self, stage):
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.time() - start)
+
+
+    def flush(self):
+        """Write collected metrics to redis
+
+        Failures are logged and ignored.
+        """
+        if not self._data:
+            return
+
+        key = _KEY.format(socket.gethostname())
+        try:
+            pipe = redis_client(REDIS_URL).pipeline(transaction = False)
+            for field, value in self._data.items():
+                if value == int(value):
+                    pipe.hincrby(key, field, int(value))
+                else:
+                    pipe.hincrbyfloat(key, field, value)
+            pipe.expire(key, _EXPIRE)
+            pipe.sadd(_WORKERS, socket.gethostname())
+            pipe.execute()
+        except Exception as e:
+            logging.warning("Cache_Metrics: failed to flush: {}"\
+                            .format(e))
+        self._data = defaultdict(float)
+
+
+def read_metrics():
+    """Read metrics of all workers
+
+    :return: dictionary worker -> {field: value}
+    """
+    client = redis_client(REDIS_URL)
+    workers = sorted(x.decode() for x in client.smembers(_WORKERS))
+
+    pipe = client.pipeline(transaction = False)
+    for worker in workers:
+        pipe.hgetall(_KEY.format(worker))
+
+    res = {}
+    for worker, data in zip(workers, pipe.execute()):
+        if not data:
+            client.srem(_WORKERS, worker)
+            continue
+        res[worker] = {k.decode(): float(v) for k, v in data.items()}
+
+    return res
+
+
+def _parse(metrics):
+    """Group metrics by (worker, function, prefix)
+
+    :return: dictionary (worker, function, prefix) ->
+    {'counters': {name: value},
+     'stages': {stage: {'sum': seconds, 'buckets': {le: count}}}}
+    """
+    res = {}
+    for worker, data in metrics.items():
+        for field, value in data.items():
+            kind, function, prefix, *rest = field.split('|')
+            item = res.setdefault\
+                ((worker, function, prefix),
+                 {'counters': {}, 'stages': {}})
+
+            if 'counter' == kind:
+                item['counters'][rest[0]] = value
+                continue
+
+            stage = item['stages'].setdefault\
+                (rest[0], {'sum': 0, 'buckets': {}})
+            if 'sum' == kind:
+                stage['sum'] = value
+            else:
+                stage['buckets'][rest[1]] = value
+
+    return res
+
+
+def summary():
+    """Summary of metrics for the status page
+
+    :return: dictionary worker -> function|prefix -> counters and
+    number and total time of stages
+    """
+    res = {}
+    for (worker, function, prefix), item in \
+        _parse(read_metrics()).items():
+        x = dict(item['counters'])
+        for stage, data in item['stages'].items():
+            x['{}_count'.format(stage)] = sum(data['buckets'].values())
+            x['{}_seconds'.format(stage)] = data['sum']
+        res.setdefault(worker, {})\
+           ['{}|{}'.format(function, prefix)] = x
+
+    return res
+
+
+def _labels(**kwargs):
+    return ','.join('{}="{}"'.format\
+                    (k, str(v).replace('\\', '\\\\')\
+                     .replace('"', '\\"'))
+                    for k, v in kwargs.items())
+
+
+def prometheus():
+    """Format metrics in the prometheus text format
+
+    """
+    data = _parse(read_metrics())
+
+    res = []
+    for name in COUNTERS:
+        res += ['# TYPE pvgrip_cache_{}_total counter'.format(name)]
+        for (worker, function, prefix), item in data.items():
+            if name not in item['counters']:
+                continue
+            res += ['pvgrip_cache_{}_total{{{}}} {}'.format\
+                    (name, _labels(worker = worker,
+                                   function = function,
+                                   prefix = prefix),
+                     int(item['counters'][name]))]
+
+    res += ['# TYPE pvgrip_cache_stage_seconds histogram']
+    for (worker, function, prefix), item in data.items():
+        for stage, x in item['stages'].items():
+            labels = dict(worker = worker, function = function,
+                          prefix = prefix, stage = stage)
+            count = 0
+            for le in [str(b) for b in BUCKETS] + ['+Inf']:
+                count += x['buckets'].get(le, 0)
+                res += ['pvgrip_cache_stage_seconds_bucket{{{}}} {}'\
+                        .format(_labels(le = le, **labels),
+                                int(count))]
+            res += ['pvgrip_cache_stage_seconds_sum{{{}}} {}'\
+                    .format(_labels(**labels), x['sum'])]
+            res += ['pvgrip_cache_stage_seconds_count{{{}}} {}'\
+                    .format(_labels(**labels), int(count))]
+
+    return '\n'.join(res) + '\n'
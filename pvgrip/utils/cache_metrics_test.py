@@ -0,0 +1,36 @@
+from pvgrip.utils import cache_metrics
+
+from pvgrip.utils.cache_metrics \
+    import Cache_Metrics
+
+
+def test_Cache_Metrics(monkeypatch):
+    metrics = Cache_Metrics(function = 'sample_raster',
+                            prefix = 'raster')
+    metrics.inc('misses')
+    metrics.inc('bytes_out', 1024)
+    metrics.observe('compute', 0.2)
+    metrics.observe('compute', 2)
+    metrics.observe('compute', 10000)
+
+    monkeypatch.setattr(cache_metrics, 'read_metrics',
+                        lambda: {'worker': dict(metrics._data)})
+
+    summary = cache_metrics.summary()['worker']['sample_raster|raster']
+    assert 1 == summary['misses']
+    assert 1024 == summary['bytes_out']
+    assert 3 == summary['compute_count']
+    assert 10002.2 == summary['compute_seconds']
+
+    res = cache_metrics.prometheus().split('\n')
+    labels = 'worker="worker",function="sample_raster",prefix="raster"'
+    assert 'pvgrip_cache_misses_total{{{}}} 1'\
+        .format(labels) in res
+    assert 'pvgrip_cache_stage_seconds_bucket{{le="0.1",{},'\
+        'stage="compute"}} 0'.format(labels) in res
+    assert 'pvgrip_cache_stage_seconds_bucket{{le="0.5",{},'\
+        'stage="compute"}} 1'.format(labels) in res
+    assert 'pvgrip_cache_stage_seconds_bucket{{le="+Inf",{},'\
+        'stage="compute"}} 3'.format(labels) in res
+    assert 'pvgrip_cache_stage_seconds_count{{{},'\
+        'stage="compute"}} 3'.format(labels) in res
@@ -42,3 +42,19 @@ def ll2epsg(lat, lon, epsg):
 
     """
     return _TSF(lat = lat, lon = lon, fr = 4326, to = epsg)
+
+
+def epsg2epsg(lat, lon, fr, to):
+    """Convert coordinates between coordinate systems
+
+    Coordinates can be numpy arrays.
+
+    :lat, lon: latitude and longitude (wrt fr)
+
+    :fr, to: source and target coordinate system codes
+
+    :return: a tuple of latitude and longitude in 'to' coordinate
+    system
+
+    """
+    return _TSF(lat = lat, lon = lon, fr = fr, to = to)
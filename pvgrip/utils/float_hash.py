@@ -1,19 +1,79 @@
-import os
 import types
 import hashlib
 
 
+def _serialize(key, fmt, append):
+    """Append canonical representation of key
+
+    Lists and tuples are not distinguished. Floats are rounded to the
+    format 'fmt', functions are represented by their names, any other
+    object by its string representation. Every item is prefixed by
+    its length, so different structures never serialise the same.
+    """
+    # exact types are checked first, as they are by far the most
+    # common
+    tp = type(key)
+    if tp is float:
+        key = fmt % key
+    elif tp is str:
+        pass
+    elif tp is list or tp is tuple \
+         or isinstance(key, (tuple, list)):
+        append('l%d:' % len(key))
+        for x in key:
+            _serialize(x, fmt, append)
+        return
+    elif isinstance(key, dict):
+        append('d%d:' % len(key))
+        for k,v in key.items():
+            _serialize(k, fmt, append)
+            _serialize(v, fmt, append)
+        return
+    elif isinstance(key, float):
+        key = fmt % key
+    elif isinstance(key, types.FunctionType):
+        key = key.__name__
+    else:
+        key = str(key)
+
+    append('s%d:' % len(key))
+    append(key)
+
+
 def float_hash(key, digits = 8):
+    """Compute a hash of a nested structure
+
+    The structure is serialised in a single pass and hashed at
+    once. Note, hashes differ from 'float_hash_v1'.
+
+    :key: nested lists, tuples and dictionaries of anything that
+    can be converted to a string
+
+    :digits: number of digits to round floats to
+
+    :return: md5 hexdigest
+    """
+    out = []
+    _serialize(key, '%.' + str(digits) + 'f', out.append)
+    return hashlib.md5(''.join(out).encode('utf-8')).hexdigest()
+
+
+def float_hash_v1(key, digits = 8):
+    """Legacy version of 'float_hash'
+
+    Used to compute cache keys of stored results before 'float_hash'
+    was introduced.
+    """
     h = hashlib.md5()
     if isinstance(key, (tuple, list)):
         for x in key:
-            h.update(float_hash(x, digits).encode('utf-8'))
+            h.update(float_hash_v1(x, digits).encode('utf-8'))
         return h.hexdigest()
 
     if isinstance(key, dict):
         for k,v in key.items():
-            h.update(float_hash(k, digits).encode('utf-8'))
-            h.update(float_hash(v, digits).encode('utf-8'))
+            h.update(float_hash_v1(k, digits).encode('utf-8'))
+            h.update(float_hash_v1(v, digits).encode('utf-8'))
         return h.hexdigest()
 
     if isinstance(key, float):
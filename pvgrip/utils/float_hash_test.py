@@ -0,0 +1,29 @@
+import numpy as np
+
+from pvgrip.utils.float_hash \
+    import float_hash, float_hash_v1
+
+
+def test_float_hash_v1():
+    # legacy keys of stored results must not change
+    assert 'c4ca4238a0b923820dcc509a6f75849b' == float_hash_v1(1)
+    assert float_hash_v1(("nrw_las", "url", 1, 2)) == \
+        float_hash_v1(["nrw_las", "url", 1, 2])
+
+
+def test_float_hash():
+    assert float_hash(1.000000001) == float_hash(1.0)
+    assert float_hash(1.0) != float_hash(1.0001)
+    assert float_hash(1.0, digits = 2) == float_hash(1.001, digits = 2)
+    assert float_hash(np.float64(0.5)) == float_hash(0.5)
+
+    assert float_hash((1, 2.0)) == float_hash([1, 2.0])
+    assert float_hash({'a': 1}) == float_hash({'a': 1})
+    assert float_hash({'a': 1, 'b': 2}) != float_hash({'b': 2, 'a': 1})
+    assert float_hash({'a': 1}) != float_hash(['a', 1])
+    assert float_hash(['ab', 'c']) != float_hash(['a', 'bc'])
+    assert float_hash([[1], 2]) != float_hash([1, [2]])
+    assert float_hash(float_hash) == float_hash('float_hash')
+
+    assert float_hash(1) != float_hash_v1(1)
+    assert 32 == len(float_hash([1, {'a': (2.0, None)}]))
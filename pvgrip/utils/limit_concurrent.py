@@ -1,5 +1,4 @@
 import time
-import redis
 import logging
 
 from functools \
@@ -11,22 +10,17 @@ from pvgrip.globals \
 from pvgrip.utils.float_hash \
     import float_hash
 
-from pvgrip.utils.redis.parse_url \
-    import parse_url
-
-from pvgrip.utils.redis.lock \
-    import RedisLock
+from pvgrip.utils.redis.client \
+    import redis_client
 
 
 def limit_concurrent(maxtimes = 2,
                      sleep = 3,
-                     locksleep = 0.5,
-                     lockexpire = 60,
                      keys = None):
     def wrapper(fun):
         @wraps(fun)
         def wrap(*args, **kwargs):
-            REDIS = redis.StrictRedis(**parse_url(REDIS_URL))
+            REDIS = redis_client(REDIS_URL)
             if keys is None:
                 key = float_hash(("limit_concurrent_list",
                                   fun.__name__, args, kwargs))
@@ -36,16 +30,10 @@ def limit_concurrent(maxtimes = 2,
                                   [k for k in keys
                                    if k in kwargs]))
 
-            while True:
-                with RedisLock\
-                     (redis_url = REDIS_URL,
-                      key = float_hash\
-                      (("limit_concurrent_lock", key)),
-                      sleep = locksleep,
-                      timeout = lockexpire):
-                    if REDIS.llen(key) <= maxtimes:
-                        REDIS.rpush(key,0)
-                        break
+            # rpush is atomic and returns the length of the list
+            # after the push, hence no lock is needed
+            while REDIS.rpush(key, 0) - 1 > maxtimes:
+                REDIS.lpop(key)
                 logging.debug\
                     ("limit_concurrent sleeping...")
                 time.sleep(sleep)
@@ -1,11 +1,10 @@
 import re
 import time
-import redis
 
 from datetime import datetime
 
-from pvgrip.utils.redis.parse_url \
-    import parse_url
+from pvgrip.utils.redis.client \
+    import redis_client
 
 from pvgrip.utils.redis.lock \
     import RedisLock
@@ -56,8 +55,7 @@ class Limit_Counter:
         self.name = "limit_counter_{}_{}_{}"\
             .format(name, limit, self.limit_in_period)
 
-        self._client = redis.StrictRedis\
-            (**parse_url(redis_url))
+        self._client = redis_client(redis_url)
         self._lock = RedisLock(redis_url = redis_url,
                                key = "lock_{}"\
                                .format(self.name),
@@ -84,20 +82,14 @@ class Limit_Counter:
                                .format(self._time_period))
 
 
-    def _waittime(self):
-        """Identifies how old is the first entry in the list
+    def _waittime(self, car, now):
+        """Identifies how old is an entry in the list
 
-        returns 0, if the first entry is older than the time_period.
+        returns 0, if the entry is older than the time_period.
 
-        Otherwise, return number of seconds to wait for the first
-        entry to expire (or become older than the time_period).
+        Otherwise, return number of seconds to wait for the entry to
+        expire (or become older than the time_period).
         """
-        if 0 == self._client.llen(self.name):
-            return -1
-
-        now = time.time()
-        car = float(self._client.lindex(self.name,0))
-
         if self.limit_in_period:
             fnow = datetime.strftime(datetime.fromtimestamp(now),
                                      self._dformat)
@@ -119,31 +111,58 @@ class Limit_Counter:
         return self._delay - (now - car)
 
 
+    def _entries(self, now):
+        """Read the list and find expired entries
+
+        Entries are pushed in the increasing order, hence expired
+        entries are always in the beginning of the list.
+
+        :return: (number of expired entries, list of not expired
+        entries)
+        """
+        entries = [float(x) for x in \
+                   self._client.lrange(self.name, 0, -1)]
+
+        n = 0
+        while n < len(entries) \
+              and not self._waittime(entries[n], now):
+            n += 1
+
+        return n, entries[n:]
+
+
     def waittime(self):
         """Compute wait time
 
         Returns 0 if queue is free or number of seconds to wait
         """
         with self._lock:
-            while not self._waittime():
-                self._client.lpop(self.name)
+            now = time.time()
+            expired, entries = self._entries(now)
+            if expired:
+                self._client.ltrim(self.name, expired, -1)
 
-            if self._client.llen(self.name) < self.limit:
+            if len(entries) < self.limit:
                 return 0
 
-            return self._waittime()
+            return self._waittime(entries[0], now)
 
 
     def increment(self):
         with self._lock:
-            while not self._waittime():
-                self._client.lpop(self.name)
+            now = time.time()
+            expired, entries = self._entries(now)
+
+            pipe = self._client.pipeline()
+            if expired:
+                pipe.ltrim(self.name, expired, -1)
 
-            if self._client.llen(self.name) >= self.limit \
-               and self._waittime() > 0:
+            if len(entries) >= self.limit:
+                pipe.execute()
                 raise FullQueue()
 
-            self._client.rpush(self.name,time.time())
+            pipe.rpush(self.name, now)
+            pipe.execute()
 
 
     def __len__(self):
@@ -0,0 +1,78 @@
+import os
+import logging
+import threading
+
+from collections import defaultdict
+
+
+def cassandra_healthy(obj):
+    """Check if cassandra cluster and session of an object are alive
+
+    Objects without '_cluster' or '_session' are considered healthy.
+    """
+    for name in ('_cluster', '_session'):
+        if getattr(getattr(obj, name, None), 'is_shutdown', False):
+            return False
+
+    return True
+
+
+class Process_Singletons:
+    """Keep one instance of an object per process
+
+    Objects are created lazily on the first request. An object created
+    in a parent process is never returned in a forked child.
+
+    """
+
+    def __init__(self):
+        self._items = {}
+        self._counts = defaultdict(int)
+        # create may get other singletons
+        self._lock = threading.RLock()
+
+
+    def get(self, key, create, healthy = None):
+        """Get an object
+
+        :key: hashable name of the object
+
+        :create: function without arguments that creates the object
+
+        :healthy: optional function that checks if the existing
+        object can still be used
+
+        """
+        pid = os.getpid()
+        with self._lock:
+            if key in self._items:
+                opid, obj = self._items[key]
+                if opid == pid and (healthy is None or healthy(obj)):
+                    return obj
+
+                if opid == pid:
+                    logging.warning("Process_Singletons: {} is not "
+                                    "healthy, recreating"\
+                                    .format(key))
+
+            obj = create()
+            self._items[key] = (pid, obj)
+            self._counts[key] += 1
+            return obj
+
+
+    def reset(self):
+        """Forget all objects and counts
+
+        """
+        with self._lock:
+            self._items = {}
+            self._counts = defaultdict(int)
+
+
+    def counts(self):
+        """Number of objects created by this process per key
+
+        """
+        with self._lock:
+            return dict(self._counts)
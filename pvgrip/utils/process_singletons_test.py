@@ -0,0 +1,61 @@
+import multiprocessing
+
+from pvgrip.utils.process_singletons \
+    import Process_Singletons
+
+
+class _Handle:
+
+    def __init__(self):
+        self.is_shutdown = False
+
+
+def _child_creates(singletons, queue):
+    obj = singletons.get('x', create = _Handle)
+    queue.put(singletons.counts().get('x', 0))
+
+
+def test_Process_Singletons():
+    singletons = Process_Singletons()
+
+    a = singletons.get('x', create = _Handle)
+    b = singletons.get('x', create = _Handle)
+    assert a is b
+    assert singletons.counts() == {'x': 1}
+
+    a.is_shutdown = True
+    c = singletons.get('x', create = _Handle,
+                       healthy = lambda x: not x.is_shutdown)
+    assert c is not a
+    assert singletons.counts() == {'x': 2}
+
+    singletons.reset()
+    assert singletons.counts() == {}
+    assert singletons.get('x', create = _Handle) is not c
+
+
+def test_Process_Singletons_nested():
+    singletons = Process_Singletons()
+
+    def _create():
+        return (singletons.get('inner', create = _Handle),)
+
+    outer = singletons.get('outer', create = _create)
+    assert outer[0] is singletons.get('inner', create = _Handle)
+    assert singletons.counts() == {'inner': 1, 'outer': 1}
+
+
+def test_Process_Singletons_fork():
+    singletons = Process_Singletons()
+    singletons.get('x', create = _Handle)
+
+    ctx = multiprocessing.get_context('fork')
+    queue = ctx.Queue()
+    p = ctx.Process(target = _child_creates,
+                    args = (singletons, queue))
+    p.start()
+    p.join()
+
+    # child inherits the count, but creates its own object
+    assert 2 == queue.get()
+    assert singletons.counts() == {'x': 1}
@@ -0,0 +1,79 @@
+import hashlib
+
+from pvgrip.utils.redis.client \
+    import redis_client
+
+
+class Redis_Bloom:
+
+
+    def __init__(self, name, redis_url,
+                 nbits = 4*1024**2, nhashes = 4):
+        """A Bloom filter kept in a redis bitmap
+
+        The filter answers if an item was possibly added. False
+        positives are possible, false negatives are not.
+
+        :name: name of the key in redis
+
+        :redis_url: how to connect to redis
+
+        :nbits: size of the filter in bits
+
+        :nhashes: number of bits set per item
+
+        """
+        self._name = name
+        self._client = redis_client(redis_url)
+        self._nbits = nbits
+        self._nhashes = nhashes
+
+
+    def _offsets(self, item):
+        h = hashlib.md5(str(item).encode()).digest()
+        a = int.from_bytes(h[:8], 'little')
+        b = int.from_bytes(h[8:], 'little') | 1
+        return [(a + i*b) % self._nbits
+                for i in range(self._nhashes)]
+
+
+    def add(self, items):
+        """Add items to the filter
+
+        :items: list of items
+        """
+        pipe = self._client.pipeline(transaction = False)
+        for item in items:
+            for x in self._offsets(item):
+                pipe.setbit(self._name, x, 1)
+        pipe.execute()
+
+
+    def __contains__(self, item):
+        pipe = self._client.pipeline(transaction = False)
+        for x in self._offsets(item):
+            pipe.getbit(self._name, x)
+        return all(pipe.execute())
+
+
+    def replace(self, items):
+        """Replace content of the filter with items
+
+        The new filter is built locally and is swapped in atomically.
+
+        :items: iterable of items
+        """
+        data = bytearray(self._nbits // 8 + 1)
+        for item in items:
+            for x in self._offsets(item):
+                data[x >> 3] |= 0x80 >> (x & 7)
+
+        tmp = self._name + '_tmp'
+        pipe = self._client.pipeline(transaction = True)
+        pipe.set(tmp, bytes(data))
+        pipe.rename(tmp, self._name)
+        pipe.execute()
+
+
+    def delete(self):
+        self._client.delete(self._name)
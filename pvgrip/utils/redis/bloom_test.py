@@ -0,0 +1,23 @@
+from pvgrip.globals \
+    import REDIS_URL
+
+from pvgrip.utils.redis.bloom \
+    import Redis_Bloom
+
+
+def test_Redis_Bloom():
+    bloom = Redis_Bloom(name = 'test_Redis_Bloom',
+                        redis_url = REDIS_URL,
+                        nbits = 1024*8)
+    try:
+        items = ['/code/data/results/{}'.format(i)
+                 for i in range(100)]
+        bloom.add(items[:50])
+        assert all(x in bloom for x in items[:50])
+        assert sum(x in bloom for x in items[50:]) < 5
+
+        bloom.replace(items[50:])
+        assert all(x in bloom for x in items[50:])
+        assert sum(x in bloom for x in items[:50]) < 5
+    finally:
+        bloom.delete()
@@ -0,0 +1,27 @@
+import redis
+import threading
+
+from pvgrip.utils.redis.parse_url \
+    import parse_url
+
+
+_CLIENTS = {}
+_CLIENTS_LOCK = threading.Lock()
+
+
+def redis_client(redis_url):
+    """Get a redis client for an url
+
+    Clients are shared within a process, and all clients for the same
+    url use a single connection pool. The connection pool takes care
+    of forked processes by itself.
+
+    :redis_url: how to connect to redis
+
+    """
+    with _CLIENTS_LOCK:
+        if redis_url not in _CLIENTS:
+            _CLIENTS[redis_url] = redis.StrictRedis\
+                (connection_pool = redis.ConnectionPool\
+                 (**parse_url(redis_url)))
+        return _CLIENTS[redis_url]
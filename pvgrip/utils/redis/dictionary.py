@@ -1,11 +1,10 @@
 import json
-import redis
 
 from pvgrip.utils.float_hash \
     import float_hash
 
-from pvgrip.utils.redis.parse_url \
-    import parse_url
+from pvgrip.utils.redis.client \
+    import redis_client
 
 
 class Redis_Dictionary:
@@ -25,7 +24,7 @@ class Redis_Dictionary:
         :expire_time: time to expire for dictionary items
         """
         self._name = name
-        self._client = redis.StrictRedis(**parse_url(redis_url))
+        self._client = redis_client(redis_url)
         self._hash = hash_function
         self._expire = expire_time
 
@@ -45,11 +44,11 @@ class Redis_Dictionary:
     def __getitem__(self, key):
         hkey = self._hash(key)
 
-        if not self._client.exists(self._name + hkey):
+        sitem = self._client.get(self._name + hkey)
+        if sitem is None:
             raise KeyError\
                 ("'{key}' is not in hset".format(key=key))
 
-        sitem = self._client.get(self._name + hkey)
         return json.loads(sitem)
 
 
@@ -1,8 +1,8 @@
 import time
 import redis
 
-from pvgrip.utils.redis.parse_url \
-    import parse_url
+from pvgrip.utils.redis.client \
+    import redis_client
 
 
 class Locked(Exception):
@@ -28,8 +28,7 @@ class RedisLock:
         """
         self.key = key
         self.sleep = sleep
-        self._redis = redis.StrictRedis\
-            (**parse_url(redis_url))
+        self._redis = redis_client(redis_url)
         self._lock = redis.lock.Lock\
             (self._redis, self.key, timeout = timeout,
              blocking = 1,
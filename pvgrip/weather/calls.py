@@ -12,7 +12,7 @@ from pvgrip.globals \
     COPERNICUS_CDS_HASH_LENGTH
 
 from pvgrip.storage.remotestorage_path \
-    import searchif_instorage, \
+    import searchif_instorage_many, \
     searchandget_locally
 
 from pvgrip.weather.tasks \
@@ -34,9 +34,11 @@ from pvgrip.route.split_route \
 
 
 def _get_sources_tasks(calls):
+    instorage = searchif_instorage_many([x['ofn'] for x in calls])
+
     res = []
     for call in calls:
-        if searchif_instorage(call['ofn']):
+        if instorage[call['ofn']]:
             continue
 
         res += [retrieve_source.signature\
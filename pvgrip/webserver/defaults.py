@@ -15,6 +15,8 @@ def calls_help():
     /api/datasets        list available datasets
 
     /api/upload          upload a file to the storage
+        /api/upload/start, /api/upload/chunk, /api/upload/finish
+                         upload a large file in resumable chunks
     /api/download        upload a file from the storage
 
     /api/raster          get a raster image of a region
@@ -66,6 +68,8 @@ def calls_help():
                          compute stdev of lidar points in any window
 
     /api/status          print current active and scheduled jobs
+                         and cache statistics
+    /api/metrics         cache metrics in the prometheus text format
 
     """
 
@@ -82,7 +86,8 @@ def global_defaults():
               - "path": webserver sends back a pvgrip path
                     a file can be downloaded with /download
               - "ipfs_cid": webserver sends back an ipfs_cid
-                    a file can be downloaded through ipfs""")}
+                    a file can be downloaded through ipfs.
+                    Not available if [storage] codec is set""")}
 
 
 def lookup_defaults():
@@ -141,12 +146,33 @@ def raster_defaults():
                  """
                  type of output
 
-                 choices: "pickle","geotiff","pnghillshade","png","pngnormalize","pngnormalize_scale"
+                 choices: "pickle","raster","geotiff","pnghillshade","png","pngnormalize","pngnormalize_scale"
+
+                 "raster" is a raster container, a JSON header and
+                 raw arrays, see pvgrip.raster.container.read_raster
 
                  "png" does not normalise data""")})
     return res
 
 
+def sample_raster_defaults():
+    res = raster_defaults()
+    res.update({'sampling': \
+                ('box',
+                 """
+                 how to sample the raster
+
+                 choices: "box", "tiles"
+
+                 "box" samples exactly the requested box
+
+                 "tiles" assembles the raster from cached tiles of a
+                 canonical grid, where coordinates are multiples of
+                 the step. Overlapping boxes share the tiles. The
+                 resulting raster is aligned to the canonical grid""")})
+    return res
+
+
 def timestr_argument():
     return {'timestr': \
             ("2020-07-01_06:00:00",
@@ -283,6 +309,50 @@ def upload_defaults():
              """)}
 
 
+def upload_start_defaults():
+    return {'upload_id': \
+            ('NA',
+             """id of an upload to resume
+
+             If 'NA' a new upload is started. Returns the upload_id
+             and offset, the number of bytes received so far.
+
+             A large file is uploaded as:
+
+             curl '<site>/api/upload/start'
+             curl -X POST --data-binary @chunk0 \\
+               '<site>/api/upload/chunk?upload_id=<id>&offset=0'
+             ...
+             curl '<site>/api/upload/finish?upload_id=<id>'
+
+             If an upload is interrupted, call /api/upload/start with
+             the upload_id and continue from the returned offset.
+             """)}
+
+
+def upload_chunk_defaults():
+    return {'upload_id': \
+            ('NA',
+             """id of an upload from /api/upload/start
+
+             Must be specified in the query string, the body of the
+             POST request is the chunk.
+             """),
+            'offset': \
+            (0,
+             """position of the chunk in the file
+
+             Must be equal to the number of bytes received so far.
+             """)}
+
+
+def upload_finish_defaults():
+    return {'upload_id': \
+            ('NA',
+             """id of an upload from /api/upload/start
+             """)}
+
+
 def download_defaults():
     res = global_defaults()
     res.update({
@@ -648,7 +718,7 @@ def filter_raster_route():
 
 def call_defaults(method):
     if 'raster' == method:
-        res = raster_defaults()
+        res = sample_raster_defaults()
     elif 'raster/route' == method:
         res = raster_route_defaults()
     elif 'shadow' == method:
@@ -671,6 +741,12 @@ def call_defaults(method):
         res = ssdp_defaults()
     elif 'upload' == method:
         res = upload_defaults()
+    elif 'upload/start' == method:
+        res = upload_start_defaults()
+    elif 'upload/chunk' == method:
+        res = upload_chunk_defaults()
+    elif 'upload/finish' == method:
+        res = upload_finish_defaults()
     elif 'download' == method:
         res = download_defaults()
     elif 'route' == method:
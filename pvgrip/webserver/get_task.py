@@ -23,11 +23,14 @@ from pvgrip.filter.calls \
 from pvgrip.status.utils \
     import status
 
+from pvgrip.utils.cache_metrics \
+    import prometheus
+
 from pvgrip.globals \
     import get_SPATIAL_DATA, PVGRIP_CONFIGS, get_Tasks_Queues
 
 from pvgrip.storage.upload \
-    import upload
+    import upload, upload_start, upload_chunk, upload_finish
 
 
 def get_task(method, args):
@@ -85,11 +88,26 @@ def get_task(method, args):
         run = ssdp_integrate
     elif 'status' == method:
         return {'results': status()}
+    elif 'metrics' == method:
+        return bottle.HTTPResponse\
+            (body = prometheus(),
+             headers = {'Content-Type':
+                        'text/plain; version=0.0.4; charset=utf-8'})
     elif 'datasets' == method:
         SPATIAL_DATA = get_SPATIAL_DATA()
         return {'results': SPATIAL_DATA.get_datasets()}
     elif 'upload' == method:
-        return serve(upload(bottle.request.files.data))
+        return serve(upload(bottle.request))
+    elif 'upload/start' == method:
+        return upload_start(args['upload_id'])
+    elif 'upload/chunk' == method:
+        # the body is the chunk, arguments are in the query
+        return upload_chunk\
+            (upload_id = bottle.request.query.upload_id,
+             offset = bottle.request.query.offset,
+             data = bottle.request.environ)
+    elif 'upload/finish' == method:
+        return serve(upload_finish(args['upload_id']))
     elif 'download' == method:
         return serve(args['path'], args['serve_type'])
     elif 'weather/irradiance' == method:
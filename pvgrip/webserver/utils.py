@@ -1,5 +1,7 @@
+import os
 import re
 import json
+import bottle
 import celery
 import traceback
 
@@ -13,6 +15,8 @@ from pvgrip.utils.celery_one_instance \
 
 from pvgrip.utils.cache_fn_results \
     import cache_fn_results
+from pvgrip.utils.float_hash \
+    import float_hash
 
 from pvgrip.utils.exceptions \
     import TASK_RUNNING
@@ -22,7 +26,7 @@ from pvgrip.storage.remotestorage_path \
     RemoteStoragePath
 
 from pvgrip.globals \
-    import get_Tasks_Queues, PVGRIP_CONFIGS
+    import get_Tasks_Queues, PVGRIP_CONFIGS, STORAGE_CODEC
 
 from pvgrip.webserver.tasks \
     import generate_task_queue
@@ -62,17 +66,38 @@ def parse_args(data, defaults):
     return res
 
 
+def serve_file(data):
+    """Stream a remote file from the local cache
+
+    Range, If-None-Match and If-Modified-Since requests are handled
+    by bottle. The ETag is derived from the storage path and the
+    storage timestamp, so it does not depend on when the file was
+    fetched to the local cache.
+
+    :data: remote path
+    """
+    fn = os.path.abspath(searchandget_locally(data))
+    etag = float_hash((data, RemoteStoragePath(data).get_timestamp()))
+    return bottle.static_file(os.path.basename(fn),
+                              root = os.path.dirname(fn),
+                              etag = etag)
+
+
 def serve(data, serve_type = 'file'):
     if isinstance(data, dict):
         return data
 
     if is_remote_path(data):
         if 'file' == serve_type:
-            with open(searchandget_locally(data),'rb') as f:
-                return f.read()
+            return serve_file(data)
         elif 'path' == serve_type:
             return {'storage_fn': data}
         elif 'ipfs_cid' == serve_type:
+            if 'none' != STORAGE_CODEC:
+                # the cid would point to the compressed file
+                raise RuntimeError\
+                    ('serve_type = ipfs_cid is not available with '
+                     'the storage codec = {}'.format(STORAGE_CODEC))
             return {'ipfs_cid': \
                     '/ipfs/{}'\
                     .format(RemoteStoragePath(data)\
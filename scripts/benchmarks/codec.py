@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+
+import os
+import time
+import pickle
+import shutil
+import argparse
+import tempfile
+
+import numpy as np
+
+from scipy.ndimage \
+    import gaussian_filter
+
+from pvgrip.storage.codec \
+    import CODECS, compress_file, decompress_file
+
+
+def _raster(n, seed = 0):
+    """Elevation-like raster in the format of the raster pickles"""
+    rng = np.random.default_rng(seed)
+    x = gaussian_filter(rng.normal(size = (n, n)), sigma = 50)
+    x = 100 + 1000*x/np.abs(x).max()
+    # elevation data comes in float32 geotiffs
+    x = (x + rng.normal(scale = 0.05, size = (n, n)))\
+        .astype(np.float32).astype(np.float64)
+    return {'raster': x.reshape(n, n, 1),
+            'mesh': {'raster_box': [50, 6, 50.1, 6.1],
+                     'step': 1, 'epsg': 4326}}
+
+
+def _chain(data, nstages, path, codec, shuffle, bandwidth):
+    """Simulate a chain of tasks passing a raster via storage
+
+    Every stage writes a pickle, uploads it (optionally compressed),
+    another worker downloads it and reads the pickle. Network is
+    modelled by the bandwidth.
+    """
+    fn = os.path.join(path, 'raster')
+    up = os.path.join(path, 'upload')
+    nbytes, elapsed = 0, 0
+    for _ in range(nstages):
+        start = time.perf_counter()
+        with open(fn, 'wb') as f:
+            pickle.dump(data, f)
+
+        if codec is None or \
+           not compress_file(fn, up, codec = codec, shuffle = shuffle):
+            shutil.copyfile(fn, up)
+        size = os.path.getsize(up)
+
+        decompress_file(up)
+        with open(up, 'rb') as f:
+            data = pickle.load(f)
+
+        elapsed += time.perf_counter() - start \
+            + 2*size/(bandwidth*1024**2)
+        nbytes += size
+
+    return nbytes, elapsed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser\
+        (description = "Bytes and time of a raster task chain "
+         "with storage codecs")
+    parser.add_argument('--size', type = int, default = 4000,
+                        help = "raster size in pixels")
+    parser.add_argument('--nstages', type = int, default = 3,
+                        help = "number of tasks in a chain")
+    parser.add_argument('--bandwidth', type = float, default = 100,
+                        help = "network bandwidth MB/s "
+                        "(upload and download)")
+    args = parser.parse_args()
+
+    data = _raster(args.size)
+    path = tempfile.mkdtemp()
+    try:
+        for codec, shuffle in [(None, 0)] + \
+            [(c, s) for c in CODECS for s in (0, 8)]:
+            try:
+                nbytes, elapsed = _chain(dict(data), args.nstages,
+                                         path, codec, shuffle,
+                                         args.bandwidth)
+            except RuntimeError as e:
+                print("{}: {}".format(codec, e))
+                continue
+            print("{:>5} shuffle={}: {:.1f} MB transferred, "
+                  "{:.2f} s".format(str(codec), shuffle,
+                                    nbytes/1024**2, elapsed))
+    finally:
+        shutil.rmtree(path)
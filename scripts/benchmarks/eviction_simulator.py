@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+
+import os
+import csv
+import shutil
+import random
+import argparse
+import tempfile
+
+import numpy as np
+
+from tqdm import tqdm
+
+from pvgrip.storage.files_lrucache \
+    import Files_LRUCache
+
+
+def _synthetic(naccess, nfiles, seed = 0):
+    """Generate an access log
+
+    Popularity of files follows a zipf law. Files are of three kinds:
+    small and cheap (png, json), large and cheap (downloads) and
+    medium size, but expensive to compute.
+    """
+    rng = np.random.default_rng(seed)
+    kinds = [(2*1024, 0.01), (500*1024**2, 30), (20*1024**2, 300)]
+    files = []
+    for i in range(nfiles):
+        size, cost = kinds[rng.integers(len(kinds))]
+        files += [('file_{}'.format(i),
+                   int(size*rng.uniform(0.5, 1.5)),
+                   cost*rng.uniform(0.5, 1.5))]
+
+    ranks = rng.permutation(nfiles)
+    access = rng.zipf(1.2, size = naccess*2)
+    access = access[access <= nfiles][:naccess] - 1
+    return [files[ranks[i]] for i in access]
+
+
+def _read_log(fn):
+    """Read access log
+
+    CSV file with columns: path, size (bytes), cost (seconds)
+    """
+    with open(fn) as f:
+        return [(x['path'], int(x['size']), float(x['cost']))
+                for x in csv.DictReader(f)]
+
+
+def _sparse(fn, size):
+    with open(fn, 'wb') as f:
+        f.truncate(size)
+
+
+def simulate(log, maxsize, policy):
+    path = tempfile.mkdtemp()
+    try:
+        cache = Files_LRUCache(maxsize = maxsize, path = path,
+                               policy = policy)
+        hits, nbytes, cost = 0, 0, 0
+        for name, size, fcost in tqdm(log, desc = policy):
+            fn = os.path.join(path, name)
+            if fn in cache:
+                hits += 1
+                continue
+
+            nbytes += size
+            cost += fcost
+            _sparse(fn, size)
+            cache.add(fn, cost = fcost)
+
+        return {'policy': policy,
+                'hit ratio': hits / len(log),
+                'GB refetched': nbytes / 1024**3,
+                'hours recomputed': cost / 3600}
+    finally:
+        shutil.rmtree(path)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser\
+        (description = "Replay an access log against the local "
+         "cache with different eviction policies")
+    parser.add_argument('--log',
+                        help = "CSV file with columns path,size,cost. "
+                        "If not given, a synthetic log is used")
+    parser.add_argument('--naccess', type = int, default = 20000,
+                        help = "length of the synthetic log")
+    parser.add_argument('--nfiles', type = int, default = 5000,
+                        help = "number of files in the synthetic log")
+    parser.add_argument('--maxsize', type = float, default = 50,
+                        help = "cache size in GB")
+    parser.add_argument('--policies', default = 'lru,gdsf',
+                        help = "comma separated list of policies")
+    args = parser.parse_args()
+
+    log = _read_log(args.log) if args.log \
+        else _synthetic(args.naccess, args.nfiles)
+
+    for policy in args.policies.split(','):
+        res = simulate(log, args.maxsize, policy)
+        print(', '.join('{}: {:.4g}'.format(k, v)
+                        if isinstance(v, float) else
+                        '{}: {}'.format(k, v)
+                        for k, v in res.items()))
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import multiprocessing
+
+import numpy as np
+
+from tqdm import tqdm
+
+from pvgrip.storage.files_lrucache \
+    import Files_LRUCache
+
+
+def _touch(fn, size = 16):
+    with open(fn, 'wb') as f:
+        f.write(b'\0'*size)
+
+
+def _fill(path, nfiles):
+    cache = Files_LRUCache(maxsize = 10, path = path)
+    res = []
+    for i in tqdm(range(nfiles), desc = "tracking files"):
+        fn = os.path.join(path, 'files', str(i))
+        _touch(fn)
+        cache.add(fn)
+        res += [fn]
+    return res
+
+
+def _lookups(path, files, nlookups, add_every, queue):
+    cache = Files_LRUCache(maxsize = 10, path = path)
+    random.seed(os.getpid())
+
+    res = []
+    for i in range(nlookups):
+        fn = random.choice(files)
+        start = time.perf_counter()
+        if add_every and 0 == i % add_every:
+            cache.add(fn)
+        else:
+            _ = fn in cache
+        res += [time.perf_counter() - start]
+
+    queue.put(res)
+
+
+def _report(name, x):
+    x = np.array(x)*1e+6
+    print("{:>12}: n = {}, mean = {:.1f}us, p50 = {:.1f}us, "
+          "p95 = {:.1f}us, p99 = {:.1f}us, max = {:.1f}us"\
+          .format(name, len(x), x.mean(),
+                  *np.percentile(x, [50, 95, 99]), x.max()))
+
+
+def main(nfiles, nprocs, nlookups, add_every):
+    path = tempfile.mkdtemp()
+    try:
+        os.makedirs(os.path.join(path, 'files'))
+        files = _fill(path, nfiles)
+
+        queue = multiprocessing.Queue()
+        procs = [multiprocessing.Process\
+                 (target = _lookups,
+                  args = (path, files, nlookups, add_every, queue))
+                 for _ in range(nprocs)]
+        start = time.perf_counter()
+        [p.start() for p in procs]
+        res = [queue.get() for _ in procs]
+        [p.join() for p in procs]
+        wall = time.perf_counter() - start
+
+        for i, x in enumerate(res):
+            _report("process {}".format(i), x)
+        _report("all", sum(res, []))
+        print("{} operations in {:.2f} seconds with {} processes"\
+              .format(nprocs*nlookups, wall, nprocs))
+    finally:
+        shutil.rmtree(path)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser\
+        (description = "Files_LRUCache lookup latency "
+         "under concurrent worker processes")
+    parser.add_argument('--nfiles', type = int, default = 100000,
+                        help = "number of tracked files")
+    parser.add_argument('--nprocs', type = int, default = 4,
+                        help = "number of concurrent processes")
+    parser.add_argument('--nlookups', type = int, default = 10000,
+                        help = "number of lookups per process")
+    parser.add_argument('--add-every', type = int, default = 10,
+                        help = "every n-th operation is an 'add'. "
+                        "0 for lookups only")
+    args = parser.parse_args()
+
+    main(nfiles = args.nfiles, nprocs = args.nprocs,
+         nlookups = args.nlookups, add_every = args.add_every)
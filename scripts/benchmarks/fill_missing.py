@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+
+import time
+import argparse
+import tracemalloc
+
+import numpy as np
+
+from scipy import ndimage as nd
+
+from pvgrip.raster.fill \
+    import fill_missing
+
+
+def _fill_3d(data, missing_value = -9999):
+    # former implementation: transform over the 3-D array
+    missing = data == missing_value
+    ind = nd.distance_transform_edt(missing,
+                                    return_distances=False,
+                                    return_indices=True)
+    return data[tuple(ind)]
+
+
+def _measure(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 2**20
+
+
+def _data(size, nchannels, case, seed = 0):
+    rng = np.random.default_rng(seed)
+    data = rng.uniform(0, 100, (size, size, nchannels))
+    if 'islands' == case:
+        for _ in range(10):
+            r, c = rng.integers(0, size - size//20, 2)
+            data[r:r + size//20, c:c + size//20] = -9999
+    elif 'scattered' == case:
+        data[rng.random((size, size)) < 0.01] = -9999
+    return data
+
+
+def main():
+    parser = argparse.ArgumentParser\
+        (description = "Time and memory of fill_missing")
+    parser.add_argument('--size', type = int, default = 2000)
+    parser.add_argument('--nchannels', type = int, default = 3)
+    parser.add_argument('--case', nargs = '+',
+                        default = ['none', 'islands', 'scattered'])
+    parser.add_argument('--method', nargs = '+',
+                        default = ['nearest', 'idw', 'laplace'])
+    args = parser.parse_args()
+
+    print("{:>10} {:>10} {:>10} {:>10}"\
+          .format('case', 'method', 'time, s', 'peak, MB'))
+    for case in args.case:
+        data = _data(args.size, args.nchannels, case)
+        res = _measure(lambda: _fill_3d(data))
+        print("{:>10} {:>10} {:>10.2f} {:>10.1f}"\
+              .format(case, '3-D edt', *res))
+        for method in args.method:
+            if 'scattered' == case and 'nearest' != method:
+                continue
+            res = _measure(lambda: fill_missing(data, method = method))
+            print("{:>10} {:>10} {:>10.2f} {:>10.1f}"\
+                  .format(case, method, *res))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+
+import time
+import random
+import argparse
+
+from pvgrip.utils.float_hash \
+    import float_hash, float_hash_v1
+
+
+def _route(n):
+    return [{'latitude': 50 + random.random(),
+             'longitude': 6 + random.random(),
+             'timestamp': 1650884152 + i,
+             'azimuth': 180.0, 'zenith': 30.0}
+            for i in range(n)]
+
+
+def _rasters(n):
+    res = []
+    for _ in range(n):
+        lat, lon = 50 + random.random(), 6 + random.random()
+        res += [{'box': [lat, lon, lat + 0.01, lon + 0.01],
+                 'step': 1.0, 'mesh_type': 'metric'}]
+    return res
+
+
+def _payloads(nroute, nrasters):
+    return {
+        'sample_raster':
+        ("cache_results", "sample_raster",
+         {'box': [50.0, 6.0, 50.01, 6.01], 'step': 1.0,
+          'mesh_type': 'metric', 'data_re': '.*',
+          'stat': 'max', 'pdal_resolution': 0.3}),
+        'save_route({})'.format(nroute):
+        ("cache_results", "save_route", ((_route(nroute),), {})),
+        'rasters({})'.format(nrasters):
+        ("cache_results", "merge_tiles", ((), {'rasters': _rasters(nrasters)})),
+    }
+
+
+def _time(fun, key, nrepeat):
+    start = time.perf_counter()
+    for _ in range(nrepeat):
+        fun(key)
+    return (time.perf_counter() - start) / nrepeat
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser\
+        (description = "float_hash timing on typical cache keys")
+    parser.add_argument('--nroute', type = int, default = 10000,
+                        help = "number of points in a route")
+    parser.add_argument('--nrasters', type = int, default = 500,
+                        help = "number of boxes in a rasters list")
+    parser.add_argument('--nrepeat', type = int, default = 20,
+                        help = "number of repetitions")
+    args = parser.parse_args()
+
+    random.seed(0)
+    for name, key in _payloads(args.nroute, args.nrasters).items():
+        old = _time(float_hash_v1, key, args.nrepeat)
+        new = _time(float_hash, key, args.nrepeat)
+        print("{:>20}: float_hash_v1 = {:.3f}ms, float_hash = {:.3f}ms, "
+              "speedup = {:.1f}x".format(name, old*1e+3, new*1e+3,
+                                         old/new))
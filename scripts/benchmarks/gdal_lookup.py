@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+
+import os
+import time
+import shutil
+import argparse
+import tempfile
+
+import numpy as np
+
+from pvgrip.raster.io \
+    import save_gdal
+from pvgrip.raster.gdalinterface \
+    import GDALInterface
+
+
+def _legacy_lookup(interface, points):
+    """Point by point lookup as done before lookup_array"""
+    data = interface._coordinate_transform.TransformPoints(points)
+    inv = interface.geo_transform_inv
+    data = [(u - inv[0], v - inv[3]) for u,v,_ in data]
+    data = [(int(inv[4]*u + inv[5]*v), int(inv[1]*u + inv[2]*v))
+            for u,v in data]
+    raster = interface.points_array
+    res = []
+    for y,x in data:
+        if 0 <= y < raster.shape[0] and 0 <= x < raster.shape[1]:
+            res += [raster[y,x]]
+        else:
+            res += [interface.SEA_LEVEL*np.ones((raster.shape[2],))]
+    return np.array(res)
+
+
+def main():
+    parser = argparse.ArgumentParser\
+        (description = "Compare point by point and vectorized "
+         "GDALInterface lookups")
+    parser.add_argument('--npoints', type = int, nargs = '+',
+                        default = [1000000, 20000000])
+    parser.add_argument('--legacy_max', type = int, default = 1000000,
+                        help = "skip the legacy lookup for more points")
+    args = parser.parse_args()
+
+    path = tempfile.mkdtemp()
+    try:
+        fn = os.path.join(path, 'raster.tif')
+        array = np.random.default_rng(0).normal(size = (4000, 4000, 1))
+        save_gdal(fn, array, (300000, 1, 0, 5600000, 0, -1), 25832)
+        interface = GDALInterface(fn)
+        interface.points_array
+
+        print("{:>10} {:>10} {:>10}"\
+              .format('npoints', 'legacy, s', 'array, s'))
+        for n in args.npoints:
+            rng = np.random.default_rng(1)
+            lat = rng.uniform(50.50, 50.54, n)
+            lon = rng.uniform(6.18, 6.24, n)
+
+            start = time.perf_counter()
+            interface.lookup_array(lon, lat)
+            new = time.perf_counter() - start
+
+            legacy = float('nan')
+            if n <= args.legacy_max:
+                points = list(zip(lon.tolist(), lat.tolist()))
+                start = time.perf_counter()
+                _legacy_lookup(interface, points)
+                legacy = time.perf_counter() - start
+
+            print("{:>10} {:>10.2f} {:>10.2f}".format(n, legacy, new))
+    finally:
+        shutil.rmtree(path)
+
+
+if __name__ == '__main__':
+    main()
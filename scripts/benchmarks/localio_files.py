@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+
+import os
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import multiprocessing
+
+import numpy as np
+
+from pvgrip.storage.local_io.files \
+    import LOCALIO_Files
+
+
+def _storage(path, redis_url):
+    return LOCALIO_Files(root = path, redis_url = redis_url)
+
+
+def _write(fn, size):
+    with open(fn, 'wb') as f:
+        f.write(os.urandom(size))
+
+
+def _writer(path, redis_url, nfiles, size, stop):
+    storage = _storage(path, redis_url)
+    fn = os.path.join(path, 'src_writer')
+    while not stop.is_set():
+        _write(fn, size)
+        storage.upload(fn, 'file_{}'.format(random.randrange(nfiles)))
+        os.unlink(fn)
+
+
+def _reader(path, redis_url, nfiles, nreads, queue):
+    storage = _storage(path, redis_url)
+    random.seed(os.getpid())
+    ofn = os.path.join(path, 'dst_{}'.format(os.getpid()))
+
+    contains, download = [], []
+    for _ in range(nreads):
+        fn = 'file_{}'.format(random.randrange(nfiles))
+
+        start = time.perf_counter()
+        isin = fn in storage
+        contains += [time.perf_counter() - start]
+
+        if not isin:
+            continue
+
+        start = time.perf_counter()
+        storage.download(fn, ofn)
+        download += [time.perf_counter() - start]
+        os.unlink(ofn)
+
+    queue.put((contains, download))
+
+
+def _report(name, x):
+    x = np.array(x)*1e+6
+    print("{:>9}: n = {}, p50 = {:.1f}us, p95 = {:.1f}us, "
+          "p99 = {:.1f}us, max = {:.1f}us"\
+          .format(name, len(x), *np.percentile(x, [50, 95, 99]),
+                  x.max()))
+
+
+def main(redis_url, nreaders, nreads, nfiles, size):
+    path = tempfile.mkdtemp()
+    try:
+        open(os.path.join(path, 'localio.sanity'), 'w').close()
+        storage = _storage(path, redis_url)
+        for i in range(nfiles):
+            fn = os.path.join(path, 'src')
+            _write(fn, size)
+            storage.upload(fn, 'file_{}'.format(i))
+            os.unlink(fn)
+
+        stop = multiprocessing.Event()
+        writer = multiprocessing.Process\
+            (target = _writer,
+             args = (path, redis_url, nfiles, size, stop))
+        queue = multiprocessing.Queue()
+        readers = [multiprocessing.Process\
+                   (target = _reader,
+                    args = (path, redis_url, nfiles, nreads, queue))
+                   for _ in range(nreaders)]
+
+        writer.start()
+        [p.start() for p in readers]
+        res = [queue.get() for _ in readers]
+        [p.join() for p in readers]
+        stop.set()
+        writer.join()
+
+        _report("contains", sum([x[0] for x in res], []))
+        _report("download", sum([x[1] for x in res], []))
+    finally:
+        shutil.rmtree(path)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser\
+        (description = "LOCALIO_Files contains/download latency "
+         "with concurrent readers and a writer")
+    parser.add_argument('--redis-url', default = 'redis://localhost:6379/0',
+                        help = "how to connect to redis")
+    parser.add_argument('--nreaders', type = int, default = 32,
+                        help = "number of concurrent readers")
+    parser.add_argument('--nreads', type = int, default = 1000,
+                        help = "number of reads per reader")
+    parser.add_argument('--nfiles', type = int, default = 100,
+                        help = "number of files in storage")
+    parser.add_argument('--size', type = int, default = 1024**2,
+                        help = "size of files in bytes")
+    args = parser.parse_args()
+
+    main(redis_url = args.redis_url, nreaders = args.nreaders,
+         nreads = args.nreads, nfiles = args.nfiles,
+         size = args.size)
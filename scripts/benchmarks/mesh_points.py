@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+
+import time
+import argparse
+import itertools
+import tracemalloc
+
+import numpy as np
+
+from pvgrip.raster.mesh \
+    import mesh, mesh_points
+
+
+def _measure(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 2**20
+
+
+def main():
+    parser = argparse.ArgumentParser\
+        (description = "Compare tuple product and array mesh points")
+    parser.add_argument('--box', type = float, nargs = 4,
+                        default = [50.7, 6.0, 50.75, 6.1])
+    parser.add_argument('--step', type = float, nargs = '+',
+                        default = [10, 2, 1])
+    parser.add_argument('--mesh_type', default = 'utm')
+    args = parser.parse_args()
+
+    print("{:>10} {:>12} {:>12} {:>12} {:>12}"\
+          .format('npoints', 'product, s', 'product, MB',
+                  'arrays, s', 'arrays, MB'))
+    for step in args.step:
+        grid = mesh(box = args.box, step = step,
+                    mesh_type = args.mesh_type)
+        n = len(grid['mesh'][0]) * len(grid['mesh'][1])
+        old = _measure(lambda: np.array\
+                       (list(itertools.product(*grid['mesh'][::-1]))))
+        new = _measure(lambda: mesh_points(grid))
+        print("{:>10} {:>12.2f} {:>12.1f} {:>12.2f} {:>12.1f}"\
+              .format(n, old[0], old[1], new[0], new[1]))
+
+
+if __name__ == '__main__':
+    main()
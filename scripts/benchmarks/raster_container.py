@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+
+import os
+import time
+import pickle
+import shutil
+import argparse
+import tempfile
+
+import numpy as np
+
+from pvgrip.raster.container \
+    import write_raster, read_raster
+
+
+def _data(n):
+    lat = np.linspace(50, 50.1, n)
+    lon = np.linspace(6, 6.1, n)
+    return {'raster': np.random.default_rng(0)\
+            .normal(size = (n, n, 1)),
+            'mesh': {'mesh': (lat.tolist(), lon.tolist()),
+                     'raster_box': [50, 6, 50.1, 6.1],
+                     'step': 1, 'epsg': 4326}}
+
+
+def _pickle_write(fn, data):
+    with open(fn, 'wb') as f:
+        pickle.dump(data, f)
+
+
+def _pickle_read(fn):
+    with open(fn, 'rb') as f:
+        return pickle.load(f)
+
+
+def _time(fun, nrepeat):
+    res = []
+    for _ in range(nrepeat):
+        start = time.perf_counter()
+        fun()
+        res.append(time.perf_counter() - start)
+    return min(res)
+
+
+def _row(name, fn, write, read, nrepeat, window):
+    res = [_time(write, nrepeat),
+           _time(lambda: read(), nrepeat),
+           _time(lambda: read()['raster'].sum(), nrepeat),
+           _time(lambda: read()['raster'][:window,:window].sum(),
+                 nrepeat),
+           os.path.getsize(fn)/1024**2]
+    print("{:<10} {:>8.3f} {:>8.3f} {:>8.3f} {:>8.4f} {:>8.1f}"\
+          .format(name, *res))
+
+
+def main():
+    parser = argparse.ArgumentParser\
+        (description = "Compare pickled rasters with raster containers")
+    parser.add_argument('--size', type = int, default = 4000,
+                        help = "raster is size x size")
+    parser.add_argument('--nrepeat', type = int, default = 3,
+                        help = "best of nrepeat runs is reported, "
+                        "times are in seconds")
+    args = parser.parse_args()
+
+    path = tempfile.mkdtemp()
+    try:
+        data = _data(args.size)
+        fn = os.path.join(path, 'raster')
+
+        print("{:<10} {:>8} {:>8} {:>8} {:>8} {:>8}"\
+              .format('format', 'write', 'read', 'sum', 'window',
+                      'MB'))
+
+        _row('pickle', fn,
+             lambda: _pickle_write(fn, data),
+             lambda: _pickle_read(fn),
+             args.nrepeat, args.size // 10)
+        _row('copy', fn,
+             lambda: write_raster(fn, data),
+             lambda: read_raster(fn, mmap = False),
+             args.nrepeat, args.size // 10)
+        _row('memmap', fn,
+             lambda: write_raster(fn, data),
+             lambda: read_raster(fn),
+             args.nrepeat, args.size // 10)
+    finally:
+        shutil.rmtree(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+
+import time
+import redis
+import argparse
+import multiprocessing
+
+import numpy as np
+
+from pvgrip.utils.redis.lock \
+    import RedisLock
+from pvgrip.utils.redis.client \
+    import redis_client
+from pvgrip.utils.redis.parse_url \
+    import parse_url
+
+
+def _fresh_lock(redis_url, key):
+    # how locks were made before the shared connection pool
+    client = redis.StrictRedis(**parse_url(redis_url))
+    lock = RedisLock(redis_url = redis_url, key = key)
+    lock._redis = client
+    lock._lock = redis.lock.Lock(client, key, blocking = 1,
+                                 blocking_timeout = False)
+    return lock
+
+
+def _worker(redis_url, nlocks, fresh, queue):
+    res = []
+    for i in range(nlocks):
+        key = "benchmark_redis_lock_{}".format(i)
+        start = time.perf_counter()
+        lock = _fresh_lock(redis_url, key) if fresh \
+            else RedisLock(redis_url = redis_url, key = key)
+        try:
+            with lock:
+                pass
+        except Exception:
+            pass
+        res += [time.perf_counter() - start]
+    queue.put(res)
+
+
+def _connections(redis_url):
+    return redis_client(redis_url)\
+        .info('stats')['total_connections_received']
+
+
+def run(redis_url, nprocs, nlocks, fresh):
+    conn = _connections(redis_url)
+
+    queue = multiprocessing.Queue()
+    procs = [multiprocessing.Process\
+             (target = _worker,
+              args = (redis_url, nlocks, fresh, queue))
+             for _ in range(nprocs)]
+    start = time.perf_counter()
+    [p.start() for p in procs]
+    res = sum([queue.get() for _ in procs], [])
+    [p.join() for p in procs]
+    wall = time.perf_counter() - start
+
+    x = np.array(res)*1e+6
+    print("{:>7}: {:.0f} lock/unlock per second, "
+          "p50 = {:.1f}us, p99 = {:.1f}us, "
+          "new connections = {}"\
+          .format("fresh" if fresh else "pooled",
+                  len(x)/wall, *np.percentile(x, [50, 99]),
+                  _connections(redis_url) - conn))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser\
+        (description = "RedisLock acquire/release throughput "
+         "with a shared connection pool and with a new "
+         "connection per lock")
+    parser.add_argument('--redis-url', default = 'redis://localhost:6379/0',
+                        help = "how to connect to redis")
+    parser.add_argument('--nprocs', type = int, default = 4,
+                        help = "number of concurrent processes")
+    parser.add_argument('--nlocks', type = int, default = 5000,
+                        help = "number of locks per process")
+    args = parser.parse_args()
+
+    for fresh in (True, False):
+        run(redis_url = args.redis_url, nprocs = args.nprocs,
+            nlocks = args.nlocks, fresh = fresh)
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+
+import os
+import time
+import types
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+
+import numpy as np
+
+from pvgrip.raster.io \
+    import save_gdal
+from pvgrip.raster.mesh \
+    import mesh
+from pvgrip.raster.gdalinterface \
+    import GDALInterface
+from pvgrip.raster.sources \
+    import fold_sources
+from pvgrip.utils.epsg \
+    import epsg2ll
+
+
+def _tiles(path, ntiles, size, resolution):
+    """Write a grid of ntiles x ntiles adjacent tiles (NRW style)"""
+    rng = np.random.default_rng(0)
+    npixels = int(size / resolution)
+    fns = []
+    for i in range(ntiles):
+        for j in range(ntiles):
+            fn = os.path.join(path, 'tile_{}_{}.tif'.format(i, j))
+            save_gdal(fn, rng.normal(size = (npixels, npixels, 1)),
+                      (300000 + j*size, resolution, 0,
+                       5600000 - i*size, 0, -resolution), 25832)
+            fns += [fn]
+    return fns
+
+
+def _fetch(latency):
+    def fetch(fn):
+        time.sleep(latency)
+        return fn
+    return fetch
+
+
+def _legacy(fns, lon, lat, box, fetch):
+    """Serial loop as done before fold_sources"""
+    res = None
+    for fn in fns:
+        x = GDALInterface(fetch(fn)).lookup_grid(lon, lat, box = box)
+        if res is None:
+            res = x
+            continue
+        res = np.array((res,x)).max(axis=0)
+    return res
+
+
+class _Synthetic:
+    """In-memory tile of a grid of ntiles x ntiles tiles
+
+    Reading a tile takes 'read' seconds. Used without GDAL.
+    """
+
+    def __init__(self, fn):
+        self.tile, self.ntiles, self.npoints, self.read = fn
+        self.src = types.SimpleNamespace(RasterCount = 1)
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args):
+        pass
+
+
+    def lookup(self):
+        time.sleep(self.read)
+        n = self.npoints // self.ntiles**2
+        inside = slice(self.tile*n, (self.tile + 1)*n)
+        rng = np.random.default_rng(self.tile)
+        return inside, rng.normal(size = (n, 1))
+
+
+    def fold(self, out, lock):
+        inside, values = self.lookup()
+        with lock:
+            out[inside] = np.maximum(out[inside], values)
+
+
+def _synthetic(args, fetch):
+    npoints = int((args.ntiles * args.size / args.step)**2)
+    fns = [(i, args.ntiles, npoints, args.read)
+           for i in range(args.ntiles**2)]
+    print("{} synthetic tiles, {} points".format(len(fns), npoints))
+
+    def _legacy():
+        res = None
+        for fn in fns:
+            x = np.full((npoints, 1), GDALInterface.SEA_LEVEL,
+                        dtype = float)
+            inside, values = _Synthetic(fetch(fn)).lookup()
+            x[inside] = values
+            res = x if res is None else np.array((res,x)).max(axis=0)
+        return res
+
+    return _legacy, lambda nthreads: fold_sources\
+        (fns, npoints = npoints,
+         fold = lambda interface, out, lock: interface.fold(out, lock),
+         nthreads = nthreads, get_locally = fetch,
+         open_source = _Synthetic)
+
+
+def _measure(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    res = fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return res, elapsed, peak / 2**20
+
+
+def main():
+    parser = argparse.ArgumentParser\
+        (description = "Compare serial and concurrent sampling of "
+         "a box spanning multiple tiles")
+    parser.add_argument('--ntiles', type = int, default = 3,
+                        help = "box spans ntiles x ntiles tiles")
+    parser.add_argument('--size', type = float, default = 1000,
+                        help = "tile size in meters")
+    parser.add_argument('--resolution', type = float, default = 0.5)
+    parser.add_argument('--step', type = float, default = 1)
+    parser.add_argument('--latency', type = float, default = 0.5,
+                        help = "simulated download time of a tile")
+    parser.add_argument('--nthreads', type = int, nargs = '+',
+                        default = [1, 4, 9])
+    parser.add_argument('--synthetic', action = 'store_true',
+                        help = "use in-memory tiles, without GDAL")
+    parser.add_argument('--read', type = float, default = 0.2,
+                        help = "simulated read time of a synthetic "
+                        "tile")
+    args = parser.parse_args()
+
+    fetch = _fetch(args.latency)
+    if args.synthetic:
+        legacy, concurrent = _synthetic(args, fetch)
+        _compare(legacy, concurrent, args.nthreads)
+        return
+
+    path = tempfile.mkdtemp()
+    try:
+        fns = _tiles(path, args.ntiles, args.size, args.resolution)
+        margin = 0.05 * args.size
+        width = args.ntiles * args.size
+        box = epsg2ll(lat = 5600000 - width + margin,
+                      lon = 300000 + margin, epsg = 25832) \
+            + epsg2ll(lat = 5600000 - margin,
+                      lon = 300000 + width - margin, epsg = 25832)
+        grid = mesh(box = box, step = args.step, mesh_type = 25832)
+        lat, lon = grid['mesh']
+        print("{} tiles, {} points".format(len(fns), len(lat)*len(lon)))
+
+        _compare(lambda: _legacy(fns, lon, lat, box, fetch),
+                 lambda nthreads: fold_sources
+                 (fns, npoints = len(lat)*len(lon),
+                  fold = lambda interface, out, lock: \
+                  interface.fold_grid(lon, lat, out, box = box,
+                                      lock = lock),
+                  nthreads = nthreads, get_locally = fetch),
+                 args.nthreads)
+    finally:
+        shutil.rmtree(path)
+
+
+def _compare(legacy, concurrent, nthreads):
+    expected, elapsed, peak = _measure(legacy)
+    print("{:>12} {:>10} {:>10}".format('', 'time, s', 'peak, MB'))
+    print("{:>12} {:>10.2f} {:>10.1f}"\
+          .format('serial', elapsed, peak))
+
+    for n in nthreads:
+        res, elapsed, peak = _measure(lambda: concurrent(n))
+        assert np.array_equal(res, expected)
+        print("{:>12} {:>10.2f} {:>10.1f}"\
+              .format('threads={}'.format(n), elapsed, peak))
+
+
+if __name__ == '__main__':
+    main()
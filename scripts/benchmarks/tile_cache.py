@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+
+import csv
+import json
+import argparse
+
+import numpy as np
+
+from pvgrip.raster.tiles \
+    import tile_layout, tile_index, box2index
+from pvgrip.utils.epsg \
+    import ll2epsg, epsg2ll
+
+
+def _synthetic(nrequests, step, epsg, seed = 0):
+    """Generate a replay of map views
+
+    Users look at a few places, pan by a fraction of the view and
+    sometimes zoom out or in.
+    """
+    rng = np.random.default_rng(seed)
+    centres = [ll2epsg(lat = 50.7 + 0.1*rng.uniform(),
+                       lon = 6.1 + 0.1*rng.uniform(), epsg = epsg)
+               for _ in range(5)]
+
+    res = []
+    for _ in range(nrequests):
+        if 0 == len(res) or rng.uniform() < 0.05:
+            lat, lon = centres[rng.integers(len(centres))]
+            width = step * rng.choice([200, 400, 800])
+        else:
+            width *= rng.choice([1, 1, 1, 1, 0.5, 2])
+            width = np.clip(width, 100*step, 3200*step)
+            lat += width * rng.uniform(-0.3, 0.3)
+            lon += width * rng.uniform(-0.3, 0.3)
+        res += [epsg2ll(lat = lat - width/2, lon = lon - width/2,
+                        epsg = epsg) \
+                + epsg2ll(lat = lat + width/2, lon = lon + width/2,
+                          epsg = epsg)]
+    return res
+
+
+def _read_log(fn):
+    """Read request log
+
+    CSV file with a column 'box': [lat_min,lon_min,lat_max,lon_max]
+    """
+    with open(fn) as f:
+        return [json.loads(x['box']) for x in csv.DictReader(f)]
+
+
+def simulate(boxes, step, epsg, size, halo):
+    """Replay requests against a box and a tile keyed cache
+
+    :return: dictionary mode -> (hit rate, computed points)
+    """
+    seen = set()
+    hits, points = 0, 0
+    tiles = set()
+    tile_hits, tile_total, tile_points = 0, 0, 0
+    for box in boxes:
+        key = tuple(box)
+        if key in seen:
+            hits += 1
+        else:
+            seen.add(key)
+            index = box2index(box = box, step = step, epsg = epsg)
+            points += (index[2] - index[0]) * (index[3] - index[1])
+
+        layout = tile_layout(box = box, step = step, mesh_type = epsg,
+                             size = size, halo = halo)
+        for tile in layout['tiles']:
+            tile_total += 1
+            if tile in tiles:
+                tile_hits += 1
+                continue
+            tiles.add(tile)
+            index = tile_index(*tile, size = size, halo = halo)
+            tile_points += (index[2] - index[0]) * (index[3] - index[1])
+
+    return {'box': (hits / len(boxes), points),
+            'tiles': (tile_hits / tile_total, tile_points)}
+
+
+def main():
+    parser = argparse.ArgumentParser\
+        (description = "Cache hit rate of box and tile sampling "
+         "on a replay of overlapping box requests")
+    parser.add_argument('--log', default = None,
+                        help = "csv with a 'box' column, "
+                        "synthetic requests if not given")
+    parser.add_argument('--nrequests', type = int, default = 1000)
+    parser.add_argument('--step', type = float, default = 1)
+    parser.add_argument('--epsg', type = int, default = 25832)
+    parser.add_argument('--size', type = int, nargs = '+',
+                        default = [128, 256, 512, 2048])
+    parser.add_argument('--halo', type = int, default = 0)
+    args = parser.parse_args()
+
+    if args.log:
+        boxes = _read_log(args.log)
+    else:
+        boxes = _synthetic(args.nrequests, args.step, args.epsg)
+
+    print("{:>12} {:>10} {:>16}"\
+          .format('mode', 'hit rate', 'computed points'))
+    for size in args.size:
+        res = simulate(boxes, step = args.step, epsg = args.epsg,
+                       size = size, halo = args.halo)
+        if size == args.size[0]:
+            print("{:>12} {:>10.3f} {:>16}".format('box', *res['box']))
+        print("{:>12} {:>10.3f} {:>16}"\
+              .format('tiles={}'.format(size), *res['tiles']))
+
+
+if __name__ == '__main__':
+    main()
@@ -11,7 +11,7 @@ import pandas as pd
 from tqdm import tqdm
 
 from pvgrip.utils.float_hash \
-    import float_hash
+    import float_hash_v1
 
 from pvgrip.lidar.tasks \
     import download_laz
@@ -61,7 +61,7 @@ def _newfn(url, prefix):
     lon = int(URLRE.sub(r'\1', url))
     lat = int(URLRE.sub(r'\2', url))
     newkey = ("nrw_las", url, lon, lat)
-    return os.path.join(prefix, float_hash(newkey))
+    return os.path.join(prefix, float_hash_v1(newkey))
 
 
 def _process_data(row):